@@ -16,7 +16,8 @@ sys.path.insert(0, '/opt/mcads/app')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mcads_project.settings')
 django.setup()
 
-from xrayapp.models import XRayImage
+from xrayapp.models import ProcessingJob, XRayImage
+from xrayapp.progress import start_job
 from xrayapp.utils import process_image, load_model
 from pathlib import Path
 import logging
@@ -52,7 +53,8 @@ def test_processing():
         print(f"📷 Testing with X-ray ID: {latest_xray.id}")
         print(f"   Image: {latest_xray.image.name}")
         print(f"   Status: {latest_xray.processing_status}")
-        print(f"   Progress: {latest_xray.progress}%")
+        job = ProcessingJob.objects.filter(pk=latest_xray.pk).first()
+        print(f"   Progress: {job.progress}%" if job else "   Progress: no processing job")
         
         # Test the processing function
         image_path = Path('/opt/mcads/app/media') / latest_xray.image.name
@@ -63,17 +65,17 @@ def test_processing():
             
         print(f"🚀 Starting processing test...")
         
-        # Reset progress for testing
-        latest_xray.progress = 0
+        # Reset progress for testing (progress lives on the X-ray's processing job)
         latest_xray.processing_status = 'pending'
         latest_xray.save()
+        start_job(latest_xray, 'pending')
         
         # Process the image
         results = process_image(str(image_path), latest_xray, 'densenet')
         
         print(f"✅ Processing completed!")
         print(f"   Final status: {latest_xray.processing_status}")
-        print(f"   Final progress: {latest_xray.progress}%")
+        print(f"   Final progress: {ProcessingJob.objects.get(pk=latest_xray.pk).progress}%")
         print(f"   Predictions generated: {len(results)}")
         
         # Show top 5 predictions
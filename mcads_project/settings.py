@@ -14,6 +14,7 @@ import os
 from pathlib import Path
 import environ
 from django.core.management.utils import get_random_secret_key
+from django.core.exceptions import ImproperlyConfigured
 
 # Fix PyTorch CPU backend issues - must be set before torch import
 os.environ['MKLDNN_ENABLED'] = '0'
@@ -56,6 +57,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_bootstrap5',
     'csp',  # Content Security Policy
     'xrayapp',
@@ -68,6 +70,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'xrayapp.profiles.CachedProfileMiddleware',
+    'xrayapp.middleware.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -108,6 +112,34 @@ DATABASES = {
     }
 }
 
+# Connection reuse (see "Database connections" in SCALING_GUIDE.md):
+#   pool       - psycopg 3 connection pool per process (default; safe under ASGI workers)
+#   persistent - CONN_MAX_AGE connections per thread with health checks
+#   pgbouncer  - connect through PgBouncer in transaction pooling mode
+#   off        - new connection for every request (previous behaviour)
+DB_CONNECTION_MODE = env('DB_CONNECTION_MODE', default='pool')
+
+if DB_CONNECTION_MODE == 'pool':
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Required with the pool
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+        'timeout': env.int('DB_POOL_TIMEOUT', default=10),
+    }
+elif DB_CONNECTION_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=60)
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_CONNECTION_MODE == 'pgbouncer':
+    # PgBouncer owns the pooling; a transaction pooled server connection cannot
+    # keep server-side cursors (used by .iterator()) between statements
+    DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=0)
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_CONNECTION_MODE == 'off':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    raise ImproperlyConfigured(f"Unknown DB_CONNECTION_MODE: {DB_CONNECTION_MODE}")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +170,7 @@ SECURE_HSTS_PRELOAD = True
 SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'
 
 # Session security
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'  # Session reads served from Redis
 SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_HTTPONLY = True
@@ -150,8 +183,78 @@ CSRF_COOKIE_SAMESITE = 'Strict'
 CSRF_USE_SESSIONS = False  # Use cookies instead of sessions for better AJAX support
 CSRF_COOKIE_SECURE = not DEBUG  # Use secure cookies in production
 
+# Interpretability budgets (None = no limit). PLI methods fit their SmoothGrad
+# sample count and batch size to these when a request does not specify its own.
+INTERPRETABILITY_MAX_SECONDS = env.float('INTERPRETABILITY_MAX_SECONDS', default=None)
+INTERPRETABILITY_MAX_MEMORY_MB = env.float('INTERPRETABILITY_MAX_MEMORY_MB', default=None)
+
+# Batched attribution engines (Integrated Gradients steps / occlusion patches per forward pass)
+INTERPRETABILITY_BATCH_SIZE = env.int('INTERPRETABILITY_BATCH_SIZE', default=8)
+INTEGRATED_GRADIENTS_STEPS = env.int('INTEGRATED_GRADIENTS_STEPS', default=32)
+
+# Processing progress published to the cache (the database is the fallback once it expires)
+PROGRESS_CACHE_TIMEOUT = env.int('PROGRESS_CACHE_TIMEOUT', default=600)
+
+# Server-Sent Events progress stream. Streams end before the worker timeout (60s)
+# and the browser reconnects after PROGRESS_STREAM_RETRY_MS.
+PROGRESS_STREAM_MAX_SECONDS = env.int('PROGRESS_STREAM_MAX_SECONDS', default=50)
+PROGRESS_STREAM_INTERVAL = env.float('PROGRESS_STREAM_INTERVAL', default=0.5)
+PROGRESS_STREAM_RETRY_MS = env.int('PROGRESS_STREAM_RETRY_MS', default=1000)
+
+# Rendered prediction summary of the results page (invalidated per X-ray on change)
+RESULTS_FRAGMENT_CACHE_TIMEOUT = env.int('RESULTS_FRAGMENT_CACHE_TIMEOUT', default=60 * 60)
+
+# Total record counts shown on the cursor-paginated history pages are cached this long
+PAGINATION_COUNT_CACHE_TIMEOUT = env.int('PAGINATION_COUNT_CACHE_TIMEOUT', default=60)
+
+# User profiles (role, hospital, preferences) are cached per user for this long;
+# saving a profile invalidates its entry
+PROFILE_CACHE_TIMEOUT = env.int('PROFILE_CACHE_TIMEOUT', default=15 * 60)
+
+# Sliding-window rate limits per endpoint class: window in seconds, default request
+# budget, and per-role overrides (None disables the limit). Counted atomically in Redis
+# before the request reaches the upload handler or the model workers.
+RATE_LIMITS = {
+    'login': {
+        'window': env.int('RATE_LIMIT_LOGIN_WINDOW', default=300),
+        'default': env.int('RATE_LIMIT_LOGIN', default=5),
+    },
+    'upload': {
+        'window': 60,
+        'default': env.int('RATE_LIMIT_UPLOAD', default=10),
+        'roles': {'Administrator': 30, 'Radiographer': 30},
+    },
+    'interpretability': {
+        'window': 60,
+        'default': env.int('RATE_LIMIT_INTERPRETABILITY', default=5),
+        'roles': {'Administrator': 15, 'Radiographer': 15},
+    },
+    'progress': {
+        'window': 10,
+        'default': env.int('RATE_LIMIT_PROGRESS', default=30),
+    },
+}
+
+# Background purge of prediction history: rows per DELETE, and how long progress stays readable
+HISTORY_PURGE_CHUNK_SIZE = env.int('HISTORY_PURGE_CHUNK_SIZE', default=1000)
+HISTORY_PURGE_STATE_TIMEOUT = env.int('HISTORY_PURGE_STATE_TIMEOUT', default=60 * 60)
+
+# Records per INSERT/UPDATE when prediction history is written in bulk (re-scoring)
+HISTORY_BULK_CHUNK_SIZE = env.int('HISTORY_BULK_CHUNK_SIZE', default=500)
+
+# Pathology score from which a prediction counts towards a hospital's prevalence
+# statistics (xrayapp/stats.py), and the longest range the dashboard summarizes
+HOSPITAL_STATS_PATHOLOGY_THRESHOLD = env.float('HOSPITAL_STATS_PATHOLOGY_THRESHOLD', default=0.5)
+HOSPITAL_STATS_MAX_DAYS = env.int('HOSPITAL_STATS_MAX_DAYS', default=365)
+
+# Number of preprocessed images (per model type) kept in memory for reuse between
+# classification and interpretability of the same upload
+PREPROCESSING_CACHE_SIZE = env.int('PREPROCESSING_CACHE_SIZE', default=8)
+
 # File upload security
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads are streamed to disk in chunks and hashed on the way (see xrayapp/uploads.py)
+FILE_UPLOAD_HANDLERS = ['xrayapp.uploads.HashingTemporaryFileUploadHandler']
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 FILE_UPLOAD_PERMISSIONS = 0o644
 
@@ -284,6 +387,8 @@ STATICFILES_DIRS = [
 # Media files (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Same filesystem as MEDIA_ROOT so saving an upload is a rename, not a copy
+FILE_UPLOAD_TEMP_DIR = str(MEDIA_ROOT / 'tmp')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
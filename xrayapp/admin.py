@@ -5,7 +5,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
-from .models import XRayImage, PredictionHistory, UserProfile, VisualizationResult, USER_ROLES
+from .models import XRayImage, PredictionHistory, ProcessingJob, UserProfile, VisualizationResult, USER_ROLES
 
 
 # Unregister the default User admin
@@ -231,7 +231,7 @@ class XRayImageAdmin(admin.ModelAdmin):
     )
     search_fields = ('user__username', 'patient_id', 'first_name', 'last_name', 'technologist_first_name', 'technologist_last_name')
     readonly_fields = (
-        'uploaded_at', 'progress', 'image_format', 'image_size', 'image_resolution',
+        'uploaded_at', 'get_job_progress', 'image_format', 'image_size', 'image_resolution',
         'atelectasis', 'cardiomegaly', 'consolidation', 'edema', 
         'effusion', 'emphysema', 'fibrosis', 'hernia', 'infiltration',
         'mass', 'nodule', 'pleural_thickening', 'pneumonia', 'pneumothorax',
@@ -249,7 +249,7 @@ class XRayImageAdmin(admin.ModelAdmin):
             'fields': ('first_name', 'last_name', 'patient_id', 'gender', 'date_of_birth', 'date_of_xray', 'additional_info', 'technologist_first_name', 'technologist_last_name')
         }),
         (_('Image Processing'), {
-            'fields': ('image', 'uploaded_at', 'processing_status', 'progress', 'image_format', 'image_size', 'image_resolution')
+            'fields': ('image', 'uploaded_at', 'processing_status', 'get_job_progress', 'image_format', 'image_size', 'image_resolution')
         }),
         (_('Pathology Predictions'), {
             'fields': (
@@ -319,6 +319,14 @@ class XRayImageAdmin(admin.ModelAdmin):
         return _('Unknown')
     get_severity_display.short_description = _('Severity')
 
+    def get_job_progress(self, obj):
+        """Display the progress of the X-ray's processing job"""
+        try:
+            return f"{obj.job.progress}% ({obj.job.status})"
+        except ProcessingJob.DoesNotExist:
+            return '-'
+    get_job_progress.short_description = _('Progress')
+
 
 @admin.register(PredictionHistory)
 class PredictionHistoryAdmin(admin.ModelAdmin):
@@ -0,0 +1,108 @@
+"""
+Streaming CSV / XLSX exports of prediction history.
+
+Rows are read with values_list().aiterator() so no model instances are built
+and only one chunk of rows is held in memory, however large the export. The
+generators are async: under ASGI, StreamingHttpResponse would read a sync
+iterator to the end in a thread before sending the first byte.
+"""
+import csv
+import datetime
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import PATHOLOGY_FIELDS, PATHOLOGY_LABEL_SETS
+
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Bytes of the finished workbook sent per response chunk
+XLSX_STREAM_BLOCK_SIZE = 64 * 1024
+
+# (column header, PredictionHistory lookup). Patient names and identifiers are
+# left out of research exports. Pathology columns follow, unpacked from the score array.
+EXPORT_COLUMNS = [
+    ('Record ID', 'id'),
+    ('X-ray ID', 'xray_id'),
+    ('Prediction date', 'created_at'),
+    ('Model', 'model_used'),
+    ('Gender', 'xray__gender'),
+    ('Date of birth', 'xray__date_of_birth'),
+    ('X-ray date', 'xray__date_of_xray'),
+    ('Severity level', 'severity'),
+    ('Top pathology', 'top_pathology'),
+    ('Max probability', 'max_probability'),
+]
+
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS] + list(PATHOLOGY_FIELDS.values())
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer streaming"""
+
+    def write(self, value):
+        return value
+
+
+def _unpack_scores(scores, version):
+    """Return the scores in PATHOLOGY_FIELDS order, whatever label set they were packed with"""
+    if not scores:
+        return [None] * len(PATHOLOGY_FIELDS)
+    by_name = dict(zip(PATHOLOGY_LABEL_SETS[version], scores))
+    return [by_name.get(field_name) for field_name in PATHOLOGY_FIELDS]
+
+
+async def export_rows(queryset):
+    """Yield export rows as lists, fetching them chunk by chunk"""
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS] + ['pathology_scores', 'pathology_labels_version']
+    # Severity comes from the SQL annotation, so rows never stored with a level still get one
+    rows = (queryset.with_severity().order_by('-created_at', '-id')
+            .values_list(*lookups).aiterator(chunk_size=EXPORT_CHUNK_SIZE))
+    async for *values, scores, version in rows:
+        yield values + _unpack_scores(scores, version)
+
+
+def _local_naive(value):
+    """Convert aware datetimes to naive local time (XLSX cannot store time zones)"""
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+async def stream_csv(queryset):
+    """Yield the export as CSV lines"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    async for row in export_rows(queryset):
+        yield writer.writerow([_local_naive(value) for value in row])
+
+
+async def stream_xlsx(queryset):
+    """
+    Yield the export as an XLSX file
+
+    The write-only workbook spools rows to disk as they are appended, so memory
+    stays flat; the finished file is then sent in blocks.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Prediction history')
+    sheet.append(EXPORT_HEADERS)
+    async for row in export_rows(queryset):
+        sheet.append([_local_naive(value) for value in row])
+
+    with tempfile.TemporaryFile() as output:
+        await sync_to_async(workbook.save)(output)
+        output.seek(0)
+        while True:
+            block = await sync_to_async(output.read)(XLSX_STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
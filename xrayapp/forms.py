@@ -8,9 +8,48 @@ try:
     MAGIC_AVAILABLE = True
 except ImportError:
     MAGIC_AVAILABLE = False
+from PIL import Image
 from .models import XRayImage, PredictionHistory, UserProfile
+from .uploads import UPLOAD_HEADER_SIZE
 from django.contrib.auth.models import User
 
+# Upper bound on either image side; larger images are rejected before decoding
+MAX_IMAGE_DIMENSION = 10000
+
+
+class HeaderOnlyImageField(forms.ImageField):
+    """
+    ImageField that validates from the image header only.
+    
+    The default ImageField runs PIL's verify(), which reads the whole file.
+    Here PIL only parses the header (format and dimensions); pixel data is
+    decoded later by the processing pipeline.
+    """
+    
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+        
+        try:
+            source = data.temporary_file_path() if hasattr(data, 'temporary_file_path') else data
+            # Image.open parses the header only; closing keeps format and size available
+            with Image.open(source) as image:
+                pass
+        except Exception as exc:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            ) from exc
+        
+        # Annotate the file like ImageField does
+        f.image = image
+        f.content_type = Image.MIME.get(image.format)
+        if hasattr(f, 'seek') and callable(f.seek):
+            f.seek(0)
+        return f
+
+
 class XRayUploadForm(forms.ModelForm):
     class Meta:
         model = XRayImage
@@ -23,6 +62,9 @@ class XRayUploadForm(forms.ModelForm):
             'gender': forms.Select(choices=[('', _('--Select--')), ('male', _('Male')), ('female', _('Female')), ('other', _('Other'))]),
             'additional_info': forms.Textarea(attrs={'rows': 3, 'maxlength': 1000}),
         }
+        field_classes = {
+            'image': HeaderOnlyImageField,
+        }
     
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
@@ -60,8 +102,12 @@ class XRayUploadForm(forms.ModelForm):
         # Check MIME type for security if magic is available
         if MAGIC_AVAILABLE:
             try:
-                file_mime = magic.from_buffer(image.read(), mime=True)
-                image.seek(0)  # Reset file pointer
+                # Only the first few KB are needed; the upload handler keeps them while streaming
+                header = getattr(image, 'header', None)
+                if header is None:
+                    header = image.read(UPLOAD_HEADER_SIZE)
+                    image.seek(0)  # Reset file pointer
+                file_mime = magic.from_buffer(header, mime=True)
                 
                 allowed_mimes = [
                     'image/jpeg', 'image/jpg', 'image/png', 
@@ -70,9 +116,23 @@ class XRayUploadForm(forms.ModelForm):
                 
                 if file_mime not in allowed_mimes:
                     raise ValidationError(_('Invalid file type. Only image files are allowed.'))
+            except ValidationError:
+                raise
             except Exception:
                 # If magic fails, rely on Django's validation
                 pass
+        
+        # Dimensions come from the header parsed by HeaderOnlyImageField
+        pil_image = getattr(image, 'image', None)
+        if pil_image is not None:
+            width, height = pil_image.size
+            if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION:
+                raise ValidationError(_('Image dimensions too large. Maximum is %(max)s pixels per side.') % {
+                    'max': MAX_IMAGE_DIMENSION
+                })
+        
+        # Content hash computed while the upload was streamed to disk
+        self.instance.content_hash = getattr(image, 'content_hash', '') or ''
             
         return image
     
@@ -158,6 +218,32 @@ class PredictionHistoryFilterForm(forms.Form):
         initial=0.5,
         widget=forms.NumberInput(attrs={'step': '0.01'})
     )
+    any_pathology_threshold = forms.FloatField(
+        required=False,
+        min_value=0.0,
+        max_value=1.0,
+        label=_("Any Pathology Above"),
+        widget=forms.NumberInput(attrs={'step': '0.01'})
+    )
+    severity_level = forms.ChoiceField(
+        choices=[
+            ('', _('All')),
+            ('1', _('Insignificant findings')),
+            ('2', _('Moderate findings')),
+            ('3', _('Significant findings')),
+        ],
+        required=False,
+        label=_("Severity")
+    )
+    sort_by = forms.ChoiceField(
+        choices=[
+            ('', _('Newest first')),
+            ('probability', _('Highest probability first')),
+            ('severity', _('Highest severity first')),
+        ],
+        required=False,
+        label=_("Sort by")
+    )
     records_per_page = forms.ChoiceField(
         choices=[
             ('25', '25'),
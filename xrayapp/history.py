@@ -0,0 +1,195 @@
+"""
+Bulk writes of prediction history.
+
+Batch back-scoring and re-scoring produce history for many X-rays at once.
+Instead of one save() per record, scores are stacked into a NumPy matrix, the
+top pathology, max probability and severity of every row are computed in one
+vectorized pass, and rows are written with bulk_create/bulk_update in chunks
+inside a single transaction. Bulk writes send no signals, so the hospital
+statistics of the days written are refreshed here once the batch commits.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import (PATHOLOGY_FIELDS, PATHOLOGY_LABEL_SETS, PATHOLOGY_LABELS_VERSION, PATHOLOGY_SCORE_FIELDS,
+                     SEVERITY_MAX_LEVEL, SEVERITY_THRESHOLDS, TOP_PATHOLOGY_FIELDS, PredictionHistory)
+from .stats import days_by_hospital, refresh_days
+
+logger = logging.getLogger(__name__)
+
+# Model output labels that differ from the display names in PATHOLOGY_FIELDS
+MODEL_OUTPUT_LABELS = {
+    'pleural_thickening': 'Pleural_Thickening',
+}
+
+# Pathologies only the DenseNet model scores; other models leave them unchanged
+DENSENET_ONLY_PATHOLOGIES = ('enlarged_cardiomediastinum', 'lung_lesion')
+
+# Columns rewritten when existing history is re-scored
+RESCORED_FIELDS = PATHOLOGY_SCORE_FIELDS + TOP_PATHOLOGY_FIELDS + ['severity_level', 'model_used']
+
+_CURRENT_LABELS = PATHOLOGY_LABEL_SETS[PATHOLOGY_LABELS_VERSION]
+_DISPLAY_NAMES = np.array([PATHOLOGY_FIELDS[field_name] for field_name in _CURRENT_LABELS])
+
+
+def scores_from_results(results):
+    """
+    Map model output to pathology field names
+
+    Pathologies only DenseNet scores are left out when missing, so they keep
+    their previous value; other missing pathologies are None.
+
+    Args:
+        results: Dictionary of model output label to probability
+
+    Returns:
+        Dictionary of pathology field name to probability
+    """
+    scores = {field_name: results.get(MODEL_OUTPUT_LABELS.get(field_name, display_name))
+              for field_name, display_name in PATHOLOGY_FIELDS.items()}
+    for field_name in DENSENET_ONLY_PATHOLOGIES:
+        if MODEL_OUTPUT_LABELS.get(field_name, PATHOLOGY_FIELDS[field_name]) not in results:
+            del scores[field_name]
+    return scores
+
+
+def score_matrix(score_dicts):
+    """
+    Stack pathology scores into a float32 matrix in the current label order
+
+    Missing scores are NaN. float32 matches the real[] column, so summaries
+    computed here agree with what is read back from the database.
+    """
+    matrix = np.full((len(score_dicts), len(_CURRENT_LABELS)), np.nan, dtype=np.float32)
+    for row, scores in enumerate(score_dicts):
+        for column, field_name in enumerate(_CURRENT_LABELS):
+            value = scores.get(field_name)
+            if value is not None:
+                matrix[row, column] = value
+    return matrix
+
+
+def summarize_scores(matrix):
+    """
+    Vectorized top pathology, max probability and severity level per row
+
+    Same rules as compute_top_pathology() and severity_for_scores(): the first
+    highest score wins, and severity buckets the mean of the available scores.
+
+    Args:
+        matrix: (rows, pathologies) float32 matrix with NaN for missing scores
+
+    Returns:
+        Tuple of arrays (top_pathology, max_probability, severity_level); rows
+        without scores get '', NaN and 0 respectively
+    """
+    values = matrix.astype(np.float64)
+    valid = ~np.isnan(values)
+    has_scores = valid.any(axis=1)
+
+    ranked = np.where(valid, values, -np.inf)
+    top_index = ranked.argmax(axis=1)
+    top_pathology = np.where(has_scores, _DISPLAY_NAMES[top_index], '')
+    max_probability = np.where(has_scores, ranked.max(axis=1), np.nan)
+
+    counts = valid.sum(axis=1)
+    means = np.where(valid, values, 0.0).sum(axis=1) / np.maximum(counts, 1)
+    severity_level = np.full(len(values), SEVERITY_MAX_LEVEL, dtype=np.int64)
+    # Highest bound first, so lower buckets overwrite it
+    for upper_bound, level in sorted(SEVERITY_THRESHOLDS, reverse=True):
+        severity_level[means <= upper_bound] = level
+    severity_level[~has_scores] = 0
+    return top_pathology, max_probability, severity_level
+
+
+def _apply_scores(records, matrix):
+    """Set packed scores and their summaries on history records"""
+    top_pathology, max_probability, severity_level = summarize_scores(matrix)
+    for row, record in enumerate(records):
+        has_scores = bool(top_pathology[row])
+        record.pathology_scores = [None if np.isnan(value) else float(value) for value in matrix[row]] \
+            if has_scores else None
+        record.pathology_labels_version = PATHOLOGY_LABELS_VERSION
+        record.top_pathology = str(top_pathology[row])
+        record.max_probability = float(max_probability[row]) if has_scores else None
+        record.severity_level = int(severity_level[row]) if has_scores else None
+
+
+def _chunks(entries, chunk_size):
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _create_chunk(chunk):
+    records = [
+        PredictionHistory(user_id=xray.user_id, xray=xray, hospital=xray.hospital, model_used=model_used)
+        for xray, model_used, _scores in chunk
+    ]
+    _apply_scores(records, score_matrix([scores for _xray, _model_used, scores in chunk]))
+    PredictionHistory.objects.bulk_create(records, batch_size=len(records))
+    return records
+
+
+def _update_chunk(chunk):
+    # Latest history record of every X-ray in the chunk (DISTINCT ON)
+    latest = {
+        record.xray_id: record
+        for record in PredictionHistory.objects.filter(xray_id__in=[xray.pk for xray, _, _ in chunk])
+        .order_by('xray_id', '-created_at').distinct('xray_id')
+    }
+    records, score_dicts = [], []
+    for xray, model_used, scores in chunk:
+        record = latest.get(xray.pk)
+        if record is None:
+            continue
+        # Pathologies the new model does not score keep their stored value
+        merged = {field_name: record.get_pathology_score(field_name) for field_name in _CURRENT_LABELS}
+        merged.update(scores)
+        record.model_used = model_used
+        records.append(record)
+        score_dicts.append(merged)
+    if records:
+        _apply_scores(records, score_matrix(score_dicts))
+        PredictionHistory.objects.bulk_update(records, RESCORED_FIELDS, batch_size=len(records))
+    return records
+
+
+def bulk_write_prediction_history(entries, update_existing=False, chunk_size=None):
+    """
+    Write prediction history for many X-rays at once
+
+    All chunks are written in one transaction, so a failed batch leaves no
+    partial history behind. X-rays without a user are skipped, as in
+    create_prediction_history().
+
+    Args:
+        entries: Iterable of (xray, model_used, scores) tuples, where scores maps
+            pathology field names to probabilities (see scores_from_results())
+        update_existing: Re-score the latest history record of each X-ray
+            instead of creating new records
+        chunk_size: Records per INSERT/UPDATE (defaults to HISTORY_BULK_CHUNK_SIZE)
+
+    Returns:
+        Number of records created or updated
+    """
+    chunk_size = chunk_size or settings.HISTORY_BULK_CHUNK_SIZE
+    entries = (entry for entry in entries if entry[0].user_id is not None)
+    write_chunk = _update_chunk if update_existing else _create_chunk
+
+    records = []
+    with transaction.atomic():
+        for chunk in _chunks(entries, chunk_size):
+            records.extend(write_chunk(chunk))
+    refresh_days(days_by_hospital(records))
+    written = len(records)
+    logger.info(f"{'Updated' if update_existing else 'Created'} {written} prediction history records in bulk")
+    return written
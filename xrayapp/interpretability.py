@@ -1,8 +1,9 @@
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
 import torch
 import torch.nn.functional as F
-import torchvision
-import skimage
 import cv2
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend to avoid Tkinter threading issues
@@ -10,6 +11,11 @@ import matplotlib.pyplot as plt
 from pathlib import Path
 import torchxrayvision as xrv
 
+from .preprocessing import preprocess_image
+
+# Memory a single SmoothGrad batch may use when only a time budget is given
+DEFAULT_BATCH_MEMORY_MB = 512
+
 
 def disable_inplace_relu(model):
     """
@@ -22,6 +28,45 @@ def disable_inplace_relu(model):
     return model
 
 
+# In-place ReLU modules turned off per shared model, restored once its last Grad-CAM pass ends
+_inplace_lock = threading.Lock()
+_inplace_disabled = {}
+
+
+@contextmanager
+def inplace_relu_disabled(model):
+    """
+    Temporarily disable in-place ReLU operations in a shared model
+    
+    Concurrent passes over the same model share one disabled state, so a pass
+    finishing never re-enables in-place ReLU under another one still running.
+    Other requests only see the non in-place modules meanwhile, which compute
+    the same outputs.
+    
+    Args:
+        model: Model whose ReLU modules are switched
+    """
+    key = id(model)
+    with _inplace_lock:
+        state = _inplace_disabled.get(key)
+        if state is None:
+            modules = [module for module in model.modules()
+                       if isinstance(module, torch.nn.ReLU) and module.inplace]
+            for module in modules:
+                module.inplace = False
+            state = _inplace_disabled[key] = {'modules': modules, 'users': 0}
+        state['users'] += 1
+    try:
+        yield model
+    finally:
+        with _inplace_lock:
+            state['users'] -= 1
+            if state['users'] == 0:
+                for module in state['modules']:
+                    module.inplace = True
+                del _inplace_disabled[key]
+
+
 class NoInplaceReLU(torch.nn.Module):
     """
     A wrapper module that ensures no in-place ReLU operations are performed.
@@ -40,6 +85,57 @@ class NoInplaceReLU(torch.nn.Module):
         return self.model(x)
         
 
+def _pathology_index(model, model_type, target_class):
+    """Resolve a pathology name to its output index (indices are returned unchanged)"""
+    if not isinstance(target_class, str):
+        return target_class
+    # ResNet outputs follow default_pathologies, DenseNet uses its own list
+    if model_type == 'resnet':
+        return xrv.datasets.default_pathologies.index(target_class)
+    return model.pathologies.index(target_class)
+
+
+def gradcam_heatmap(activations, gradients):
+    """
+    Compute a normalized Grad-CAM heatmap from target layer activations and gradients
+    
+    Args:
+        activations: Target layer activations of shape (1, C, H, W)
+        gradients: Gradients of the target score w.r.t. the activations
+    
+    Returns:
+        heatmap: Numpy array in [0, 1] with shape (H, W)
+    """
+    # Calculate weights based on global average pooling of gradients
+    pooled_gradients = torch.mean(gradients, dim=[0, 2, 3])
+    
+    # Weight activation maps with gradients (out of place, activations may be part of a graph)
+    weighted_activations = activations.detach() * pooled_gradients.view(1, -1, 1, 1)
+    
+    # Global average pooling of weighted activation maps
+    heatmap = torch.mean(weighted_activations, dim=1).squeeze().cpu().numpy()
+    
+    # ReLU on heatmap
+    heatmap = np.maximum(heatmap, 0)
+    
+    # Normalize heatmap
+    if np.max(heatmap) > 0:
+        heatmap = heatmap / np.max(heatmap)
+    else:
+        # If heatmap is all zeros, create a fallback minimal heatmap
+        print("Warning: GRAD-CAM heatmap is all zeros. Creating fallback.")
+        heatmap = np.ones_like(heatmap) * 0.1
+    
+    return heatmap
+
+
+def gradcam_target_layer(model, model_type):
+    """Return the Grad-CAM target layer of an (unwrapped) torchxrayvision model"""
+    if model_type == 'resnet':
+        return model.model.layer4[-1]
+    return model.features.denseblock4.denselayer16.norm2
+
+
 class GradCAM:
     """
     Grad-CAM implementation for DenseNet-121 and other convolutional networks
@@ -150,35 +246,12 @@ class GradCAM:
         if self.activations is None:
             raise RuntimeError("Activations not captured. Check if target layer is correct.")
         
-        # Calculate weights based on global average pooling of gradients
-        pooled_gradients = torch.mean(self.gradients, dim=[0, 2, 3])
-        
-        # Create a copy of activations to avoid in-place modifications
-        # of tensors that are part of the computation graph
-        activations = self.activations.clone()
-        
-        # Weight activation maps with gradients (without in-place operations)
-        weighted_activations = torch.zeros_like(activations)
-        for i in range(pooled_gradients.shape[0]):
-            weighted_activations[:, i, :, :] = activations[:, i, :, :] * pooled_gradients[i]
-        
-        # Global average pooling of weighted activation maps
-        heatmap = torch.mean(weighted_activations, dim=1).squeeze().cpu().detach().numpy()
-        
-        # ReLU on heatmap
-        heatmap = np.maximum(heatmap, 0)
-        
-        # Normalize heatmap
-        if np.max(heatmap) > 0:
-            heatmap = heatmap / np.max(heatmap)
-        else:
-            # If heatmap is all zeros, create a fallback minimal heatmap
-            print("Warning: GRAD-CAM heatmap is all zeros. Creating fallback.")
-            heatmap = np.ones_like(heatmap) * 0.1
+        heatmap = gradcam_heatmap(self.activations, self.gradients)
         
         return heatmap, output
     
-    def overlay_heatmap(self, img, heatmap, alpha=0.4, colormap=cv2.COLORMAP_JET):
+    @staticmethod
+    def overlay_heatmap(img, heatmap, alpha=0.4, colormap=cv2.COLORMAP_JET):
         """
         Overlay heatmap on original image
         
@@ -417,7 +490,121 @@ class PixelLevelInterpretability:
         
         return saliency_map, output
     
-    def apply_smoothgrad(self, input_tensor, target_class=None, n_samples=15, noise_level=0.1):
+    def generate_saliency_batch(self, input_batch, target_class):
+        """
+        Generate saliency maps for a batch of inputs in a single forward/backward pass
+        
+        Args:
+            input_batch: Input tensor with shape (N, C, H, W)
+            target_class: Index of the target class
+        
+        Returns:
+            saliency_maps: List of N normalized saliency maps (numpy arrays)
+        """
+        input_grad = input_batch.clone().detach().requires_grad_(True)
+        
+        self.model.zero_grad()
+        output = self.model(input_grad)
+        
+        # Samples are independent, so one backward pass yields every input gradient
+        one_hot = torch.zeros_like(output)
+        one_hot[:, target_class] = 1
+        output.backward(gradient=one_hot)
+        
+        grad_data = input_grad.grad.data.clone().abs().cpu().numpy()
+        
+        saliency_maps = []
+        for sample_grad in grad_data:
+            # Same post-processing as generate_saliency, applied per sample
+            saliency_map = cv2.GaussianBlur(sample_grad.squeeze(), (5, 5), 0)
+            if np.max(saliency_map) > 0:
+                saliency_map = saliency_map / np.max(saliency_map)
+            saliency_maps.append(saliency_map)
+        
+        return saliency_maps
+    
+    def measure_saliency_cost(self, input_tensor, target_class):
+        """
+        Measure the cost of a single saliency sample
+        
+        Runs one guided backpropagation pass while recording the size of every
+        intermediate activation. Activations are kept alive for the backward pass
+        and mirrored by their gradients, so twice their total size is used as the
+        per-sample memory estimate.
+        
+        Args:
+            input_tensor: Input tensor with shape (1, C, H, W)
+            target_class: Index of the target class
+        
+        Returns:
+            seconds: Wall time of one saliency sample
+            memory_bytes: Estimated peak memory of one saliency sample
+        """
+        activation_bytes = [0]
+        
+        def size_hook(module, input, output):
+            if isinstance(output, torch.Tensor):
+                activation_bytes[0] += output.numel() * output.element_size()
+        
+        handles = [
+            module.register_forward_hook(size_hook)
+            for module in self.model.modules()
+            if len(list(module.children())) == 0
+        ]
+        try:
+            start = time.perf_counter()
+            self.generate_saliency_batch(input_tensor, target_class)
+            seconds = time.perf_counter() - start
+        finally:
+            for handle in handles:
+                handle.remove()
+        
+        memory_bytes = 2 * activation_bytes[0] + input_tensor.numel() * input_tensor.element_size()
+        return seconds, memory_bytes
+    
+    def plan_smoothgrad(self, input_tensor, target_class, max_seconds=None, max_memory_mb=None,
+                        n_targets=1, max_samples=15, min_samples=1):
+        """
+        Choose the SmoothGrad sample count and batch size that fit a time and memory budget
+        
+        Args:
+            input_tensor: Input tensor with shape (1, C, H, W)
+            target_class: Index of the target class used for calibration
+            max_seconds: Wall time budget for all targets (None for no limit)
+            max_memory_mb: Peak memory budget for one batch (None for DEFAULT_BATCH_MEMORY_MB)
+            n_targets: Number of pathologies that will share the time budget
+            max_samples: Upper bound on the sample count (the unbudgeted default)
+            min_samples: Lower bound on the sample count
+        
+        Returns:
+            Dictionary with the effective SmoothGrad parameters
+        """
+        start = time.perf_counter()
+        per_sample_seconds, per_sample_bytes = self.measure_saliency_cost(input_tensor, target_class)
+        calibration_seconds = time.perf_counter() - start
+        
+        n_samples = max_samples
+        if max_seconds is not None:
+            remaining = max(max_seconds - calibration_seconds, 0)
+            affordable = int(remaining / (max(per_sample_seconds, 1e-6) * max(n_targets, 1)))
+            n_samples = max(min_samples, min(max_samples, affordable))
+        
+        # Batching never exceeds a memory limit, even when only time is budgeted
+        memory_limit_mb = max_memory_mb if max_memory_mb is not None else DEFAULT_BATCH_MEMORY_MB
+        affordable = int(memory_limit_mb * 1024 * 1024 / max(per_sample_bytes, 1))
+        batch_size = max(1, min(n_samples, affordable))
+        
+        return {
+            'n_samples': n_samples,
+            'batch_size': batch_size,
+            'n_targets': n_targets,
+            'per_sample_seconds': round(per_sample_seconds, 4),
+            'per_sample_memory_mb': round(per_sample_bytes / (1024 * 1024), 1),
+            'max_seconds': max_seconds,
+            'max_memory_mb': max_memory_mb,
+        }
+    
+    def apply_smoothgrad(self, input_tensor, target_class=None, n_samples=15, noise_level=0.1, batch_size=1):
         """
         Apply SmoothGrad technique to reduce visual noise in saliency maps
         
@@ -426,6 +613,7 @@ class PixelLevelInterpretability:
             target_class: Index of the target class
             n_samples: Number of noisy samples to generate
             noise_level: Standard deviation of Gaussian noise
+            batch_size: Number of noisy samples pushed through the model at once
         
         Returns:
             smooth_saliency: Smoothed saliency map
@@ -458,19 +646,25 @@ class PixelLevelInterpretability:
         # Initialize an empty saliency map
         smooth_saliency = np.zeros_like(input_tensor.squeeze().cpu().numpy())
         
-        # Generate multiple noisy samples and average their saliency maps
-        for _ in range(n_samples):
-            # Generate Gaussian noise
-            noise = torch.normal(0, stdev, size=input_tensor.shape, device=input_tensor.device)
+        # Generate noisy samples in chunks of batch_size and accumulate their saliency maps
+        batch_size = max(1, min(batch_size, n_samples))
+        remaining = n_samples
+        while remaining > 0:
+            chunk = min(batch_size, remaining)
+            
+            # Generate Gaussian noise for every sample in the chunk
+            batch_shape = (chunk,) + tuple(input_tensor.shape[1:])
+            noise = torch.normal(0, stdev, size=batch_shape, device=input_tensor.device)
             
             # Add noise to the input (create a new tensor rather than modifying in-place)
-            noisy_input = input_tensor.clone() + noise
+            noisy_input = input_tensor.expand(batch_shape).clone() + noise
             
-            # Compute saliency map for the noisy input
-            saliency, _ = self.generate_saliency(noisy_input, target_class)
+            # Compute saliency maps for the noisy inputs
+            for saliency in self.generate_saliency_batch(noisy_input, target_class):
+                # Add to the accumulated saliency map
+                smooth_saliency = smooth_saliency + saliency
             
-            # Add to the accumulated saliency map
-            smooth_saliency = smooth_saliency + saliency
+            remaining -= chunk
         
         # Average the saliency maps
         smooth_saliency = smooth_saliency / n_samples
@@ -488,7 +682,8 @@ class PixelLevelInterpretability:
         # Release hooks when object is deleted
         self._release_hooks()
     
-    def get_combined_saliency(self, input_tensor, probability_threshold=0.5, use_smoothgrad=True, n_samples=15, noise_level=0.1):
+    def get_combined_saliency(self, input_tensor, probability_threshold=0.5, use_smoothgrad=True, n_samples=15, noise_level=0.1,
+                              batch_size=1, max_seconds=None, max_memory_mb=None):
         """
         Generate a combined saliency map for all pathologies above threshold
         
@@ -498,11 +693,16 @@ class PixelLevelInterpretability:
             use_smoothgrad: Whether to use SmoothGrad technique (default: True)
             n_samples: Number of samples for SmoothGrad (default: 15)
             noise_level: Noise level for SmoothGrad (default: 0.1)
+            batch_size: Number of SmoothGrad samples per forward pass (default: 1)
+            max_seconds: Wall time budget shared by all pathologies (default: None)
+            max_memory_mb: Peak memory budget per batch (default: None)
         
         Returns:
             combined_saliency: Numpy array representing the combined saliency map
             selected_pathologies: List of pathology names and their probabilities above threshold
             output: Model output logits
+        
+        The effective SmoothGrad parameters are stored in ``self.last_parameters``.
         """
         # Forward pass to get predictions
         with torch.no_grad():
@@ -542,13 +742,27 @@ class PixelLevelInterpretability:
         for pathology, prob in selected_pathologies:
             print(f"  {pathology}: {prob:.3f}")
         
+        # Fit the sample count and batch size to the budget, shared by all selected pathologies
+        self.last_parameters = {
+            'n_samples': n_samples if use_smoothgrad else 1,
+            'batch_size': batch_size,
+            'n_targets': len(selected_indices),
+        }
+        if use_smoothgrad and (max_seconds is not None or max_memory_mb is not None):
+            self.last_parameters = self.plan_smoothgrad(
+                input_tensor, selected_indices[0], max_seconds=max_seconds, max_memory_mb=max_memory_mb,
+                n_targets=len(selected_indices), max_samples=n_samples
+            )
+            n_samples = self.last_parameters['n_samples']
+            batch_size = self.last_parameters['batch_size']
+        
         # Generate combined saliency map
         combined_saliency = None
         
         for i, target_class in enumerate(selected_indices):
             # Generate saliency map for this specific pathology
             if use_smoothgrad:
-                saliency_map, _ = self.apply_smoothgrad(input_tensor, target_class, n_samples, noise_level)
+                saliency_map, _ = self.apply_smoothgrad(input_tensor, target_class, n_samples, noise_level, batch_size)
             else:
                 saliency_map, _ = self.generate_saliency(input_tensor, target_class)
             
@@ -569,142 +783,89 @@ class PixelLevelInterpretability:
         return combined_saliency, selected_pathologies, output
 
 
-def apply_gradcam(image_path, model_type='densenet', target_class=None):
+def gradcam_from_forward(model, model_type, img_tensor, original_vis, target_class=None):
     """
-    Apply Grad-CAM to an X-ray image
+    Run one grad-enabled forward pass and compute Grad-CAM from its graph
+    
+    The same output provides the predictions and the default target class, so
+    callers that also need classification results do not run a second pass.
+    The model may be the shared cached model: the activation is captured only
+    for the calling thread's forward pass and gradients are taken with
+    torch.autograd.grad rather than a backward hook on the module.
     
     Args:
-        image_path: Path to the image
+        model: Unwrapped torchxrayvision model
         model_type: 'densenet' or 'resnet'
-        target_class: Target class for Grad-CAM visualization
+        img_tensor: Preprocessed input tensor of shape (1, 1, H, W)
+        original_vis: Image scaled to [0, 1] for the overlay
+        target_class: Pathology name to explain (defaults to the highest scoring class)
         
     Returns:
-        Dictionary with visualization results
+        output: Detached model output of shape (1, n_classes)
+        cam_results: Dictionary with visualization results
     """
-    # Load model
-    if model_type == 'resnet':
-        model = xrv.models.ResNet(weights="resnet50-res512-all")
-        resize_dim = 512
-    else:
-        model = xrv.models.DenseNet(weights="densenet121-res224-all")
-        resize_dim = 224
-    
-    # Wrap model to prevent in-place operations
-    wrapped_model = NoInplaceReLU(model)
-    
-    # Determine appropriate target layer based on model type
-    if model_type == 'resnet':
-        # Explicitly specify target layer for ResNet
-        target_layer = wrapped_model.model.model.layer4[-1]
-    else:
-        # Explicitly specify target layer for DenseNet
-        target_layer = wrapped_model.model.features.denseblock4.denselayer16.norm2
+    target_layer = gradcam_target_layer(model, model_type)
     
-    # Load and preprocess the image
-    img = skimage.io.imread(image_path)
-    img = xrv.datasets.normalize(img, 255)
-    
-    # Preserve original image for visualization
-    original_img = img.copy()
-    
-    # Check that images are 2D arrays
-    if len(img.shape) > 2:
-        img = img[:, :, 0]  # Take first channel instead of averaging
-    if len(img.shape) < 2:
-        raise ValueError("Input image must have at least 2 dimensions")
-    
-    # Add channel dimension
-    img = img[None, :, :]
-    
-    # Set up transformation pipeline
-    if model_type == 'densenet':
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayCenterCrop(),
-            xrv.datasets.XRayResizer(224)
-        ])
-        resize_dim = 224
-    else:  # resnet
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayResizer(512),
-            xrv.datasets.XRayCenterCrop()
-        ])
-        resize_dim = 512
-    
-    # Apply transforms
-    img = transform(img)
-    
-    # Convert to tensor
-    img_tensor = torch.from_numpy(img)
-    
-    # Add batch dimension
-    if len(img_tensor.shape) < 3:
-        img_tensor = img_tensor.unsqueeze(0).unsqueeze(0)
-    elif len(img_tensor.shape) == 3:
-        img_tensor = img_tensor.unsqueeze(0)
+    captured = {}
+    owner = threading.get_ident()
     
-    # Get model predictions to determine target class if not provided
-    wrapped_model.eval()
-    with torch.no_grad():
-        try:
-            preds = wrapped_model(img_tensor)
-        except RuntimeError as e:
-            if "could not create a primitive" in str(e):
-                print("Warning: PyTorch primitive error. Using CPU fallback.")
-                wrapped_model = wrapped_model.cpu()
-                img_tensor = img_tensor.cpu()
-                preds = wrapped_model(img_tensor)
-            else:
-                raise e
+    def forward_hook(module, input, output):
+        if threading.get_ident() == owner:
+            captured['activations'] = output
     
-    # If target_class is not provided, use the class with the highest probability
-    if target_class is None:
-        pred_idx = torch.argmax(preds).item()
-        # For ResNet, we need to get the pathology name from default_pathologies
-        if model_type == 'resnet':
-            target_class = xrv.datasets.default_pathologies[pred_idx]
-        else:
-            target_class = wrapped_model.pathologies[pred_idx]
-    elif isinstance(target_class, str):
-        # If target_class is a pathology name, validate it exists
-        if model_type == 'resnet':
-            if target_class not in xrv.datasets.default_pathologies:
-                print(f"Pathology {target_class} not found. Using highest probability class.")
-                pred_idx = torch.argmax(preds).item()
-                target_class = xrv.datasets.default_pathologies[pred_idx]
-        else:
-            try:
-                target_class_idx = wrapped_model.pathologies.index(target_class)
-            except ValueError:
-                print(f"Pathology {target_class} not found in model. Using highest probability class.")
-                pred_idx = torch.argmax(preds).item()
-                target_class = wrapped_model.pathologies[pred_idx]
-    
-    # Initialize Grad-CAM with explicit target layer
-    gradcam = GradCAM(wrapped_model, target_layer=target_layer)
-    
-    # Get heatmap
-    heatmap, _ = gradcam.get_heatmap(img_tensor, target_class)
-    
-    # Convert original image to a suitable format for visualization
-    original_vis = original_img
-    if len(original_vis.shape) > 2:
-        original_vis = original_vis[:, :, 0]  # Take first channel for visualization
-    
-    # Scale to [0, 1] for visualization
-    original_vis = (original_vis - original_vis.min()) / (original_vis.max() - original_vis.min() + 1e-8)
+    handle = target_layer.register_forward_hook(forward_hook)
+    try:
+        # In-place ReLU after the target layer would overwrite the captured activation
+        with inplace_relu_disabled(model), torch.enable_grad():
+            output = model(img_tensor)
+    finally:
+        handle.remove()
+    
+    activations = captured.get('activations')
+    if activations is None:
+        raise RuntimeError("Activations not captured. Check if target layer is correct.")
+    
+    # Resolve the target from the same output, falling back to the highest scoring class
+    pathology_names = xrv.datasets.default_pathologies if model_type == 'resnet' else model.pathologies
+    if isinstance(target_class, str) and target_class in pathology_names:
+        target_idx = pathology_names.index(target_class)
+    else:
+        if target_class is not None:
+            print(f"Pathology {target_class} not found in model. Using highest probability class.")
+        target_idx = torch.argmax(output[0]).item()
+        target_class = pathology_names[target_idx]
     
-    # Overlay heatmap on original image
-    overlaid_img = gradcam.overlay_heatmap(original_vis, heatmap)
+    gradients = torch.autograd.grad(output[0, target_idx], activations)[0]
+    heatmap = gradcam_heatmap(activations, gradients)
     
-    # Return results
-    return {
+    return output.detach(), {
         'original': original_vis,
         'heatmap': heatmap,
-        'overlay': overlaid_img,
+        'overlay': GradCAM.overlay_heatmap(original_vis, heatmap),
         'target_class': target_class
     }
 
 
+def apply_gradcam(image_path, model_type='densenet', target_class=None):
+    """
+    Apply Grad-CAM to an X-ray image
+    
+    Args:
+        image_path: Path to the image
+        model_type: 'densenet' or 'resnet'
+        target_class: Target class for Grad-CAM visualization
+        
+    Returns:
+        Dictionary with visualization results
+    """
+    # Shared cached model and preprocessing; one forward pass picks the target and feeds the backward
+    model = _get_cached_model(model_type)
+    img_tensor, original_vis = preprocess_image(image_path, model_type)
+    
+    _, cam_results = gradcam_from_forward(model, model_type, img_tensor, original_vis, target_class)
+    return cam_results
+
+
 def apply_combined_gradcam(image_path, model_type='densenet', probability_threshold=0.5):
     """
     Apply combined interpretability to an X-ray image for all pathologies above threshold
@@ -720,10 +881,8 @@ def apply_combined_gradcam(image_path, model_type='densenet', probability_thresh
     # Load model
     if model_type == 'resnet':
         model = xrv.models.ResNet(weights="resnet50-res512-all")
-        resize_dim = 512
     else:
         model = xrv.models.DenseNet(weights="densenet121-res224-all")
-        resize_dim = 224
     
     # Wrap model to prevent in-place operations
     wrapped_model = NoInplaceReLU(model)
@@ -736,47 +895,8 @@ def apply_combined_gradcam(image_path, model_type='densenet', probability_thresh
         # Explicitly specify target layer for DenseNet
         target_layer = wrapped_model.model.features.denseblock4.denselayer16.norm2
     
-    # Load and preprocess the image
-    img = skimage.io.imread(image_path)
-    img = xrv.datasets.normalize(img, 255)
-    
-    # Preserve original image for visualization
-    original_img = img.copy()
-    
-    # Check that images are 2D arrays
-    if len(img.shape) > 2:
-        img = img[:, :, 0]  # Take first channel instead of averaging
-    if len(img.shape) < 2:
-        raise ValueError("Input image must have at least 2 dimensions")
-    
-    # Add channel dimension
-    img = img[None, :, :]
-    
-    # Set up transformation pipeline
-    if model_type == 'densenet':
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayCenterCrop(),
-            xrv.datasets.XRayResizer(224)
-        ])
-        resize_dim = 224
-    else:  # resnet
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayResizer(512),
-            xrv.datasets.XRayCenterCrop()
-        ])
-        resize_dim = 512
-    
-    # Apply transforms
-    img = transform(img)
-    
-    # Convert to tensor
-    img_tensor = torch.from_numpy(img)
-    
-    # Add batch dimension
-    if len(img_tensor.shape) < 3:
-        img_tensor = img_tensor.unsqueeze(0).unsqueeze(0)
-    elif len(img_tensor.shape) == 3:
-        img_tensor = img_tensor.unsqueeze(0)
+    # Load and preprocess the image (shared with classification via the preprocessing cache)
+    img_tensor, original_vis = preprocess_image(image_path, model_type)
     
     # Initialize Grad-CAM with explicit target layer
     gradcam = GradCAM(wrapped_model, target_layer=target_layer)
@@ -786,14 +906,6 @@ def apply_combined_gradcam(image_path, model_type='densenet', probability_thresh
         img_tensor, probability_threshold=probability_threshold
     )
     
-    # Convert original image to a suitable format for visualization
-    original_vis = original_img
-    if len(original_vis.shape) > 2:
-        original_vis = original_vis[:, :, 0]  # Take first channel for visualization
-    
-    # Scale to [0, 1] for visualization
-    original_vis = (original_vis - original_vis.min()) / (original_vis.max() - original_vis.min() + 1e-8)
-    
     # Overlay heatmap on original image
     overlaid_img = gradcam.overlay_heatmap(original_vis, combined_heatmap)
     
@@ -812,7 +924,8 @@ def apply_combined_gradcam(image_path, model_type='densenet', probability_thresh
     }
 
 
-def apply_pixel_interpretability(image_path, model_type='densenet', target_class=None, use_smoothgrad=True):
+def apply_pixel_interpretability(image_path, model_type='densenet', target_class=None, use_smoothgrad=True,
+                                 max_seconds=None, max_memory_mb=None):
     """
     Apply Pixel-Level Interpretability to an X-ray image
     
@@ -821,62 +934,27 @@ def apply_pixel_interpretability(image_path, model_type='densenet', target_class
         model_type: 'densenet' or 'resnet'
         target_class: Target class for the visualization
         use_smoothgrad: Whether to use SmoothGrad for better visualization
+        max_seconds: Wall time budget for SmoothGrad (None for the fixed sample count)
+        max_memory_mb: Peak memory budget per SmoothGrad batch (None for DEFAULT_BATCH_MEMORY_MB when
+            max_seconds is given, otherwise one sample per pass)
         
     Returns:
         Dictionary with visualization results
     """
+    start_time = time.perf_counter()
+    parameters = {'n_samples': 15 if use_smoothgrad else 1, 'batch_size': 1}
+    
     # Load model
     if model_type == 'resnet':
         model = xrv.models.ResNet(weights="resnet50-res512-all")
-        resize_dim = 512
     else:
         model = xrv.models.DenseNet(weights="densenet121-res224-all")
-        resize_dim = 224
     
     # Wrap model to prevent in-place operations
     wrapped_model = NoInplaceReLU(model)
     
-    # Load and preprocess the image
-    img = skimage.io.imread(image_path)
-    img = xrv.datasets.normalize(img, 255)
-    
-    # Preserve original image for visualization
-    original_img = img.copy()
-    
-    # Check that images are 2D arrays
-    if len(img.shape) > 2:
-        img = img[:, :, 0]  # Take first channel instead of averaging
-    if len(img.shape) < 2:
-        raise ValueError("Input image must have at least 2 dimensions")
-    
-    # Add channel dimension
-    img = img[None, :, :]
-    
-    # Set up transformation pipeline
-    if model_type == 'densenet':
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayCenterCrop(),
-            xrv.datasets.XRayResizer(224)
-        ])
-        resize_dim = 224
-    else:  # resnet
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayResizer(512),
-            xrv.datasets.XRayCenterCrop()
-        ])
-        resize_dim = 512
-    
-    # Apply transforms
-    img = transform(img)
-    
-    # Convert to tensor
-    img_tensor = torch.from_numpy(img)
-    
-    # Add batch dimension
-    if len(img_tensor.shape) < 3:
-        img_tensor = img_tensor.unsqueeze(0).unsqueeze(0)
-    elif len(img_tensor.shape) == 3:
-        img_tensor = img_tensor.unsqueeze(0)
+    # Load and preprocess the image (shared with classification via the preprocessing cache)
+    img_tensor, original_vis = preprocess_image(image_path, model_type)
     
     # Get model predictions to determine target class if not provided
     wrapped_model.eval()
@@ -921,21 +999,20 @@ def apply_pixel_interpretability(image_path, model_type='densenet', target_class
         
         # Generate saliency map
         if use_smoothgrad:
-            saliency_map, _ = pli.apply_smoothgrad(img_tensor, target_class)
+            if max_seconds is not None or max_memory_mb is not None:
+                target_idx = _pathology_index(wrapped_model, model_type, target_class)
+                parameters = pli.plan_smoothgrad(
+                    img_tensor, target_idx, max_seconds=max_seconds, max_memory_mb=max_memory_mb
+                )
+            saliency_map, _ = pli.apply_smoothgrad(
+                img_tensor, target_class, n_samples=parameters['n_samples'], batch_size=parameters['batch_size']
+            )
         else:
             saliency_map, _ = pli.generate_saliency(img_tensor, target_class)
     except Exception as e:
         print(f"Error generating pixel interpretability: {str(e)}")
         # Return empty saliency map in case of error
-        saliency_map = np.zeros((img.shape[1], img.shape[2]))
-    
-    # Convert original image to a suitable format for visualization
-    original_vis = original_img
-    if len(original_vis.shape) > 2:
-        original_vis = original_vis[:, :, 0]  # Take first channel for visualization
-    
-    # Scale to [0, 1] for visualization
-    original_vis = (original_vis - original_vis.min()) / (original_vis.max() - original_vis.min() + 1e-8)
+        saliency_map = np.zeros(tuple(img_tensor.shape[-2:]))
     
     # Resize saliency map to match original image size
     saliency_map_resized = cv2.resize(saliency_map, (original_vis.shape[1], original_vis.shape[0]))
@@ -965,11 +1042,14 @@ def apply_pixel_interpretability(image_path, model_type='densenet', target_class
         'saliency_colored': cv2.cvtColor(saliency_colored, cv2.COLOR_BGR2RGB),
         'overlay': saliency_overlay,
         'target_class': target_class,
-        'method': 'pli'
+        'method': 'pli',
+        'parameters': parameters,
+        'generation_time': round(time.perf_counter() - start_time, 3)
     }
 
 
-def apply_combined_pixel_interpretability(image_path, model_type='densenet', probability_threshold=0.5, use_smoothgrad=True):
+def apply_combined_pixel_interpretability(image_path, model_type='densenet', probability_threshold=0.5, use_smoothgrad=True,
+                                          max_seconds=None, max_memory_mb=None):
     """
     Apply combined Pixel-Level Interpretability to an X-ray image for all pathologies above threshold
     
@@ -978,77 +1058,35 @@ def apply_combined_pixel_interpretability(image_path, model_type='densenet', pro
         model_type: 'densenet' or 'resnet'
         probability_threshold: Minimum probability threshold (default: 0.5)
         use_smoothgrad: Whether to use SmoothGrad technique (default: True)
+        max_seconds: Wall time budget shared by all pathologies (default: None)
+        max_memory_mb: Peak memory budget per SmoothGrad batch (default: None)
         
     Returns:
         Dictionary with combined visualization results
     """
+    start_time = time.perf_counter()
+    
     # Load model
     if model_type == 'resnet':
         model = xrv.models.ResNet(weights="resnet50-res512-all")
-        resize_dim = 512
     else:
         model = xrv.models.DenseNet(weights="densenet121-res224-all")
-        resize_dim = 224
     
     # Wrap model to prevent in-place operations
     wrapped_model = NoInplaceReLU(model)
     
-    # Load and preprocess the image
-    img = skimage.io.imread(image_path)
-    img = xrv.datasets.normalize(img, 255)
-    
-    # Preserve original image for visualization
-    original_img = img.copy()
-    
-    # Check that images are 2D arrays
-    if len(img.shape) > 2:
-        img = img[:, :, 0]  # Take first channel instead of averaging
-    if len(img.shape) < 2:
-        raise ValueError("Input image must have at least 2 dimensions")
-    
-    # Add channel dimension
-    img = img[None, :, :]
-    
-    # Set up transformation pipeline
-    if model_type == 'densenet':
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayCenterCrop(),
-            xrv.datasets.XRayResizer(224)
-        ])
-    else:  # resnet
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayResizer(512),
-            xrv.datasets.XRayCenterCrop()
-        ])
-    
-    # Apply transforms
-    img = transform(img)
-    
-    # Convert to tensor
-    img_tensor = torch.from_numpy(img)
-    
-    # Add batch dimension
-    if len(img_tensor.shape) < 3:
-        img_tensor = img_tensor.unsqueeze(0).unsqueeze(0)
-    elif len(img_tensor.shape) == 3:
-        img_tensor = img_tensor.unsqueeze(0)
+    # Load and preprocess the image (shared with classification via the preprocessing cache)
+    img_tensor, original_vis = preprocess_image(image_path, model_type)
     
     # Initialize Pixel-Level Interpretability
     pli = PixelLevelInterpretability(wrapped_model)
     
     # Get combined saliency map for pathologies above threshold
     combined_saliency, selected_pathologies, predictions = pli.get_combined_saliency(
-        img_tensor, probability_threshold=probability_threshold, use_smoothgrad=use_smoothgrad
+        img_tensor, probability_threshold=probability_threshold, use_smoothgrad=use_smoothgrad,
+        max_seconds=max_seconds, max_memory_mb=max_memory_mb
     )
     
-    # Convert original image to a suitable format for visualization
-    original_vis = original_img
-    if len(original_vis.shape) > 2:
-        original_vis = original_vis[:, :, 0]  # Take first channel for visualization
-    
-    # Scale to [0, 1] for visualization
-    original_vis = (original_vis - original_vis.min()) / (original_vis.max() - original_vis.min() + 1e-8)
-    
     # Create colored saliency map
     saliency_colored = cv2.applyColorMap(np.uint8(255 * combined_saliency), cv2.COLORMAP_JET)
     saliency_colored = cv2.cvtColor(saliency_colored, cv2.COLOR_BGR2RGB)
@@ -1081,5 +1119,237 @@ def apply_combined_pixel_interpretability(image_path, model_type='densenet', pro
         'selected_pathologies': selected_pathologies,
         'pathology_summary': pathology_summary,
         'method': 'combined_pli',
-        'threshold': probability_threshold
-    } 
\ No newline at end of file
+        'threshold': probability_threshold,
+        'parameters': pli.last_parameters,
+        'generation_time': round(time.perf_counter() - start_time, 3)
+    }
+
+
+class IntegratedGradients:
+    """
+    Integrated Gradients attribution for chest X-ray analysis
+    Based on: "Axiomatic Attribution for Deep Networks" (Sundararajan et al.)
+    
+    Interpolation steps between the baseline and the input are pushed through the
+    model in batches, and only input gradients are computed (model parameter
+    gradients are never accumulated), so the shared cached model can be used.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.model.eval()
+    
+    def attribute(self, input_tensor, target_class, steps=32, batch_size=8, baseline=None):
+        """
+        Compute the Integrated Gradients attribution map
+        
+        Args:
+            input_tensor: Input tensor with shape (1, C, H, W)
+            target_class: Index of the target class
+            steps: Number of interpolation steps between baseline and input
+            batch_size: Number of interpolation steps per forward/backward pass
+            baseline: Baseline tensor (defaults to a black image)
+        
+        Returns:
+            attribution_map: Normalized attribution map (numpy array)
+        """
+        if baseline is None:
+            baseline = torch.full_like(input_tensor, input_tensor.min().item())
+        
+        delta = input_tensor - baseline
+        # Midpoint Riemann sum over the straight-line path
+        alphas = (torch.arange(steps, dtype=input_tensor.dtype, device=input_tensor.device) + 0.5) / steps
+        total_gradients = torch.zeros_like(input_tensor)
+        
+        batch_size = max(1, min(batch_size, steps))
+        for start in range(0, steps, batch_size):
+            chunk = alphas[start:start + batch_size].view(-1, 1, 1, 1)
+            interpolated = (baseline + chunk * delta).detach().requires_grad_(True)
+            
+            output = self.model(interpolated)
+            gradients, = torch.autograd.grad(output[:, target_class].sum(), interpolated)
+            total_gradients += gradients.sum(dim=0, keepdim=True).detach()
+        
+        attributions = (delta * total_gradients / steps).abs().squeeze().cpu().numpy()
+        
+        # Light blur to reduce speckle, then normalize to [0, 1]
+        attribution_map = cv2.GaussianBlur(attributions, (5, 5), 0)
+        if np.max(attribution_map) > 0:
+            attribution_map = attribution_map / np.max(attribution_map)
+        
+        return attribution_map
+
+
+class OcclusionSensitivity:
+    """
+    Occlusion sensitivity for chest X-ray analysis
+    Based on: "Visualizing and Understanding Convolutional Networks" (Zeiler & Fergus)
+    
+    Each patch position is occluded in a copy of the input and the drop of the
+    target score is recorded. Occluded copies are evaluated in batches without
+    gradients.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.model.eval()
+    
+    def attribute(self, input_tensor, target_class, patch_size=32, stride=16, batch_size=16, occlusion_value=None):
+        """
+        Compute the occlusion sensitivity map
+        
+        Args:
+            input_tensor: Input tensor with shape (1, C, H, W)
+            target_class: Index of the target class
+            patch_size: Side length of the square occluding patch in pixels
+            stride: Step between patch positions in pixels
+            batch_size: Number of occluded copies per forward pass
+            occlusion_value: Fill value for the patch (defaults to the image mean)
+        
+        Returns:
+            sensitivity_map: Normalized sensitivity map (numpy array)
+            n_patches: Number of occluded positions evaluated
+        """
+        _, _, height, width = input_tensor.shape
+        if occlusion_value is None:
+            occlusion_value = input_tensor.mean().item()
+        
+        ys = list(range(0, max(height - patch_size, 0) + 1, stride))
+        xs = list(range(0, max(width - patch_size, 0) + 1, stride))
+        # Make sure the right and bottom edges are covered as well
+        if ys[-1] + patch_size < height:
+            ys.append(height - patch_size)
+        if xs[-1] + patch_size < width:
+            xs.append(width - patch_size)
+        positions = [(y, x) for y in ys for x in xs]
+        
+        sensitivity = np.zeros((height, width), dtype=np.float32)
+        counts = np.zeros((height, width), dtype=np.float32)
+        
+        with torch.no_grad():
+            base_score = self.model(input_tensor)[0, target_class].item()
+            
+            batch_size = max(1, batch_size)
+            for start in range(0, len(positions), batch_size):
+                chunk = positions[start:start + batch_size]
+                batch = input_tensor.repeat(len(chunk), 1, 1, 1)
+                for i, (y, x) in enumerate(chunk):
+                    batch[i, :, y:y + patch_size, x:x + patch_size] = occlusion_value
+                
+                scores = self.model(batch)[:, target_class].cpu().numpy()
+                for (y, x), score in zip(chunk, scores):
+                    sensitivity[y:y + patch_size, x:x + patch_size] += base_score - score
+                    counts[y:y + patch_size, x:x + patch_size] += 1
+        
+        sensitivity = sensitivity / np.maximum(counts, 1)
+        
+        # Only regions whose occlusion lowers the score support the prediction
+        sensitivity = np.maximum(sensitivity, 0)
+        if np.max(sensitivity) > 0:
+            sensitivity = sensitivity / np.max(sensitivity)
+        
+        return sensitivity, len(positions)
+
+
+def _get_cached_model(model_type):
+    """Return the shared model from the classification model cache"""
+    # Imported here because utils imports this module at load time
+    from .utils import load_model
+    model, _ = load_model(model_type)
+    return model
+
+
+def _resolve_target(model, model_type, img_tensor, target_class):
+    """Return (pathology name, output index), defaulting to the highest scoring class"""
+    pathology_names = xrv.datasets.default_pathologies if model_type == 'resnet' else model.pathologies
+    if isinstance(target_class, str) and target_class in pathology_names:
+        return target_class, pathology_names.index(target_class)
+    
+    if target_class is not None:
+        print(f"Pathology {target_class} not found in model. Using highest probability class.")
+    with torch.no_grad():
+        pred_idx = torch.argmax(model(img_tensor)).item()
+    return pathology_names[pred_idx], pred_idx
+
+
+def _attribution_results(original_vis, attribution_map, target_class, method, parameters, start_time):
+    """Build the result dictionary (same layout as PLI) for an attribution map"""
+    attribution_resized = cv2.resize(attribution_map, (original_vis.shape[1], original_vis.shape[0]))
+    attribution_colored = cv2.cvtColor(
+        cv2.applyColorMap(np.uint8(255 * attribution_resized), cv2.COLORMAP_JET),
+        cv2.COLOR_BGR2RGB
+    )
+    
+    alpha = 0.5
+    original_rgb = cv2.cvtColor(np.uint8(255 * original_vis), cv2.COLOR_GRAY2RGB)
+    overlay = cv2.addWeighted(original_rgb, 1 - alpha, attribution_colored, alpha, 0)
+    
+    generation_time = time.perf_counter() - start_time
+    parameters['throughput'] = round(parameters['evaluations'] / max(generation_time, 1e-6), 2)
+    
+    return {
+        'original': original_vis,
+        'saliency_map': attribution_resized,
+        'saliency_colored': attribution_colored,
+        'overlay': overlay,
+        'target_class': target_class,
+        'method': method,
+        'parameters': parameters,
+        'generation_time': round(generation_time, 3)
+    }
+
+
+def apply_integrated_gradients(image_path, model_type='densenet', target_class=None, steps=32, batch_size=8):
+    """
+    Apply Integrated Gradients to an X-ray image
+    
+    Args:
+        image_path: Path to the image
+        model_type: 'densenet' or 'resnet'
+        target_class: Target class for the visualization
+        steps: Number of interpolation steps
+        batch_size: Interpolation steps per forward/backward pass
+        
+    Returns:
+        Dictionary with visualization results
+    """
+    start_time = time.perf_counter()
+    model = _get_cached_model(model_type)
+    img_tensor, original_vis = preprocess_image(image_path, model_type)
+    target_class, target_idx = _resolve_target(model, model_type, img_tensor, target_class)
+    
+    attribution_map = IntegratedGradients(model).attribute(img_tensor, target_idx, steps=steps, batch_size=batch_size)
+    
+    parameters = {'steps': steps, 'batch_size': batch_size, 'evaluations': steps}
+    return _attribution_results(original_vis, attribution_map, target_class, 'integrated_gradients', parameters, start_time)
+
+
+def apply_occlusion(image_path, model_type='densenet', target_class=None, patch_size=None, stride=None, batch_size=16):
+    """
+    Apply occlusion sensitivity to an X-ray image
+    
+    Args:
+        image_path: Path to the image
+        model_type: 'densenet' or 'resnet'
+        target_class: Target class for the visualization
+        patch_size: Occluding patch size (default: 1/7 of the input size)
+        stride: Step between patches (default: half the patch size)
+        batch_size: Occluded copies per forward pass
+        
+    Returns:
+        Dictionary with visualization results
+    """
+    start_time = time.perf_counter()
+    model = _get_cached_model(model_type)
+    img_tensor, original_vis = preprocess_image(image_path, model_type)
+    target_class, target_idx = _resolve_target(model, model_type, img_tensor, target_class)
+    
+    if patch_size is None:
+        patch_size = img_tensor.shape[-1] // 7
+    if stride is None:
+        stride = max(patch_size // 2, 1)
+    
+    sensitivity_map, n_patches = OcclusionSensitivity(model).attribute(
+        img_tensor, target_idx, patch_size=patch_size, stride=stride, batch_size=batch_size
+    )
+    
+    parameters = {'patch_size': patch_size, 'stride': stride, 'batch_size': batch_size, 'evaluations': n_patches}
+    return _attribution_results(original_vis, sensitivity_map, target_class, 'occlusion', parameters, start_time)
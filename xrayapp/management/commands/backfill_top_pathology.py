@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from xrayapp.models import PATHOLOGY_SCORE_FIELDS, TOP_PATHOLOGY_FIELDS, XRayImage, PredictionHistory
+
+
+class Command(BaseCommand):
+    help = 'Fill the top_pathology and max_probability columns of existing XRayImage and PredictionHistory records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of records loaded and updated per query')
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute every record instead of only those with no stored value')
+
+    def handle(self, *args, **options):
+        for model in (XRayImage, PredictionHistory):
+            count = self._backfill(model, options['batch_size'], options['all'])
+            self.stdout.write(self.style.SUCCESS(f'Updated {count} {model.__name__} records'))
+
+    def _backfill(self, model, batch_size, recompute_all):
+        queryset = model.objects.order_by('pk')
+        if not recompute_all:
+            queryset = queryset.filter(max_probability__isnull=True)
+        # Only the packed scores are needed to compute the top pathology
+        queryset = queryset.only('pk', *PATHOLOGY_SCORE_FIELDS)
+
+        count = 0
+        batch = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            instance.update_top_pathology()
+            if instance.max_probability is None:
+                continue
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                model.objects.bulk_update(batch, TOP_PATHOLOGY_FIELDS)
+                count += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, TOP_PATHOLOGY_FIELDS)
+            count += len(batch)
+        return count
@@ -0,0 +1,77 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency with database connection reuse off and with the configured DB_CONNECTION_MODE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/prediction-history/', help='URL path to request')
+        parser.add_argument('--username', required=True, help='User the requests are made as')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per mode')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        client = Client(HTTP_HOST=options['host'])
+        client.force_login(user)
+
+        connection = connections['default']
+        configured = {
+            'CONN_MAX_AGE': connection.settings_dict['CONN_MAX_AGE'],
+            'pool': connection.settings_dict['OPTIONS'].get('pool'),
+        }
+
+        self.stdout.write(f"Mode: {settings.DB_CONNECTION_MODE}, path: {options['path']}")
+        self.stdout.write(f"{'reuse':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        try:
+            # Reuse off: no pool and a new connection for every request
+            self._configure(connection, conn_max_age=0, pool=None)
+            self._report('off', self._run(client, options))
+
+            self._configure(connection, conn_max_age=configured['CONN_MAX_AGE'], pool=configured['pool'])
+            self._report('on', self._run(client, options))
+        finally:
+            self._configure(connection, conn_max_age=configured['CONN_MAX_AGE'], pool=configured['pool'])
+
+    def _configure(self, connection, conn_max_age, pool):
+        # Settings are read when a connection is opened, so close the current one first
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        if pool:
+            connection.settings_dict['OPTIONS']['pool'] = pool
+        else:
+            connection.settings_dict['OPTIONS'].pop('pool', None)
+
+    def _run(self, client, options):
+        # Warm-up request so template loading and URL resolution are not counted
+        client.get(options['path'])
+        close_old_connections()
+        timings = []
+        for _ in range(options['requests']):
+            start = time.perf_counter()
+            response = client.get(options['path'])
+            # The test client skips the end-of-request connection handling, so do
+            # what the request_finished signal does in a real server
+            close_old_connections()
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f"{options['path']} returned {response.status_code}")
+        return timings
+
+    def _report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{label:<12}{statistics.mean(timings):>10.2f}{statistics.median(timings):>10.2f}{p95:>10.2f}'
+        )
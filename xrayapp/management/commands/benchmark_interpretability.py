@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from xrayapp.interpretability import (IntegratedGradients, OcclusionSensitivity, PixelLevelInterpretability,
+                                      NoInplaceReLU, _get_cached_model, _resolve_target)
+from xrayapp.preprocessing import preprocess_image
+
+
+class Command(BaseCommand):
+    help = 'Benchmark throughput of the batched attribution engines (SmoothGrad, Integrated Gradients, occlusion)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('image_path', type=str, help='Path to an X-ray image')
+        parser.add_argument('--model', default='densenet', choices=['densenet', 'resnet'])
+        parser.add_argument('--batch-sizes', default='1,4,8,16',
+                            help='Comma-separated batch sizes to compare')
+        parser.add_argument('--methods', default='smoothgrad,integrated_gradients,occlusion',
+                            help='Comma-separated methods to benchmark')
+        parser.add_argument('--samples', type=int, default=16,
+                            help='SmoothGrad samples / Integrated Gradients steps per run')
+        parser.add_argument('--repeats', type=int, default=2,
+                            help='Timed runs per configuration (best run is reported)')
+
+    def handle(self, *args, **options):
+        try:
+            batch_sizes = [int(size) for size in options['batch_sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--batch-sizes must be a comma-separated list of integers')
+        methods = [method.strip() for method in options['methods'].split(',')]
+
+        model_type = options['model']
+        model = _get_cached_model(model_type)
+        img_tensor, _ = preprocess_image(options['image_path'], model_type)
+        target_class, target_idx = _resolve_target(model, model_type, img_tensor, None)
+        self.stdout.write(f'Model: {model_type}, input: {tuple(img_tensor.shape)}, target: {target_class}')
+
+        runners = {
+            'smoothgrad': self._smoothgrad_runner,
+            'integrated_gradients': self._integrated_gradients_runner,
+            'occlusion': self._occlusion_runner,
+        }
+
+        self.stdout.write(f"{'method':<22}{'batch':>6}{'evals':>8}{'seconds':>10}{'evals/s':>10}")
+        for method in methods:
+            if method not in runners:
+                raise CommandError(f'Unknown method: {method}')
+            run = runners[method](model, img_tensor, target_idx, options['samples'])
+            # Warm-up so one-off allocations are not counted
+            run(batch_sizes[0])
+            for batch_size in batch_sizes:
+                best = None
+                for _ in range(options['repeats']):
+                    start = time.perf_counter()
+                    evaluations = run(batch_size)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                self.stdout.write(
+                    f'{method:<22}{batch_size:>6}{evaluations:>8}{best:>10.2f}{evaluations / best:>10.1f}'
+                )
+
+    def _smoothgrad_runner(self, model, img_tensor, target_idx, samples):
+        # PLI registers guided-backprop hooks, so it gets its own model instance
+        pli = PixelLevelInterpretability(NoInplaceReLU(_fresh_model(img_tensor)))
+
+        def run(batch_size):
+            pli.apply_smoothgrad(img_tensor, target_idx, n_samples=samples, batch_size=batch_size)
+            return samples
+        return run
+
+    def _integrated_gradients_runner(self, model, img_tensor, target_idx, samples):
+        engine = IntegratedGradients(model)
+
+        def run(batch_size):
+            engine.attribute(img_tensor, target_idx, steps=samples, batch_size=batch_size)
+            return samples
+        return run
+
+    def _occlusion_runner(self, model, img_tensor, target_idx, samples):
+        engine = OcclusionSensitivity(model)
+        patch_size = img_tensor.shape[-1] // 7
+
+        def run(batch_size):
+            _, n_patches = engine.attribute(img_tensor, target_idx, patch_size=patch_size,
+                                            stride=max(patch_size // 2, 1), batch_size=batch_size)
+            return n_patches
+        return run
+
+
+def _fresh_model(img_tensor):
+    """Load an uncached copy of the model matching the input resolution"""
+    import torchxrayvision as xrv
+    if img_tensor.shape[-1] == 512:
+        return xrv.models.ResNet(weights="resnet50-res512-all")
+    return xrv.models.DenseNet(weights="densenet121-res224-all")
@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory
+from xrayapp.middleware import AuthenticationMiddleware, RoleBasedAccessMiddleware
+from xrayapp.profiles import get_cached_profile
+
+# One path per kind of rule the middlewares distinguish
+BENCHMARK_PATHS = [
+    '/static/css/style.css',
+    '/media/xrays/image.png',
+    '/accounts/login/',
+    '/prediction-history/',
+    '/prediction-history/delete-all/',
+    '/interpretability/1/',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the authentication and role-based access middlewares'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Benchmark as this user (anonymous if omitted)')
+        parser.add_argument('--iterations', type=int, default=100000, help='Requests per path')
+
+    def handle(self, *args, **options):
+        user = AnonymousUser()
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+            # Warm the profile cache so the benchmark measures path matching, not the first load
+            get_cached_profile(user)
+
+        def view(request):
+            return HttpResponse()
+
+        chain = AuthenticationMiddleware(RoleBasedAccessMiddleware(view))
+        factory = RequestFactory()
+        iterations = options['iterations']
+
+        self.stdout.write(f"User: {user}, iterations: {iterations}")
+        self.stdout.write(f"{'path':<36}{'status':>8}{'us/request':>12}")
+        for path in BENCHMARK_PATHS:
+            request = factory.get(path)
+            request.user = user
+            status = chain(request).status_code
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                chain(request)
+            per_request = (time.perf_counter() - start) / iterations * 1e6
+            self.stdout.write(f'{path:<36}{status:>8}{per_request:>12.2f}')
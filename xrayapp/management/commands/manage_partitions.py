@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from xrayapp.partitioning import (PARTITIONED_TABLES, PartitioningError, create_partitions, detach_partitions,
+                                  enable_partitioning, is_partitioned, list_partitions)
+
+
+class Command(BaseCommand):
+    help = 'Manage monthly range partitions of the prediction history and X-ray tables (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['enable', 'create', 'detach', 'status'],
+                            help='enable: convert the tables; create: add upcoming months; '
+                                 'detach: retire old months; status: list partitions')
+        parser.add_argument('--table', default='all', choices=[*PARTITIONED_TABLES, 'all'])
+        parser.add_argument('--months', type=int, default=3,
+                            help='Monthly partitions to create after the current month')
+        parser.add_argument('--older-than', type=int,
+                            help='Detach partitions whose rows are all older than this many months')
+        parser.add_argument('--drop', action='store_true',
+                            help='Drop detached partitions (and X-ray media) instead of keeping them for archiving')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning requires PostgreSQL')
+        if options['months'] < 0:
+            raise CommandError('--months must not be negative')
+
+        action = options['action']
+        tables = list(PARTITIONED_TABLES) if options['table'] == 'all' else [options['table']]
+        if action == 'detach':
+            if options['older_than'] is None or options['older_than'] < 1:
+                raise CommandError('detach requires --older-than of at least 1 month')
+            # History rows point at X-rays, so history months go first
+            tables.sort(key=lambda table: table != 'history')
+
+        for table in tables:
+            model, column = PARTITIONED_TABLES[table]
+            try:
+                if action == 'enable':
+                    names = enable_partitioning(model, column, options['months'])
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Partitioned {model._meta.db_table} by {column} ({len(names)} monthly partitions)'))
+                elif action == 'create':
+                    names = create_partitions(model, column, options['months'])
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Created {len(names)} partitions of {model._meta.db_table}: {", ".join(names) or "none"}'))
+                elif action == 'detach':
+                    names = detach_partitions(model, column, options['older_than'], options['drop'])
+                    verb = 'Dropped' if options['drop'] else 'Detached'
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{verb} {len(names)} partitions of {model._meta.db_table}: {", ".join(names) or "none"}'))
+                else:
+                    self._status(model)
+            except PartitioningError as e:
+                raise CommandError(str(e))
+
+    def _status(self, model):
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor, table):
+                self.stdout.write(f'{table}: not partitioned')
+                return
+            self.stdout.write(f'{table}:')
+            for name, bounds in list_partitions(cursor, table):
+                self.stdout.write(f'  {name}: {bounds}')
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from xrayapp.stats import rebuild_hospital_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-hospital daily prediction statistics from the prediction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hospital', help='Only this hospital')
+        parser.add_argument('--days', type=int,
+                            help='Only the last N days (default: the whole history)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError('--days must be positive')
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        written = rebuild_hospital_stats(hospital=options['hospital'], since=since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} hospital statistics rows'))
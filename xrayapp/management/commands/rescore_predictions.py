@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from xrayapp.history import bulk_write_prediction_history, scores_from_results
+from xrayapp.models import XRayImage
+from xrayapp.utils import process_image
+
+
+class Command(BaseCommand):
+    help = 'Score processed X-rays with a model and write their prediction history in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default='densenet', choices=['densenet', 'resnet'])
+        parser.add_argument('--hospital', help='Only X-rays of this hospital')
+        parser.add_argument('--limit', type=int, help='Maximum number of X-rays to score')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='X-rays scored before each bulk write')
+        parser.add_argument('--update-existing', action='store_true',
+                            help='Re-score the latest history record of each X-ray instead of adding new records')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        queryset = (XRayImage.objects.filter(processing_status__in=('complete', 'completed'))
+                    .only('pk', 'user_id', 'hospital', 'image').order_by('pk'))
+        if options['hospital']:
+            queryset = queryset.filter(hospital=options['hospital'])
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+
+        model_type = options['model']
+        written = failed = 0
+        batch = []
+        for xray in queryset.iterator(chunk_size=options['batch_size']):
+            image_path = Path(settings.MEDIA_ROOT) / xray.image.name
+            try:
+                results = process_image(image_path, None, model_type)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'X-ray #{xray.pk}: {e}')
+                continue
+            batch.append((xray, model_type, scores_from_results(results)))
+            if len(batch) >= options['batch_size']:
+                written += bulk_write_prediction_history(batch, options['update_existing'])
+                batch = []
+        if batch:
+            written += bulk_write_prediction_history(batch, options['update_existing'])
+
+        action = 'Updated' if options['update_existing'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(f'{action} {written} prediction history records ({failed} X-rays failed)'))
@@ -1,34 +1,82 @@
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib import messages
-from django.core.cache import cache
 from django.http import HttpResponse, HttpResponseForbidden
 from django.utils import timezone
 from django.template.loader import render_to_string
 import hashlib
+import re
+
+from . import ratelimit
+from .profiles import get_cached_profile
+
+class PathRules:
+    """
+    Path prefix rules compiled once into a single anchored regex
+
+    Longer prefixes are tried first, so the most specific rule wins.
+    """
+
+    def __init__(self, rules):
+        self._values = {}
+        alternatives = []
+        for i, prefix in enumerate(sorted(rules, key=len, reverse=True)):
+            group = f"r{i}"
+            self._values[group] = rules[prefix]
+            alternatives.append(f"(?P<{group}>{re.escape(prefix)})")
+        self._regex = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def match(self, path):
+        """Return the value of the rule matching the start of ``path``, or None"""
+        if self._regex is None:
+            return None
+        match = self._regex.match(path)
+        return self._values[match.lastgroup] if match else None
+
+
+# Static files and uploads skip authentication and profile work entirely
+STATIC_PATHS = PathRules({
+    '/static/': True,
+    '/media/': True,
+    '/favicon.ico': True,
+})
+
+# Paths that don't require authentication
+PUBLIC_PATHS = PathRules({
+    '/accounts/login/': True,
+    '/accounts/logout/': True,
+    '/secure-admin-mcads-2024/login/': True,  # Updated admin path
+    '/set-language/': True,  # Allow language switching for unauthenticated users
+})
+
+# Paths whose role check is skipped
+ROLE_EXEMPT_PATHS = PathRules({
+    '/accounts/login/': True,
+    '/accounts/logout/': True,
+})
+
+# URL prefixes and the profile permission they require
+PROTECTED_PATHS = PathRules({
+    '/secure-admin-mcads-2024/': 'can_access_admin',
+    '/admin/': 'can_access_admin',
+    '/prediction-history/delete': 'can_delete_data',
+    '/interpretability/': 'can_generate_interpretability',
+})
+
 
 class AuthenticationMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Public paths that don't require authentication
-        public_paths = [
-            '/accounts/login/',
-            '/accounts/logout/',
-            '/secure-admin-mcads-2024/login/',  # Updated admin path
-            '/set-language/',  # Allow language switching for unauthenticated users
-            '/favicon.ico',
-            '/static/',
-            '/media/',
-        ]
-        
-        # Check if the path is public or if user is already authenticated
-        is_public = any(request.path.startswith(path) for path in public_paths)
+        path = request.path
+        if STATIC_PATHS.match(path):
+            return self.get_response(request)
         
         # If the path is not public and the user is not authenticated, redirect to login
-        if not is_public and not request.user.is_authenticated:
-            return redirect(f"{reverse('login')}?next={request.path}")
+        if not PUBLIC_PATHS.match(path) and not request.user.is_authenticated:
+            return redirect(f"{reverse('login')}?next={path}")
             
         response = self.get_response(request)
         return response
@@ -39,8 +87,6 @@ class RateLimitMiddleware:
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.max_attempts = 5
-        self.lockout_duration = 300  # 5 minutes in seconds
         
     def __call__(self, request):
         # Only apply rate limiting to login attempts
@@ -51,6 +97,7 @@ class RateLimitMiddleware:
                     status=429,
                     content_type="text/plain"
                 )
+                response['Retry-After'] = str(settings.RATE_LIMITS['login']['window'])
                 return response
         
         response = self.get_response(request)
@@ -64,29 +111,20 @@ class RateLimitMiddleware:
             
         return response
     
-    def _get_cache_key(self, request):
-        """Generate cache key based on IP address"""
-        ip = self._get_client_ip(request)
-        return f"login_attempts:{hashlib.sha256(ip.encode()).hexdigest()}"
-    
-    def _get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0]
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
+    def _get_identity(self, request):
+        """Generate limiter identity based on IP address"""
+        ip = ratelimit.get_client_ip(request)
+        return f"ip:{hashlib.sha256(ip.encode()).hexdigest()}"
     
     def _check_rate_limit(self, request):
         """Check if request is within rate limit"""
-        cache_key = self._get_cache_key(request)
-        attempts = cache.get(cache_key, 0)
-        return attempts < self.max_attempts
+        budget, window = ratelimit.get_budget('login', ratelimit.ANONYMOUS_ROLE)
+        return ratelimit.peek('login', self._get_identity(request), window) < budget
     
     def _record_failed_attempt(self, request):
         """Record a failed login attempt"""
-        cache_key = self._get_cache_key(request)
-        attempts = cache.get(cache_key, 0)
-        cache.set(cache_key, attempts + 1, self.lockout_duration)
+        _budget, window = ratelimit.get_budget('login', ratelimit.ANONYMOUS_ROLE)
+        ratelimit.hit('login', self._get_identity(request), window)
 
 
 class RoleBasedAccessMiddleware:
@@ -94,28 +132,13 @@ class RoleBasedAccessMiddleware:
     
     def __init__(self, get_response):
         self.get_response = get_response
-        # Define URL patterns and required permissions
-        self.protected_patterns = {
-            '/secure-admin-mcads-2024/': 'can_access_admin',
-            '/admin/': 'can_access_admin',
-            '/prediction-history/delete': 'can_delete_data',
-            '/interpretability/': 'can_generate_interpretability',
-        }
         
     def __call__(self, request):
-        # Skip check for public paths
-        public_paths = [
-            '/accounts/login/',
-            '/accounts/logout/',
-            '/favicon.ico',
-            '/static/',
-            '/media/',
-        ]
-        
-        is_public = any(request.path.startswith(path) for path in public_paths)
+        path = request.path
         
         # Only check authenticated users for non-public paths
-        if not is_public and request.user.is_authenticated:
+        if (not STATIC_PATHS.match(path) and not ROLE_EXEMPT_PATHS.match(path)
+                and request.user.is_authenticated):
             if not self._check_access(request):
                 # Return 403 Forbidden with custom error page
                 return HttpResponseForbidden(
@@ -128,19 +151,19 @@ class RoleBasedAccessMiddleware:
     def _check_access(self, request):
         """Check if user has access to the requested resource"""
         try:
-            # Get user profile
-            profile = getattr(request.user, 'profile', None)
+            # Get user profile (cached per user, no query on a cache hit)
+            profile = get_cached_profile(request.user)
             if not profile:
                 return False
             
             # Check against protected patterns
-            for pattern, permission in self.protected_patterns.items():
-                if request.path.startswith(pattern):
-                    return getattr(profile, permission, lambda: False)()
+            permission = PROTECTED_PATHS.match(request.path)
+            if permission:
+                return getattr(profile, permission, lambda: False)()
             
             # Allow access if no specific protection is defined
             return True
             
         except Exception:
             # If there's any error, deny access
-            return False 
\ No newline at end of file
+            return False 
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0006_remove_support_devices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visualizationresult',
+            name='parameters',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='visualizationresult',
+            name='generation_time',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
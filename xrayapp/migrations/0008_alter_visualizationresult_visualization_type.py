@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0007_visualizationresult_parameters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='visualizationresult',
+            name='visualization_type',
+            field=models.CharField(choices=[('gradcam', 'GRAD-CAM'), ('pli', 'Pixel-level Interpretability'), ('combined_gradcam', 'Combined'), ('combined_pli', 'Combined PLI'), ('integrated_gradients', 'Integrated Gradients'), ('occlusion', 'Occlusion Sensitivity')], db_index=True, max_length=20),
+        ),
+    ]
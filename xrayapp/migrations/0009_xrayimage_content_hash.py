@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0008_alter_visualizationresult_visualization_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xrayimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 of the uploaded file, computed while streaming the upload', max_length=64),
+        ),
+    ]
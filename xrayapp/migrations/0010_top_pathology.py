@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0009_xrayimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xrayimage',
+            name='top_pathology',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='xrayimage',
+            name='max_probability',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='top_pathology',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='max_probability',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='xrayimage',
+            index=models.Index(fields=['max_probability', 'uploaded_at'], name='xrayapp_xra_max_pro_b35665_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['max_probability', 'created_at'], name='xrayapp_pre_max_pro_d562c4_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_hospital(apps, schema_editor):
+    """Copy the owner's hospital onto existing rows with one UPDATE per table"""
+    UserProfile = apps.get_model('xrayapp', 'UserProfile')
+    XRayImage = apps.get_model('xrayapp', 'XRayImage')
+    PredictionHistory = apps.get_model('xrayapp', 'PredictionHistory')
+    VisualizationResult = apps.get_model('xrayapp', 'VisualizationResult')
+
+    XRayImage.objects.filter(user__profile__isnull=False).update(
+        hospital=Subquery(UserProfile.objects.filter(user_id=OuterRef('user_id')).values('hospital')[:1])
+    )
+    PredictionHistory.objects.filter(user__profile__isnull=False).update(
+        hospital=Subquery(UserProfile.objects.filter(user_id=OuterRef('user_id')).values('hospital')[:1])
+    )
+    VisualizationResult.objects.update(
+        hospital=Subquery(XRayImage.objects.filter(pk=OuterRef('xray_id')).values('hospital')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0010_top_pathology'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xrayimage',
+            name='hospital',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='hospital',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='visualizationresult',
+            name='hospital',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='xrayimage',
+            index=models.Index(fields=['hospital', 'uploaded_at'], name='xrayapp_xra_hospita_5f56c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['hospital', 'created_at'], name='xrayapp_pre_hospita_fb3d1c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visualizationresult',
+            index=models.Index(fields=['hospital', 'created_at'], name='xrayapp_vis_hospita_6ec24d_idx'),
+        ),
+        migrations.RunPython(backfill_hospital, migrations.RunPython.noop),
+    ]
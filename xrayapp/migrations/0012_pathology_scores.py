@@ -0,0 +1,221 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:05
+
+import django.contrib.postgres.fields
+import xrayapp.models
+from django.db import migrations, models
+
+# Column order of label set version 1 (models.PATHOLOGY_LABEL_SETS[1])
+PATHOLOGY_COLUMNS = [
+    'atelectasis',
+    'cardiomegaly',
+    'consolidation',
+    'edema',
+    'effusion',
+    'emphysema',
+    'fibrosis',
+    'hernia',
+    'infiltration',
+    'mass',
+    'nodule',
+    'pleural_thickening',
+    'pneumonia',
+    'pneumothorax',
+    'fracture',
+    'lung_opacity',
+    'enlarged_cardiomediastinum',
+    'lung_lesion',
+]
+
+
+def pack_sql(table):
+    """Pack the pathology columns into pathology_scores with one UPDATE; rows without scores stay NULL"""
+    columns = ', '.join(PATHOLOGY_COLUMNS)
+    return (
+        f"UPDATE {table} SET pathology_scores = ARRAY[{columns}]::real[] "
+        f"WHERE COALESCE({columns}) IS NOT NULL"
+    )
+
+
+def unpack_sql(table):
+    """Restore the pathology columns from pathology_scores (PostgreSQL arrays are 1-based)"""
+    assignments = ', '.join(
+        f"{column} = pathology_scores[{index}]" for index, column in enumerate(PATHOLOGY_COLUMNS, start=1)
+    )
+    return f"UPDATE {table} SET {assignments} WHERE pathology_scores IS NOT NULL"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0011_hospital'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xrayimage',
+            name='pathology_scores',
+            field=django.contrib.postgres.fields.ArrayField(base_field=xrayapp.models.RealField(null=True), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='xrayimage',
+            name='pathology_labels_version',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='pathology_scores',
+            field=django.contrib.postgres.fields.ArrayField(base_field=xrayapp.models.RealField(null=True), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='pathology_labels_version',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunSQL(pack_sql('xrayapp_xrayimage'), unpack_sql('xrayapp_xrayimage')),
+        migrations.RunSQL(pack_sql('xrayapp_predictionhistory'), unpack_sql('xrayapp_predictionhistory')),
+        # Dropping the XRayImage columns also drops their 18 single-column indexes
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='atelectasis',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='cardiomegaly',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='consolidation',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='edema',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='effusion',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='emphysema',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='fibrosis',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='hernia',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='infiltration',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='mass',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='nodule',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='pleural_thickening',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='pneumonia',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='pneumothorax',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='fracture',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='lung_opacity',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='enlarged_cardiomediastinum',
+        ),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='lung_lesion',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='atelectasis',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='cardiomegaly',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='consolidation',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='edema',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='effusion',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='emphysema',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='fibrosis',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='hernia',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='infiltration',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='mass',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='nodule',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='pleural_thickening',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='pneumonia',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='pneumothorax',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='fracture',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='lung_opacity',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='enlarged_cardiomediastinum',
+        ),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='lung_lesion',
+        ),
+    ]
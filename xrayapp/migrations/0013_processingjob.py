@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Each job row is rewritten on every progress tick. Leave room on each page so
+# the new row version fits next to the old one (a HOT update, no index writes).
+SET_FILLFACTOR_SQL = "ALTER TABLE xrayapp_processingjob SET (fillfactor = 70)"
+
+COPY_JOBS_SQL = """
+INSERT INTO xrayapp_processingjob (xray_id, status, progress, updated_at)
+SELECT id, processing_status, progress, uploaded_at FROM xrayapp_xrayimage
+"""
+
+RESTORE_PROGRESS_SQL = """
+UPDATE xrayapp_xrayimage SET progress = job.progress
+FROM xrayapp_processingjob job WHERE job.xray_id = xrayapp_xrayimage.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0012_pathology_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingJob',
+            fields=[
+                ('xray', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='job', serialize=False, to='xrayapp.xrayimage')),
+                ('status', models.CharField(default='pending', max_length=20)),
+                ('progress', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunSQL(SET_FILLFACTOR_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(COPY_JOBS_SQL, RESTORE_PROGRESS_SQL),
+        migrations.RemoveField(
+            model_name='xrayimage',
+            name='progress',
+        ),
+    ]
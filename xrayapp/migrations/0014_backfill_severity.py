@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+# Severity rule as of this migration (mean of the non-NULL scores: <= 0.19 is 1,
+# <= 0.30 is 2, above is 3). Frozen here so later threshold changes in
+# xrayapp.models do not alter what this backfill wrote.
+SEVERITY_SQL = (
+    '(SELECT CASE WHEN avg(score) IS NULL THEN NULL '
+    'WHEN avg(score) <= 0.19 THEN 1 WHEN avg(score) <= 0.3 THEN 2 ELSE 3 END '
+    'FROM unnest(%(expressions)s) AS score)'
+)
+
+
+class SeverityLevel(models.Func):
+    template = SEVERITY_SQL
+    output_field = models.IntegerField()
+
+
+def backfill_severity(apps, schema_editor):
+    """Store the severity of rows that have scores but no level, computed in SQL with one UPDATE per table"""
+    for model_name in ('XRayImage', 'PredictionHistory'):
+        model = apps.get_model('xrayapp', model_name)
+        model.objects.filter(severity_level__isnull=True, pathology_scores__isnull=False).update(
+            severity_level=SeverityLevel('pathology_scores')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0013_processingjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_severity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:45
+
+from django.db import migrations, models
+
+
+def backfill_stats(apps, schema_editor):
+    """Roll up the existing prediction history"""
+    from xrayapp.stats import rebuild_hospital_stats
+    rebuild_hospital_stats(history_model=apps.get_model('xrayapp', 'PredictionHistory'),
+                           stats_model=apps.get_model('xrayapp', 'HospitalDailyStats'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('xrayapp', '0014_backfill_severity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HospitalDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hospital', models.CharField(max_length=100)),
+                ('day', models.DateField()),
+                ('model_used', models.CharField(max_length=50)),
+                ('total', models.IntegerField(default=0)),
+                ('severity_1', models.IntegerField(default=0)),
+                ('severity_2', models.IntegerField(default=0)),
+                ('severity_3', models.IntegerField(default=0)),
+                ('pathology_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day', 'model_used'],
+                'constraints': [models.UniqueConstraint(fields=('hospital', 'day', 'model_used'), name='unique_hospital_daily_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
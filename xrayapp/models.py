@@ -1,4 +1,6 @@
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
@@ -11,12 +13,252 @@ USER_ROLES = [
     ('Radiologist', _('Radiologist')),
 ]
 
+# Pathologies scored for XRayImage and PredictionHistory, mapped to the display
+# name used for the stored top pathology
+PATHOLOGY_FIELDS = {
+    'atelectasis': 'Atelectasis',
+    'cardiomegaly': 'Cardiomegaly',
+    'consolidation': 'Consolidation',
+    'edema': 'Edema',
+    'effusion': 'Effusion',
+    'emphysema': 'Emphysema',
+    'fibrosis': 'Fibrosis',
+    'hernia': 'Hernia',
+    'infiltration': 'Infiltration',
+    'mass': 'Mass',
+    'nodule': 'Nodule',
+    'pleural_thickening': 'Pleural Thickening',
+    'pneumonia': 'Pneumonia',
+    'pneumothorax': 'Pneumothorax',
+    'fracture': 'Fracture',
+    'lung_opacity': 'Lung Opacity',
+    'enlarged_cardiomediastinum': 'Enlarged Cardiomediastinum',
+    'lung_lesion': 'Lung Lesion',
+}
+
+# Scores are packed into one real[] column in the order of a label set. Rows record
+# the version they were packed with; when labels are added or reordered, add a new
+# version here instead of changing an existing one.
+PATHOLOGY_LABELS_VERSION = 1
+PATHOLOGY_LABEL_SETS = {
+    1: tuple(PATHOLOGY_FIELDS),
+}
+_LABEL_INDEXES = {
+    version: {field_name: index for index, field_name in enumerate(labels)}
+    for version, labels in PATHOLOGY_LABEL_SETS.items()
+}
+
+# Columns holding the packed scores
+PATHOLOGY_SCORE_FIELDS = ['pathology_scores', 'pathology_labels_version']
+
+# Columns written by update_top_pathology()
+TOP_PATHOLOGY_FIELDS = ['top_pathology', 'max_probability']
+
+
+def pathology_score_lookup(field_name, prefix=''):
+    """
+    Return the ORM lookup of one pathology score, e.g. 'pathology_scores__0'
+
+    Only valid for rows packed with the current label set version.
+    """
+    return f"{prefix}pathology_scores__{_LABEL_INDEXES[PATHOLOGY_LABELS_VERSION][field_name]}"
+
+
+# Severity is the mean of the available pathology scores, bucketed by these
+# upper bounds; anything above the last one is level 3 (significant findings)
+SEVERITY_THRESHOLDS = ((0.19, 1), (0.30, 2))
+SEVERITY_MAX_LEVEL = 3
+
+
+def severity_for_scores(scores):
+    """
+    Return the severity level (1-3) of packed pathology scores
+
+    Args:
+        scores: Pathology score list (may contain None), or None
+
+    Returns:
+        Severity level, or None if there are no scores
+    """
+    valid_values = [v for v in scores or [] if v is not None]
+    if not valid_values:
+        return None
+    avg_probability = sum(valid_values) / len(valid_values)
+    for upper_bound, level in SEVERITY_THRESHOLDS:
+        if avg_probability <= upper_bound:
+            return level
+    return SEVERITY_MAX_LEVEL
+
+
+class SeverityLevel(models.Func):
+    """
+    Severity level computed in SQL from a pathology_scores column
+
+    Same rule as severity_for_scores(): the mean of the non-NULL scores is
+    bucketed by SEVERITY_THRESHOLDS, NULL when there are no scores.
+    """
+    template = '(SELECT CASE WHEN avg(score) IS NULL THEN NULL %s ELSE %d END FROM unnest(%%(expressions)s) AS score)' % (
+        ' '.join(f'WHEN avg(score) <= {upper_bound} THEN {level}' for upper_bound, level in SEVERITY_THRESHOLDS),
+        SEVERITY_MAX_LEVEL,
+    )
+    output_field = models.IntegerField()
+
+
+class SeverityQuerySet(models.QuerySet):
+    """QuerySet of models storing pathology_scores and severity_level"""
+
+    def with_severity(self):
+        """Annotate ``severity``: the stored level, or computed in SQL where it is missing"""
+        return self.annotate(severity=Coalesce('severity_level', SeverityLevel('pathology_scores')))
+
+
+def compute_top_pathology(instance):
+    """Return (display_name, probability) of the highest scoring pathology, or ('', None)"""
+    top_name, top_value = '', None
+    for field_name, display_name in PATHOLOGY_FIELDS.items():
+        value = getattr(instance, field_name)
+        if value is not None and (top_value is None or value > top_value):
+            top_name, top_value = display_name, value
+    return top_name, top_value
+
+
+def hospital_for_user(user_id):
+    """Return the hospital of a user's profile, or '' if the user has none"""
+    if user_id is None:
+        return ''
+    hospital = UserProfile.objects.filter(user_id=user_id).values_list('hospital', flat=True).first()
+    return hospital or ''
+
+
+class RealField(models.FloatField):
+    """Single precision float (PostgreSQL real), plenty for model probabilities"""
+
+    def db_type(self, connection):
+        return 'real'
+
+
+def _pathology_property(field_name):
+    def getter(self):
+        return self.get_pathology_score(field_name)
+
+    def setter(self, value):
+        self.set_pathology_scores({field_name: value})
+
+    return property(getter, setter, doc=f"{PATHOLOGY_FIELDS[field_name]} probability")
+
+
+class PathologyScoresMixin:
+    """
+    Per-pathology attributes (``instance.atelectasis``...) backed by the packed
+    pathology_scores column
+    """
+
+    def get_pathology_score(self, field_name):
+        """Return the score of one pathology, or None"""
+        if not self.pathology_scores:
+            return None
+        index = _LABEL_INDEXES[self.pathology_labels_version].get(field_name)
+        if index is None or index >= len(self.pathology_scores):
+            return None
+        return self.pathology_scores[index]
+
+    def set_pathology_scores(self, scores):
+        """
+        Update pathology scores, repacking with the current label set if needed
+
+        Args:
+            scores: Dictionary of pathology field name to probability (or None)
+        """
+        if self.pathology_scores is None or self.pathology_labels_version != PATHOLOGY_LABELS_VERSION:
+            current = {field_name: self.get_pathology_score(field_name)
+                       for field_name in PATHOLOGY_LABEL_SETS[PATHOLOGY_LABELS_VERSION]}
+            self.pathology_scores = list(current.values())
+            self.pathology_labels_version = PATHOLOGY_LABELS_VERSION
+        indexes = _LABEL_INDEXES[PATHOLOGY_LABELS_VERSION]
+        for field_name, value in scores.items():
+            self.pathology_scores[indexes[field_name]] = value
+
+    def copy_pathology_scores(self, source):
+        """Copy the packed scores of another instance"""
+        self.pathology_scores = list(source.pathology_scores) if source.pathology_scores is not None else None
+        self.pathology_labels_version = source.pathology_labels_version
+
+    @property
+    def calculate_severity_level(self):
+        """Calculate severity level based on average of pathology probabilities
+        1: Insignificant findings (0-19%)
+        2: Moderate findings (20-30%)
+        3: Significant findings (31-100%)
+        
+        Querysets compute the same value in SQL with SeverityLevel.
+        """
+        return severity_for_scores(self.pathology_scores)
+    
+    @property
+    def severity_label(self):
+        """Get severity level label"""
+        severity_mapping = {
+            1: _("Insignificant findings"),
+            2: _("Moderate findings"),
+            3: _("Significant findings"),
+        }
+        level = self.severity_level
+        if level is None:
+            level = self.calculate_severity_level
+            
+        return severity_mapping.get(level, _("Unknown"))
+
+
+for _field_name in PATHOLOGY_FIELDS:
+    setattr(PathologyScoresMixin, _field_name, _pathology_property(_field_name))
+
+
+class TopPathologyMixin(PathologyScoresMixin):
+    """Keep the denormalized top pathology columns in sync with the pathology scores"""
+
+    @property
+    def top_probability(self):
+        """Probability of the top pathology (same value as max_probability)"""
+        return self.max_probability
+
+    def update_top_pathology(self):
+        """Recompute top_pathology and max_probability from the pathology scores"""
+        self.top_pathology, self.max_probability = compute_top_pathology(self)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.update_top_pathology()
+        else:
+            update_fields = set(update_fields)
+            # Pathology names in update_fields refer to the packed column
+            if update_fields & set(PATHOLOGY_FIELDS):
+                update_fields = (update_fields - set(PATHOLOGY_FIELDS)) | set(PATHOLOGY_SCORE_FIELDS)
+            if update_fields & set(PATHOLOGY_SCORE_FIELDS):
+                self.update_top_pathology()
+                update_fields |= set(TOP_PATHOLOGY_FIELDS)
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class UserHospitalMixin:
+    """Copy the owning user's hospital onto new rows, so tenant queries need no joins"""
+
+    def save(self, *args, **kwargs):
+        # Only new rows look it up; existing rows keep the hospital they were written with
+        if self._state.adding and not self.hospital:
+            self.hospital = hospital_for_user(self.user_id)
+        super().save(*args, **kwargs)
+
+
 # Create your models here.
 
-class XRayImage(models.Model):
+class XRayImage(UserHospitalMixin, TopPathologyMixin, models.Model):
     """Model to store X-ray images and analysis results"""
     # User who uploaded the image
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='xray_images', null=True, db_index=True)
+    # Hospital of the owning user, copied on write so tenant queries need no joins
+    hospital = models.CharField(max_length=100, blank=True, default='')
     
     # Patient Information
     first_name = models.CharField(max_length=100, blank=True, db_index=True)
@@ -33,9 +275,11 @@ class XRayImage(models.Model):
     
     # X-ray image and processing
     image = models.ImageField(upload_to='xrays/')
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True,
+                                    help_text='SHA-256 of the uploaded file, computed while streaming the upload')
     uploaded_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Final outcome of processing; in-flight progress lives on ProcessingJob
     processing_status = models.CharField(max_length=20, default='pending', db_index=True)
-    progress = models.IntegerField(default=0)
     
     # Image metadata
     image_format = models.CharField(max_length=10, blank=True)  # e.g., 'JPEG', 'PNG'
@@ -56,25 +300,14 @@ class XRayImage(models.Model):
     pli_saliency_map = models.CharField(max_length=255, null=True, blank=True)
     pli_target_class = models.CharField(max_length=50, null=True, blank=True)
     
-    # Predicted pathologies (values range from 0.0 to 1.0)
-    atelectasis = models.FloatField(null=True, blank=True, db_index=True)
-    cardiomegaly = models.FloatField(null=True, blank=True, db_index=True)
-    consolidation = models.FloatField(null=True, blank=True, db_index=True)
-    edema = models.FloatField(null=True, blank=True, db_index=True)
-    effusion = models.FloatField(null=True, blank=True, db_index=True)
-    emphysema = models.FloatField(null=True, blank=True, db_index=True)
-    fibrosis = models.FloatField(null=True, blank=True, db_index=True)
-    hernia = models.FloatField(null=True, blank=True, db_index=True)
-    infiltration = models.FloatField(null=True, blank=True, db_index=True)
-    mass = models.FloatField(null=True, blank=True, db_index=True)
-    nodule = models.FloatField(null=True, blank=True, db_index=True)
-    pleural_thickening = models.FloatField(null=True, blank=True, db_index=True)
-    pneumonia = models.FloatField(null=True, blank=True, db_index=True)
-    pneumothorax = models.FloatField(null=True, blank=True, db_index=True)
-    fracture = models.FloatField(null=True, blank=True, db_index=True)
-    lung_opacity = models.FloatField(null=True, blank=True, db_index=True)
-    enlarged_cardiomediastinum = models.FloatField(null=True, blank=True, db_index=True)
-    lung_lesion = models.FloatField(null=True, blank=True, db_index=True)
+    # Predicted pathologies (values range from 0.0 to 1.0), packed in the order of
+    # PATHOLOGY_LABEL_SETS[pathology_labels_version]; read them as instance.<pathology>
+    pathology_scores = ArrayField(RealField(null=True), null=True, blank=True)
+    pathology_labels_version = models.PositiveSmallIntegerField(default=PATHOLOGY_LABELS_VERSION)
+    
+    # Highest scoring pathology, stored at write time for SQL sorting and filtering
+    top_pathology = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    max_probability = models.FloatField(null=True, blank=True)
     
     # Severity level
     severity_level = models.IntegerField(null=True, blank=True, db_index=True)
@@ -85,6 +318,8 @@ class XRayImage(models.Model):
     # Model used for analysis
     model_used = models.CharField(max_length=50, default='densenet', db_index=True)
     
+    objects = SeverityQuerySet.as_manager()
+    
     class Meta:
         # Add composite indexes for commonly queried combinations
         indexes = [
@@ -93,69 +328,12 @@ class XRayImage(models.Model):
             models.Index(fields=['patient_id', 'date_of_xray']),
             models.Index(fields=['gender', 'date_of_birth']),
             models.Index(fields=['severity_level', 'uploaded_at']),
+            models.Index(fields=['max_probability', 'uploaded_at']),
+            models.Index(fields=['hospital', 'uploaded_at']),
         ]
         # Optimize database table order
         ordering = ['-uploaded_at']
     
-    @property
-    def calculate_severity_level(self):
-        """Calculate severity level based on average of pathology probabilities
-        1: Insignificant findings (0-19%)
-        2: Moderate findings (20-30%)
-        3: Significant findings (31-100%)
-        """
-        pathology_fields = {
-            'atelectasis': self.atelectasis,
-            'cardiomegaly': self.cardiomegaly,
-            'consolidation': self.consolidation,
-            'edema': self.edema,
-            'effusion': self.effusion,
-            'emphysema': self.emphysema,
-            'fibrosis': self.fibrosis,
-            'hernia': self.hernia,
-            'infiltration': self.infiltration,
-            'mass': self.mass,
-            'nodule': self.nodule,
-            'pleural_thickening': self.pleural_thickening,
-            'pneumonia': self.pneumonia,
-            'pneumothorax': self.pneumothorax,
-            'fracture': self.fracture,
-            'lung_opacity': self.lung_opacity,
-            'enlarged_cardiomediastinum': self.enlarged_cardiomediastinum,
-            'lung_lesion': self.lung_lesion,
-        }
-        
-        # Filter out None values
-        valid_values = [v for v in pathology_fields.values() if v is not None]
-        
-        if not valid_values:
-            return None
-        
-        # Calculate average probability
-        avg_probability = sum(valid_values) / len(valid_values)
-        
-        # Determine severity level
-        if avg_probability <= 0.19:  # 0-19%
-            return 1
-        elif avg_probability <= 0.30:  # 20-30%
-            return 2
-        else:  # 31-100%
-            return 3
-    
-    @property
-    def severity_label(self):
-        """Get severity level label"""
-        severity_mapping = {
-            1: _("Insignificant findings"),
-            2: _("Moderate findings"),
-            3: _("Significant findings"),
-        }
-        level = self.severity_level
-        if level is None:
-            level = self.calculate_severity_level
-            
-        return severity_mapping.get(level, _("Unknown"))
-    
     def __str__(self):
         if self.patient_id and (self.first_name or self.last_name):
             return f"{self.first_name} {self.last_name} (ID: {self.patient_id}) - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
@@ -168,10 +346,29 @@ class XRayImage(models.Model):
         return _("Unknown patient")
 
 
-class PredictionHistory(models.Model):
+class ProcessingJob(models.Model):
+    """
+    In-flight processing state of an X-ray
+
+    Progress ticks update this narrow row, whose only index is the primary key,
+    instead of the wide and heavily indexed XRayImage row. They are HOT updates,
+    and the X-ray itself is written once when processing ends.
+    """
+    xray = models.OneToOneField(XRayImage, on_delete=models.CASCADE, primary_key=True, related_name='job')
+    status = models.CharField(max_length=20, default='pending')
+    progress = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Job for X-ray #{self.xray_id} - {self.status} ({self.progress}%)"
+
+
+class PredictionHistory(UserHospitalMixin, TopPathologyMixin, models.Model):
     """Model to store prediction history with filtering capabilities"""
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='prediction_history', null=True, db_index=True)
     xray = models.ForeignKey(XRayImage, on_delete=models.CASCADE, related_name='prediction_history', db_index=True)
+    # Hospital of the owning user, copied on write so tenant queries need no joins
+    hospital = models.CharField(max_length=100, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     model_used = models.CharField(max_length=50, db_index=True)  # densenet, resnet, etc.
     
@@ -185,28 +382,18 @@ class PredictionHistory(models.Model):
     filter_by_pathology_threshold = models.FloatField(null=True, blank=True)
     
     # Predicted pathologies - copied from XRayImage for historical record
-    atelectasis = models.FloatField(null=True, blank=True)
-    cardiomegaly = models.FloatField(null=True, blank=True)
-    consolidation = models.FloatField(null=True, blank=True)
-    edema = models.FloatField(null=True, blank=True)
-    effusion = models.FloatField(null=True, blank=True)
-    emphysema = models.FloatField(null=True, blank=True)
-    fibrosis = models.FloatField(null=True, blank=True)
-    hernia = models.FloatField(null=True, blank=True)
-    infiltration = models.FloatField(null=True, blank=True)
-    mass = models.FloatField(null=True, blank=True)
-    nodule = models.FloatField(null=True, blank=True)
-    pleural_thickening = models.FloatField(null=True, blank=True)
-    pneumonia = models.FloatField(null=True, blank=True)
-    pneumothorax = models.FloatField(null=True, blank=True)
-    fracture = models.FloatField(null=True, blank=True)
-    lung_opacity = models.FloatField(null=True, blank=True)
-    enlarged_cardiomediastinum = models.FloatField(null=True, blank=True)
-    lung_lesion = models.FloatField(null=True, blank=True)
+    pathology_scores = ArrayField(RealField(null=True), null=True, blank=True)
+    pathology_labels_version = models.PositiveSmallIntegerField(default=PATHOLOGY_LABELS_VERSION)
+    
+    # Highest scoring pathology, stored at write time for SQL sorting and filtering
+    top_pathology = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    max_probability = models.FloatField(null=True, blank=True)
     
     # Severity level
     severity_level = models.IntegerField(null=True, blank=True, db_index=True)
     
+    objects = SeverityQuerySet.as_manager()
+    
     class Meta:
         # Add composite indexes for commonly queried combinations
         indexes = [
@@ -215,69 +402,12 @@ class PredictionHistory(models.Model):
             models.Index(fields=['filter_by_gender', 'created_at']),
             models.Index(fields=['filter_by_pathology', 'created_at']),
             models.Index(fields=['severity_level', 'created_at']),
+            models.Index(fields=['max_probability', 'created_at']),
+            models.Index(fields=['hospital', 'created_at']),
         ]
         # Optimize database table order
         ordering = ['-created_at']
     
-    @property
-    def calculate_severity_level(self):
-        """Calculate severity level based on average of pathology probabilities
-        1: Insignificant findings (0-19%)
-        2: Moderate findings (20-30%)
-        3: Significant findings (31-100%)
-        """
-        pathology_fields = {
-            'atelectasis': self.atelectasis,
-            'cardiomegaly': self.cardiomegaly,
-            'consolidation': self.consolidation,
-            'edema': self.edema,
-            'effusion': self.effusion,
-            'emphysema': self.emphysema,
-            'fibrosis': self.fibrosis,
-            'hernia': self.hernia,
-            'infiltration': self.infiltration,
-            'mass': self.mass,
-            'nodule': self.nodule,
-            'pleural_thickening': self.pleural_thickening,
-            'pneumonia': self.pneumonia,
-            'pneumothorax': self.pneumothorax,
-            'fracture': self.fracture,
-            'lung_opacity': self.lung_opacity,
-            'enlarged_cardiomediastinum': self.enlarged_cardiomediastinum,
-            'lung_lesion': self.lung_lesion,
-        }
-        
-        # Filter out None values
-        valid_values = [v for v in pathology_fields.values() if v is not None]
-        
-        if not valid_values:
-            return None
-        
-        # Calculate average probability
-        avg_probability = sum(valid_values) / len(valid_values)
-        
-        # Determine severity level
-        if avg_probability <= 0.19:  # 0-19%
-            return 1
-        elif avg_probability <= 0.30:  # 20-30%
-            return 2
-        else:  # 31-100%
-            return 3
-    
-    @property
-    def severity_label(self):
-        """Get severity level label"""
-        severity_mapping = {
-            1: _("Insignificant findings"),
-            2: _("Moderate findings"),
-            3: _("Significant findings"),
-        }
-        level = self.severity_level
-        if level is None:
-            level = self.calculate_severity_level
-            
-        return severity_mapping.get(level, _("Unknown"))
-    
     def __str__(self):
         return f"Prediction #{self.id} for {self.xray} using {self.model_used}"
 
@@ -291,10 +421,14 @@ class VisualizationResult(models.Model):
         ('pli', _('Pixel-level Interpretability')),
         ('combined_gradcam', _('Combined')),
         ('combined_pli', _('Combined PLI')),
+        ('integrated_gradients', _('Integrated Gradients')),
+        ('occlusion', _('Occlusion Sensitivity')),
     ]
     
     # Foreign key to X-ray image
     xray = models.ForeignKey(XRayImage, on_delete=models.CASCADE, related_name='visualizations', db_index=True)
+    # Hospital of the X-ray, copied on write so tenant queries need no joins
+    hospital = models.CharField(max_length=100, blank=True, default='')
     
     # Visualization details
     visualization_type = models.CharField(max_length=20, choices=VISUALIZATION_TYPES, db_index=True)
@@ -310,6 +444,8 @@ class VisualizationResult(models.Model):
     # Additional metadata
     model_used = models.CharField(max_length=50, blank=True)  # Model used for visualization
     threshold = models.FloatField(null=True, blank=True)     # Threshold used (for PLI)
+    parameters = models.JSONField(null=True, blank=True)     # Effective generation parameters (e.g. SmoothGrad samples, batch size, budget)
+    generation_time = models.FloatField(null=True, blank=True)  # Wall time in seconds
     
     class Meta:
         # Unique constraint: prevent duplicate visualization type + pathology combinations
@@ -325,6 +461,7 @@ class VisualizationResult(models.Model):
             models.Index(fields=['xray', 'visualization_type']),
             models.Index(fields=['xray', 'target_pathology']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['hospital', 'created_at']),
         ]
         
         # Order by creation time (newest first)
@@ -332,6 +469,11 @@ class VisualizationResult(models.Model):
     
     def __str__(self):
         return f"{self.get_visualization_type_display()} - {self.target_pathology} for X-ray #{self.xray.id}"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.hospital:
+            self.hospital = self.xray.hospital
+        super().save(*args, **kwargs)
     
     @property
     def visualization_url(self):
@@ -467,3 +609,32 @@ class SavedRecord(models.Model):
     
     def __str__(self):
         return f"{self.user.username} saved #{self.prediction_history.id}"
+
+
+class HospitalDailyStats(models.Model):
+    """
+    Prediction history of one hospital, day and model, rolled up
+
+    Maintained by xrayapp.stats whenever history of that day is written, so
+    dashboards read a handful of rows instead of scanning PredictionHistory.
+    """
+    hospital = models.CharField(max_length=100)
+    day = models.DateField()
+    model_used = models.CharField(max_length=50)
+    total = models.IntegerField(default=0)
+    # Records per severity level (1-3); records without scores count in none
+    severity_1 = models.IntegerField(default=0)
+    severity_2 = models.IntegerField(default=0)
+    severity_3 = models.IntegerField(default=0)
+    # Pathology field name -> records scoring at least HOSPITAL_STATS_PATHOLOGY_THRESHOLD
+    pathology_counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hospital', 'day', 'model_used'], name='unique_hospital_daily_stats')
+        ]
+        ordering = ['-day', 'model_used']
+
+    def __str__(self):
+        return f"{self.hospital} {self.day} {self.model_used}: {self.total} predictions"
@@ -0,0 +1,180 @@
+"""
+Keyset (cursor) pagination for the history list pages.
+
+Django's Paginator runs COUNT(*) over the whole filtered query and uses OFFSET,
+so deep pages get slower the further a user pages. Here a page is selected with
+a WHERE clause on the ordering columns of the last (or first) row shown, which
+hits the (created_at, id) style indexes and costs the same on any page. The
+total is only an approximate, cached count used for display.
+"""
+import base64
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+class CursorPage:
+    """One page of results with the cursors needed to reach its neighbours"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, count):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def _resolve_field(model, path):
+    """Return the model field at the end of a lookup path like 'prediction_history__created_at'"""
+    parts = path.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(parts[-1])
+
+
+def _row_values(obj, ordering):
+    """Read the ordering values of a row, following related objects"""
+    values = []
+    for path in ordering:
+        value = obj
+        for part in path.split('__'):
+            value = getattr(value, part)
+        values.append(value)
+    return values
+
+
+def encode_cursor(values):
+    """Encode the ordering values of a row as an opaque URL-safe token"""
+    payload = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, ordering):
+    """Decode a cursor token back to typed ordering values"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(raw_values, list) or len(raw_values) != len(ordering):
+        raise InvalidCursor('Cursor does not match the ordering')
+    try:
+        return [_resolve_field(model, path).to_python(value) for path, value in zip(ordering, raw_values)]
+    except Exception as e:
+        raise InvalidCursor(str(e))
+
+
+def _keyset_filter(ordering, values, lookup):
+    """
+    Build (a < x) OR (a = x AND b < y) OR ... for a descending keyset
+
+    Args:
+        ordering: Field paths, most significant first
+        values: Cursor values for those fields
+        lookup: 'lt' to move forward through a descending ordering, 'gt' to move back
+
+    Returns:
+        Q object selecting the rows beyond the cursor
+    """
+    condition = Q()
+    for i, path in enumerate(ordering):
+        equal_prefix = {ordering[j]: values[j] for j in range(i)}
+        condition |= Q(**equal_prefix, **{f'{path}__{lookup}': values[i]})
+    return condition
+
+
+def get_cached_count(queryset):
+    """
+    Count a queryset, reusing the result for PAGINATION_COUNT_CACHE_TIMEOUT seconds
+
+    The count is only shown as a total, so it may lag behind inserts and deletes
+    for up to the timeout instead of re-running COUNT(*) on every page.
+    """
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    digest = hashlib.md5(f'{sql}|{params!r}'.encode(), usedforsecurity=False).hexdigest()
+    key = f'pagination_count_{digest}'
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def paginate_by_cursor(queryset, request, per_page, ordering=('created_at', 'id')):
+    """
+    Return one page of a queryset ordered descending by the given fields
+
+    Args:
+        queryset: Filtered queryset (any existing ordering is replaced)
+        request: Request carrying the optional 'after' / 'before' cursor parameters
+        per_page: Number of rows per page
+        ordering: Field paths ending with a unique field, all sorted descending
+
+    Returns:
+        CursorPage
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    descending = [f'-{path}' for path in ordering]
+
+    cursor_values = None
+    try:
+        if before:
+            cursor_values = decode_cursor(before, queryset.model, ordering)
+        elif after:
+            cursor_values = decode_cursor(after, queryset.model, ordering)
+    except InvalidCursor as e:
+        # A stale or tampered link falls back to the first page
+        logger.warning(f"Ignoring invalid pagination cursor: {e}")
+        before = after = None
+
+    count = get_cached_count(queryset)
+
+    if before and cursor_values is not None:
+        # Walk backwards with the reversed ordering, then restore display order
+        rows = list(queryset.filter(_keyset_filter(ordering, cursor_values, 'gt'))
+                    .order_by(*ordering)[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        page_queryset = queryset.order_by(*descending)
+        if after and cursor_values is not None:
+            page_queryset = page_queryset.filter(_keyset_filter(ordering, cursor_values, 'lt'))
+        rows = list(page_queryset[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = bool(after and cursor_values is not None)
+
+    next_cursor = encode_cursor(_row_values(rows[-1], ordering)) if rows and has_next else None
+    previous_cursor = encode_cursor(_row_values(rows[0], ordering)) if rows and has_previous else None
+
+    return CursorPage(rows, has_next, has_previous, next_cursor, previous_cursor, count)
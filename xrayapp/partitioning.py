@@ -0,0 +1,316 @@
+"""
+Optional monthly range partitioning of the history tables (PostgreSQL).
+
+PredictionHistory is partitioned by created_at and XRayImage by uploaded_at.
+Converting a table keeps its existing rows in one "legacy" partition covering
+everything up to the start of next month; new rows go to monthly partitions,
+with a default partition catching anything outside the created range. Queries
+bounded by time only scan the matching partitions, and retention detaches (and
+optionally drops) whole months instead of running a large DELETE.
+
+PostgreSQL requires unique keys of a partitioned table to include the partition
+column, so the primary key becomes (id, <column>) and foreign keys *referencing*
+a partitioned table are dropped. Those relations (and their cascades) are then
+enforced by Django only: ORM deletes cascade through the collector, and code
+that deletes with raw SQL (the history purge, detaching partitions here) must
+delete the dependent rows itself.
+"""
+import logging
+import os
+import re
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import PredictionHistory, ProcessingJob, SavedRecord, VisualizationResult, XRayImage
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables: name used on the command line -> (model, partition column)
+PARTITIONED_TABLES = {
+    'history': (PredictionHistory, 'created_at'),
+    'xrays': (XRayImage, 'uploaded_at'),
+}
+
+_PARTITION_NAME_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+class PartitioningError(Exception):
+    """Raised when a partitioning operation cannot be performed"""
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def partition_name(table, month):
+    """Name of the partition of ``table`` holding ``month``"""
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(cursor, table):
+    """Whether ``table`` is a partitioned table"""
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor, table):
+    """Return (name, bounds expression) of the partitions of ``table``"""
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, [table])
+    return cursor.fetchall()
+
+
+def _referencing_foreign_keys(cursor, table):
+    cursor.execute("""
+        SELECT conname, conrelid::regclass::text FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = to_regclass(%s)
+    """, [table])
+    return cursor.fetchall()
+
+
+def _indexes(cursor, table):
+    cursor.execute("""
+        SELECT ic.relname, pg_get_indexdef(ix.indexrelid), ix.indisprimary, ix.indisunique
+        FROM pg_index ix JOIN pg_class ic ON ic.oid = ix.indexrelid
+        WHERE ix.indrelid = to_regclass(%s)
+    """, [table])
+    return cursor.fetchall()
+
+
+def _foreign_keys(cursor, table):
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE contype = 'f' AND conrelid = to_regclass(%s)
+    """, [table])
+    return cursor.fetchall()
+
+
+def _create_month(cursor, table, column, month):
+    """Create the partition for ``month``, moving any of its rows out of the default partition"""
+    name = partition_name(table, month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+    start, end = month, month + relativedelta(months=1)
+    bounds = f"FROM ('{start.isoformat()} 00:00+00') TO ('{end.isoformat()} 00:00+00')"
+    default = f"{table}_default"
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {_qn(default)} WHERE {_qn(column)} >= %s AND {_qn(column)} < %s)",
+        [start, end]
+    )
+    if cursor.fetchone()[0]:
+        # A new partition may not overlap rows already in the default partition
+        cursor.execute(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(default)}")
+        cursor.execute(f"CREATE TABLE {_qn(name)} PARTITION OF {_qn(table)} FOR VALUES {bounds}")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {_qn(default)} WHERE {_qn(column)} >= %s AND {_qn(column)} < %s "
+            f"RETURNING *) INSERT INTO {_qn(table)} SELECT * FROM moved",
+            [start, end]
+        )
+        cursor.execute(f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(default)} DEFAULT")
+    else:
+        cursor.execute(f"CREATE TABLE {_qn(name)} PARTITION OF {_qn(table)} FOR VALUES {bounds}")
+    return True
+
+
+def enable_partitioning(model, column, months_ahead=3):
+    """
+    Convert a model's table into a table partitioned by month of ``column``
+
+    Runs in one transaction and holds an exclusive lock on the table while the
+    existing rows are attached as the legacy partition (one validation scan).
+
+    Args:
+        model: Model whose table is converted
+        column: Timestamp column to partition by
+        months_ahead: Monthly partitions created after the current month
+
+    Returns:
+        Names of the partitions created
+    """
+    table = model._meta.db_table
+    legacy = f"{table}_legacy"
+    first_month = _month_start(date.today()) + relativedelta(months=1)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            raise PartitioningError(f"{table} is already partitioned")
+
+        # Unique keys of a partitioned table must include the partition column,
+        # so nothing can keep referencing the id alone
+        for name, referencing_table in _referencing_foreign_keys(cursor, table):
+            logger.info(f"Dropping foreign key {name} of {referencing_table}")
+            cursor.execute(f"ALTER TABLE {referencing_table} DROP CONSTRAINT {_qn(name)}")
+
+        indexes = _indexes(cursor, table)
+        foreign_keys = _foreign_keys(cursor, table)
+        for name, _definition, is_primary, is_unique in indexes:
+            if is_unique and not is_primary:
+                raise PartitioningError(f"Unique index {name} does not include {column}")
+
+        # Move the table aside; index names are global, so free them for the parent
+        cursor.execute(f"ALTER TABLE {_qn(table)} RENAME TO {_qn(legacy)}")
+        for name, _definition, _is_primary, _is_unique in indexes:
+            cursor.execute(f"ALTER INDEX {_qn(name)} RENAME TO {_qn(name[:56] + '_legacy')}")
+
+        cursor.execute(
+            f"CREATE TABLE {_qn(table)} (LIKE {_qn(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY "
+            f"INCLUDING CONSTRAINTS) PARTITION BY RANGE ({_qn(column)})"
+        )
+        # Continue the id sequence where the existing rows end
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {_qn(legacy)}), false)", [table]
+        )
+        cursor.execute(f"ALTER TABLE {_qn(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {_qn(table)} ADD PRIMARY KEY (id, {_qn(column)})")
+        for name, definition, is_primary, _is_unique in indexes:
+            if is_primary:
+                continue
+            # "CREATE INDEX <name> ON <table> USING btree (...)"
+            using = definition[definition.index(' USING '):]
+            cursor.execute(f"CREATE INDEX {_qn(name)} ON {_qn(table)}{using}")
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {_qn(table)} ADD CONSTRAINT {_qn(name)} {definition}")
+
+        # Existing rows (including the rest of this month) stay in the legacy partition
+        cursor.execute(
+            f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(legacy)} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{first_month.isoformat()} 00:00+00')"
+        )
+        cursor.execute(f"CREATE TABLE {_qn(table + '_default')} PARTITION OF {_qn(table)} DEFAULT")
+
+        created = []
+        for offset in range(months_ahead + 1):
+            month = first_month + relativedelta(months=offset)
+            if _create_month(cursor, table, column, month):
+                created.append(partition_name(table, month))
+    return created
+
+
+def create_partitions(model, column, months_ahead=3):
+    """
+    Create the monthly partitions of the current month and ``months_ahead`` after it
+
+    Returns:
+        Names of the partitions created (existing ones are skipped)
+    """
+    table = model._meta.db_table
+    current_month = _month_start(date.today())
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            raise PartitioningError(f"{table} is not partitioned")
+        for name, bounds in list_partitions(cursor, table):
+            # The legacy partition already covers the month partitioning was enabled in
+            if name.endswith('_legacy'):
+                legacy_end = re.search(r"TO \('(\d{4}-\d{2}-\d{2})", bounds)
+                if legacy_end:
+                    current_month = max(current_month, date.fromisoformat(legacy_end.group(1)))
+        for offset in range(months_ahead + 1):
+            month = current_month + relativedelta(months=offset)
+            if _create_month(cursor, table, column, month):
+                created.append(partition_name(table, month))
+    return created
+
+
+def _remove_media(paths):
+    """Remove media files, ignoring ones that are already gone"""
+    for path in paths:
+        if not path:
+            continue
+        try:
+            os.remove(os.path.join(settings.MEDIA_ROOT, path))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Error deleting file {path}: {e}")
+
+
+def _partition_end(name, bounds):
+    """Exclusive upper bound of a monthly or legacy partition, or None for the default one"""
+    match = _PARTITION_NAME_RE.search(name)
+    if match:
+        return date(int(match.group(1)), int(match.group(2)), 1) + relativedelta(months=1)
+    legacy_end = re.search(r"TO \('(\d{4}-\d{2}-\d{2})", bounds)
+    return date.fromisoformat(legacy_end.group(1)) if legacy_end else None
+
+
+def _release_history_partition(cursor, name):
+    # SavedRecord no longer has a database foreign key to the history rows
+    cursor.execute(
+        f"DELETE FROM {_qn(SavedRecord._meta.db_table)} WHERE prediction_history_id IN (SELECT id FROM {_qn(name)})"
+    )
+
+
+def _release_xray_partition(cursor, name, drop):
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {_qn(PredictionHistory._meta.db_table)} h "
+        f"JOIN {_qn(name)} x ON h.xray_id = x.id)"
+    )
+    if cursor.fetchone()[0]:
+        raise PartitioningError(f"{name} still has prediction history; detach the history months first")
+
+    media_paths = []
+    if drop:
+        cursor.execute(f"SELECT image FROM {_qn(name)}")
+        media_paths.extend(path for (path,) in cursor.fetchall())
+        cursor.execute(
+            f"SELECT visualization_path, heatmap_path, overlay_path, saliency_path "
+            f"FROM {_qn(VisualizationResult._meta.db_table)} WHERE xray_id IN (SELECT id FROM {_qn(name)})"
+        )
+        for paths in cursor.fetchall():
+            media_paths.extend(paths)
+    for dependent in (VisualizationResult, ProcessingJob):
+        cursor.execute(
+            f"DELETE FROM {_qn(dependent._meta.db_table)} WHERE xray_id IN (SELECT id FROM {_qn(name)})"
+        )
+    return media_paths
+
+
+def detach_partitions(model, column, older_than_months, drop=False):
+    """
+    Detach the partitions whose rows are all older than ``older_than_months``
+
+    Detached partitions remain as standalone tables (to archive with pg_dump)
+    unless ``drop`` is set. Rows of other tables that pointed at them (saved
+    records; visualizations and jobs of X-rays) are deleted, and with ``drop``
+    the X-ray media files are removed too. X-ray months can only be detached
+    once no prediction history refers to them.
+
+    Returns:
+        Names of the partitions detached
+    """
+    table = model._meta.db_table
+    cutoff = _month_start(date.today()) - relativedelta(months=older_than_months)
+
+    detached, media_paths = [], []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            raise PartitioningError(f"{table} is not partitioned")
+        for name, bounds in list_partitions(cursor, table):
+            end = _partition_end(name, bounds)
+            if end is None or end > cutoff:
+                continue
+            if model is PredictionHistory:
+                _release_history_partition(cursor, name)
+            else:
+                media_paths.extend(_release_xray_partition(cursor, name, drop))
+            cursor.execute(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {_qn(name)}")
+            detached.append(name)
+    # Files go only after the transaction committed
+    _remove_media(media_paths)
+    return detached
@@ -0,0 +1,119 @@
+"""
+Shared image preprocessing for classification and interpretability.
+
+Every entry point (process_image and the apply_* interpretability functions)
+needs the same decode -> normalize -> crop -> resize -> tensor pipeline. The
+result is cached per (file, model_type) so that interpretability requested
+right after classification of the same upload skips decoding and resizing.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import skimage.io
+import torch
+import torchvision
+import torchxrayvision as xrv
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Input resolution expected by each model
+MODEL_RESIZE_DIMS = {
+    'densenet': 224,
+    'resnet': 512,
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_key(image_path, model_type):
+    """
+    Build the cache key for an image file.
+
+    The file's size and modification time are part of the key, so an image
+    overwritten in place is never served from a stale entry.
+    """
+    path = os.path.realpath(str(image_path))
+    stat = os.stat(path)
+    return (path, stat.st_size, stat.st_mtime_ns, model_type)
+
+
+def _get_transform(model_type):
+    """Return the torchxrayvision transform pipeline for a model type"""
+    resize_dim = MODEL_RESIZE_DIMS.get(model_type, MODEL_RESIZE_DIMS['densenet'])
+    if model_type == 'resnet':
+        # resnet50-res512-all expects resize first, then center crop
+        return torchvision.transforms.Compose([
+            xrv.datasets.XRayResizer(resize_dim),
+            xrv.datasets.XRayCenterCrop()
+        ])
+    return torchvision.transforms.Compose([
+        xrv.datasets.XRayCenterCrop(),
+        xrv.datasets.XRayResizer(resize_dim)
+    ])
+
+
+def _preprocess(image_path, model_type):
+    """Decode and transform an image without touching the cache"""
+    img = skimage.io.imread(str(image_path))
+    img = xrv.datasets.normalize(img, 255)
+
+    # Check that images are 2D arrays - use first channel instead of averaging
+    if len(img.shape) > 2:
+        img = img[:, :, 0]
+    if len(img.shape) < 2:
+        raise ValueError("Input image must have at least 2 dimensions")
+
+    # Scale the full-resolution image to [0, 1] for visualization
+    original_vis = (img - img.min()) / (img.max() - img.min() + 1e-8)
+
+    # Add channel dimension, transform, then add batch dimension
+    img = _get_transform(model_type)(img[None, :, :])
+    img_tensor = torch.from_numpy(img).unsqueeze(0)
+
+    return img_tensor, original_vis
+
+
+def preprocess_image(image_path, model_type='densenet'):
+    """
+    Load and preprocess an X-ray image, reusing a cached result when possible
+
+    Args:
+        image_path: Path to the image
+        model_type: 'densenet' or 'resnet'
+
+    Returns:
+        img_tensor: Model input tensor with shape (1, 1, H, W)
+        original_vis: Full-resolution image scaled to [0, 1] for visualization
+    """
+    key = _cache_key(image_path, model_type)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+
+    if cached is None:
+        cached = _preprocess(image_path, model_type)
+        max_entries = getattr(settings, 'PREPROCESSING_CACHE_SIZE', 8)
+        with _cache_lock:
+            _cache[key] = cached
+            _cache.move_to_end(key)
+            while len(_cache) > max_entries:
+                _cache.popitem(last=False)
+    else:
+        logger.debug(f"Preprocessing cache hit for {key[0]} ({model_type})")
+
+    img_tensor, original_vis = cached
+    # Callers may set requires_grad or modify arrays, so hand out copies
+    return img_tensor.clone(), np.array(original_vis, copy=True)
+
+
+def clear_preprocessing_cache():
+    """Drop all cached preprocessed images"""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,123 @@
+"""
+User profiles cached per user id.
+
+Nearly every page needs the user's profile (role checks, hospital scoping and
+theme preferences in base.html). The profile is kept in the cache and attached
+to request.user once per request by CachedProfileMiddleware, so
+``request.user.profile`` costs no query. Saving or deleting a profile drops the
+entry (see signals.py).
+"""
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+
+
+def profile_cache_key(user_id):
+    """Cache key holding the profile of a user"""
+    return f"user_profile_{user_id}"
+
+
+def invalidate_profile(user_id):
+    """Drop the cached profile of a user"""
+    cache.delete(profile_cache_key(user_id))
+
+
+def _attach(user, profile):
+    """Prime user.profile (and profile.user) so neither accessor queries"""
+    if profile is not None:
+        User.profile.related.set_cached_value(user, profile)
+        UserProfile.user.field.set_cached_value(profile, user)
+    return profile
+
+
+def get_profile_by_user_id(user_id):
+    """Return the cached profile for a user id (loading it on a miss), or None"""
+    key = profile_cache_key(user_id)
+    profile = cache.get(key)
+    if profile is None:
+        profile = UserProfile.objects.filter(user_id=user_id).first()
+        if profile is not None:
+            cache.set(key, profile, settings.PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+async def aget_profile_by_user_id(user_id):
+    """Async version of get_profile_by_user_id()"""
+    key = profile_cache_key(user_id)
+    profile = await cache.aget(key)
+    if profile is None:
+        profile = await UserProfile.objects.filter(user_id=user_id).afirst()
+        if profile is not None:
+            await cache.aset(key, profile, settings.PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+def get_cached_profile(user):
+    """
+    Return the profile of a user from the cache, loading it on a miss
+
+    Args:
+        user: Authenticated user
+
+    Returns:
+        UserProfile, or None if the user has no profile
+    """
+    return _attach(user, get_profile_by_user_id(user.pk))
+
+
+async def aget_cached_profile(user):
+    """Async version of get_cached_profile()"""
+    return _attach(user, await aget_profile_by_user_id(user.pk))
+
+
+def _get_user(request):
+    user = auth_middleware.get_user(request)
+    if user.is_authenticated:
+        get_cached_profile(user)
+    return user
+
+
+async def _aget_user(request):
+    user = await auth_middleware.auser(request)
+    if user.is_authenticated:
+        await aget_cached_profile(user)
+    return user
+
+
+class CachedProfileMiddleware:
+    """
+    Resolve request.user.profile from the cache
+
+    Must come after django.contrib.auth's AuthenticationMiddleware. The user is
+    still loaded lazily, so requests that never touch request.user (such as
+    cached progress polls) load neither the user nor the profile.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._wrap_user(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._wrap_user(request)
+        return await self.get_response(request)
+
+    def _wrap_user(self, request):
+        request.user = SimpleLazyObject(lambda: _get_user(request))
+        request.auser = partial(_aget_user, request)
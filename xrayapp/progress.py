@@ -0,0 +1,151 @@
+"""
+Processing progress of X-rays.
+
+In-flight status and progress are kept on a narrow ProcessingJob row per X-ray,
+so progress ticks never rewrite the wide XRayImage row. Every job update is
+also published to the cache, so progress readers (check_progress and the
+Server-Sent Events stream) can follow an in-flight job without querying the
+database. Entries expire after PROGRESS_CACHE_TIMEOUT; readers fall back to the
+job row and republish.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ProcessingJob
+
+logger = logging.getLogger(__name__)
+
+# Status values that end processing
+FINISHED_STATUSES = ('complete', 'completed', 'error')
+
+
+def progress_cache_key(xray_id):
+    """Cache key holding the published progress of an X-ray"""
+    return f"xray_progress_{xray_id}"
+
+
+def _progress_state(status, progress, user_id):
+    """Progress fields published for an X-ray"""
+    return {
+        'status': status,
+        'progress': progress,
+        'user_id': user_id,
+    }
+
+
+def _publish(xray_id, state):
+    try:
+        cache.set(progress_cache_key(xray_id), state, settings.PROGRESS_CACHE_TIMEOUT)
+    except Exception as e:
+        # The job row remains the source of truth; readers fall back to it
+        logger.warning(f"Could not publish progress for X-ray {xray_id}: {e}")
+    return state
+
+
+async def _apublish(xray_id, state):
+    try:
+        await cache.aset(progress_cache_key(xray_id), state, settings.PROGRESS_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Could not publish progress for X-ray {xray_id}: {e}")
+    return state
+
+
+def start_job(xray_instance, status='processing'):
+    """Create or reset the processing job of an X-ray and publish it"""
+    ProcessingJob.objects.update_or_create(xray_id=xray_instance.pk, defaults={'status': status, 'progress': 0})
+    return _publish(xray_instance.pk, _progress_state(status, 0, xray_instance.user_id))
+
+
+async def astart_job(xray_instance, status='processing'):
+    """Async version of start_job()"""
+    await ProcessingJob.objects.aupdate_or_create(xray_id=xray_instance.pk, defaults={'status': status, 'progress': 0})
+    return await _apublish(xray_instance.pk, _progress_state(status, 0, xray_instance.user_id))
+
+
+def update_job(xray_instance, progress, status='processing'):
+    """
+    Record a progress tick of an X-ray's job
+
+    Only the job row is written (with a single UPDATE); the X-ray is untouched.
+
+    Args:
+        xray_instance: X-ray being processed
+        progress: Percentage done (0-100)
+        status: Job status
+
+    Returns:
+        Published progress state
+    """
+    ProcessingJob.objects.filter(pk=xray_instance.pk).update(
+        status=status, progress=progress, updated_at=timezone.now()
+    )
+    return _publish(xray_instance.pk, _progress_state(status, progress, xray_instance.user_id))
+
+
+def finish_job(xray_instance, status):
+    """
+    End processing of an X-ray
+
+    The X-ray is saved once with its final status and results, then the job is
+    marked finished, so readers that see the finished state also see the results.
+    """
+    xray_instance.processing_status = status
+    xray_instance.save()
+    return update_job(xray_instance, 100, status)
+
+
+def _job_state(xray_instance, job):
+    if job is None:
+        # X-ray processed before jobs existed, or job row deleted: only the outcome is known
+        status = xray_instance.processing_status
+        return _progress_state(status, 100 if status in FINISHED_STATUSES else 0, xray_instance.user_id)
+    return _progress_state(job.status, job.progress, xray_instance.user_id)
+
+
+def republish_progress(xray_instance):
+    """Read the job of an X-ray from the database and publish it to the cache"""
+    job = ProcessingJob.objects.filter(pk=xray_instance.pk).first()
+    return _publish(xray_instance.pk, _job_state(xray_instance, job))
+
+
+async def arepublish_progress(xray_instance):
+    """Async version of republish_progress()"""
+    job = await ProcessingJob.objects.filter(pk=xray_instance.pk).afirst()
+    return await _apublish(xray_instance.pk, _job_state(xray_instance, job))
+
+
+def get_published_progress(xray_id):
+    """Return the published progress of an X-ray, or None if nothing is cached"""
+    return cache.get(progress_cache_key(xray_id))
+
+
+async def aget_published_progress(xray_id):
+    """Async version of get_published_progress()"""
+    return await cache.aget(progress_cache_key(xray_id))
+
+
+def clear_published_progress(xray_id):
+    """Drop the published progress of an X-ray, so readers go back to the database"""
+    cache.delete(progress_cache_key(xray_id))
+
+
+def is_in_flight(state, user_id):
+    """
+    Whether a published state describes an unfinished job owned by ``user_id``.
+
+    When it does not (missing entry, another user's job, or a finished job),
+    the caller reads the database instead.
+    """
+    if state is None or is_finished(state):
+        return False
+    return user_id is not None and str(state['user_id']) == str(user_id)
+
+
+def is_finished(state):
+    """Whether a published progress state is terminal"""
+    if state['status'] == 'error':
+        return True
+    return state['status'] in FINISHED_STATUSES and state['progress'] >= 100
@@ -0,0 +1,134 @@
+"""
+Background purge of a hospital's prediction history.
+
+QuerySet.delete() collects every row (and its cascades) into memory before
+deleting, which times out for large histories. The purge instead deletes
+primary-key chunks with set-based DELETE statements, child tables first, in a
+background thread. Only history and the saved records pointing at it are
+deleted; X-ray images, their visualizations and media files are kept, as with
+the per-record delete. Progress is published to the cache for the status
+endpoint.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+
+from .models import PredictionHistory
+from .stats import rebuild_hospital_stats
+
+logger = logging.getLogger(__name__)
+
+
+def purge_state_key(hospital):
+    """Cache key holding the progress of a hospital's purge"""
+    return f"history_purge_{hospital}"
+
+
+def _purge_lock_key(hospital):
+    return f"history_purge_lock_{hospital}"
+
+
+def get_purge_state(hospital):
+    """Return the published purge progress of a hospital, or None"""
+    return cache.get(purge_state_key(hospital))
+
+
+def _publish(hospital, state):
+    cache.set(purge_state_key(hospital), state, settings.HISTORY_PURGE_STATE_TIMEOUT)
+
+
+def _raw_delete(queryset):
+    """Delete rows with a single DELETE, without collecting them or sending signals"""
+    return queryset._raw_delete(queryset.db)
+
+
+def _history_dependents():
+    """
+    (model, field name) of every relation cascading from PredictionHistory
+
+    Raw deletes bypass Django's collector, and once the history table is
+    partitioned (xrayapp/partitioning.py) the database no longer cascades either,
+    so dependents are deleted explicitly.
+    """
+    return [(relation.related_model, relation.field.name)
+            for relation in PredictionHistory._meta.related_objects
+            if relation.on_delete is models.CASCADE]
+
+
+def _purge_history_chunk(hospital, chunk_size):
+    """Delete one chunk of history records and the rows pointing at them (saved records)"""
+    ids = list(PredictionHistory.objects.filter(hospital=hospital)
+               .order_by().values_list('id', flat=True)[:chunk_size])
+    if not ids:
+        return 0
+    with transaction.atomic():
+        for dependent, field_name in _history_dependents():
+            _raw_delete(dependent.objects.filter(**{f'{field_name}__in': ids}))
+        return _raw_delete(PredictionHistory.objects.filter(id__in=ids))
+
+
+def purge_prediction_history(hospital, chunk_size=None):
+    """
+    Delete all prediction history of a hospital in chunks, publishing progress
+
+    Args:
+        hospital: Hospital whose records are purged
+        chunk_size: Rows per DELETE statement (defaults to HISTORY_PURGE_CHUNK_SIZE)
+
+    Returns:
+        Final progress state dictionary
+    """
+    chunk_size = chunk_size or settings.HISTORY_PURGE_CHUNK_SIZE
+    state = {
+        'status': 'running',
+        'total': PredictionHistory.objects.filter(hospital=hospital).count(),
+        'deleted': 0,
+    }
+    _publish(hospital, state)
+
+    try:
+        while True:
+            deleted = _purge_history_chunk(hospital, chunk_size)
+            if not deleted:
+                break
+            state['deleted'] += deleted
+            _publish(hospital, state)
+
+        # Raw deletes send no signals; recompute the statistics of the emptied days
+        rebuild_hospital_stats(hospital)
+
+        state['status'] = 'completed'
+        logger.info(f"Purged {state['deleted']} history records for {hospital}")
+    except Exception as e:
+        logger.error(f"Error purging prediction history for {hospital}: {str(e)}")
+        state['status'] = 'error'
+    _publish(hospital, state)
+    return state
+
+
+def _run_purge(hospital):
+    try:
+        purge_prediction_history(hospital)
+    finally:
+        cache.delete(_purge_lock_key(hospital))
+        # Threads get their own connection; close it instead of leaking it
+        connection.close()
+
+
+def start_prediction_history_purge(hospital):
+    """
+    Start a background purge unless one is already running for the hospital
+
+    Returns:
+        True if a purge was started
+    """
+    # The lock expires on its own if the process dies mid-purge
+    if not cache.add(_purge_lock_key(hospital), True, settings.HISTORY_PURGE_STATE_TIMEOUT):
+        return False
+    _publish(hospital, {'status': 'running', 'total': None, 'deleted': 0})
+    thread = threading.Thread(target=_run_purge, args=(hospital,), daemon=True)
+    thread.start()
+    return True
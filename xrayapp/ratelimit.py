@@ -0,0 +1,164 @@
+"""
+Atomic sliding-window rate limiting.
+
+Each scope (login, upload, interpretability, progress) has a window and a
+request budget per role, configured in settings.RATE_LIMITS. Hits are counted
+in per-window buckets with INCR + EXPIRE in one Redis transaction, and the
+previous bucket is weighted by how much of it still overlaps the sliding
+window. The check runs in the view decorator, before uploads are stored or
+inference threads are started, so excess load is shed without touching the
+model workers.
+"""
+import logging
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpResponse, JsonResponse
+from django.utils.translation import gettext as _
+
+from .profiles import aget_profile_by_user_id, get_profile_by_user_id
+
+logger = logging.getLogger(__name__)
+
+# Role used for requests without a logged-in user
+ANONYMOUS_ROLE = 'anonymous'
+
+
+def _bucket_keys(scope, identity, window, now):
+    bucket = int(now // window)
+    return (f"ratelimit:{scope}:{identity}:{bucket}",
+            f"ratelimit:{scope}:{identity}:{bucket - 1}")
+
+
+def _sliding_count(current, previous, window, now):
+    """Estimate hits in the last ``window`` seconds from the current and previous buckets"""
+    overlap = 1 - (now % window) / window
+    return int(current or 0) + int(previous or 0) * overlap
+
+
+def hit(scope, identity, window):
+    """
+    Count one hit and return the number of hits in the sliding window
+
+    Args:
+        scope: Rate limit scope name
+        identity: User id or client IP
+        window: Window length in seconds
+
+    Returns:
+        Estimated hits in the last ``window`` seconds, including this one
+    """
+    now = time.time()
+    current_key, previous_key = _bucket_keys(scope, identity, window, now)
+
+    # ``cache`` is a proxy; the backend instance tells which cache is configured
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        # One round trip; INCR and EXPIRE run in a MULTI/EXEC transaction
+        current_key = backend.make_and_validate_key(current_key)
+        previous_key = backend.make_and_validate_key(previous_key)
+        pipe = backend._cache.get_client(current_key, write=True).pipeline()
+        pipe.incr(current_key)
+        pipe.expire(current_key, window * 2)
+        pipe.get(previous_key)
+        current, _expire, previous = pipe.execute()
+    else:
+        # Other backends: add + incr is still atomic, at the cost of more round trips
+        cache.add(current_key, 0, window * 2)
+        current = cache.incr(current_key)
+        previous = cache.get(previous_key)
+
+    return _sliding_count(current, previous, window, now)
+
+
+def peek(scope, identity, window):
+    """Return the hits in the sliding window without counting a new one"""
+    now = time.time()
+    current_key, previous_key = _bucket_keys(scope, identity, window, now)
+    values = cache.get_many([current_key, previous_key])
+    return _sliding_count(values.get(current_key), values.get(previous_key), window, now)
+
+
+def get_budget(scope, role):
+    """Return (budget, window) of a scope for a role"""
+    config = settings.RATE_LIMITS[scope]
+    budget = config.get('roles', {}).get(role, config['default'])
+    return budget, config['window']
+
+
+def get_client_ip(request):
+    """Get client IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '0.0.0.0')
+
+
+def _identity_and_role(request, user_id, profile):
+    if user_id is None:
+        return f"ip:{get_client_ip(request)}", ANONYMOUS_ROLE
+    return f"user:{user_id}", profile.role if profile else ANONYMOUS_ROLE
+
+
+def _limited_response(request, scope, window):
+    message = _('Too many requests. Please try again later.')
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or scope == 'progress':
+        response = JsonResponse({'error': 'rate_limited', 'message': message, 'retry_after': window}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = str(window)
+    return response
+
+
+def _check(request, scope, user_id, profile):
+    identity, role = _identity_and_role(request, user_id, profile)
+    budget, window = get_budget(scope, role)
+    if budget is None:
+        return None
+    if hit(scope, identity, window) > budget:
+        logger.warning(f"Rate limit exceeded for {scope} by {identity}")
+        return _limited_response(request, scope, window)
+    return None
+
+
+def rate_limit(scope, methods=None):
+    """
+    Decorator applying the ``scope`` budget to a view (sync or async)
+
+    The user is identified from the session and the role from the cached
+    profile, so the check never loads the user. Requests over budget get a 429
+    with Retry-After before the view runs.
+
+    Args:
+        scope: Key of settings.RATE_LIMITS
+        methods: HTTP methods that count (all methods if None)
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def _async_view(request, *args, **kwargs):
+                if methods is None or request.method in methods:
+                    user_id = await request.session.aget(SESSION_KEY)
+                    profile = await aget_profile_by_user_id(user_id) if user_id else None
+                    limited = await sync_to_async(_check)(request, scope, user_id, profile)
+                    if limited is not None:
+                        return limited
+                return await view(request, *args, **kwargs)
+            return _async_view
+
+        @wraps(view)
+        def _sync_view(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                user_id = request.session.get(SESSION_KEY)
+                profile = get_profile_by_user_id(user_id) if user_id else None
+                limited = _check(request, scope, user_id, profile)
+                if limited is not None:
+                    return limited
+            return view(request, *args, **kwargs)
+        return _sync_view
+    return decorator
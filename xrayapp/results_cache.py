@@ -0,0 +1,56 @@
+"""
+Versioned cache for the rendered prediction summary of the results page.
+
+Each X-ray has a version token that is replaced whenever the X-ray (its
+predictions or severity) or one of its VisualizationResult rows changes (see
+signals.py). The cache key includes that token, so stale fragments are never
+read and simply expire.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone, translation
+
+
+def _version_key(xray_id):
+    """Cache key holding the results version token of an X-ray"""
+    return f"xray_results_version_{xray_id}"
+
+
+def get_results_version(xray_id):
+    """Return the current results version token of an X-ray"""
+    version = cache.get(_version_key(xray_id))
+    if version is None:
+        # A time-based token cannot collide with fragments cached under an evicted token
+        version = time.time_ns()
+        if not cache.add(_version_key(xray_id), version, None):
+            version = cache.get(_version_key(xray_id), version)
+    return version
+
+
+def bump_results_version(xray_id):
+    """Invalidate all cached result fragments of an X-ray"""
+    cache.set(_version_key(xray_id), time.time_ns(), None)
+
+
+def results_fragment_key(xray_id, version):
+    """Cache key of the rendered summary for the active language and time zone"""
+    return (f"xray_results_fragment_{xray_id}_{translation.get_language()}_"
+            f"{timezone.get_current_timezone_name()}_{version}")
+
+
+def get_or_render_fragment(xray_id, render):
+    """
+    Return the cached summary fragment of an X-ray, rendering it on a miss.
+    
+    Args:
+        xray_id: Primary key of the X-ray
+        render: Callable returning the rendered fragment
+    """
+    key = results_fragment_key(xray_id, get_results_version(xray_id))
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = render()
+        cache.set(key, fragment, settings.RESULTS_FRAGMENT_CACHE_TIMEOUT)
+    return fragment
@@ -0,0 +1,45 @@
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PredictionHistory, UserProfile, XRayImage, VisualizationResult
+from .profiles import invalidate_profile
+from .progress import clear_published_progress
+from .results_cache import bump_results_version
+from .stats import schedule_refresh
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=XRayImage)
+def invalidate_xray_results(sender, instance, **kwargs):
+    """Predictions or severity may have changed, drop the cached results fragment"""
+    bump_results_version(instance.pk)
+
+
+@receiver(post_delete, sender=XRayImage)
+def drop_xray_progress(sender, instance, **kwargs):
+    """Progress streams of a deleted X-ray fall back to the database and end"""
+    clear_published_progress(instance.pk)
+
+
+@receiver(post_save, sender=VisualizationResult)
+@receiver(post_delete, sender=VisualizationResult)
+def invalidate_visualization_results(sender, instance, **kwargs):
+    """Visualizations are part of the cached results fragment"""
+    bump_results_version(instance.xray_id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """Role, hospital or preferences changed, drop the cached profile"""
+    invalidate_profile(instance.user_id)
+
+
+@receiver(post_save, sender=PredictionHistory)
+@receiver(post_delete, sender=PredictionHistory)
+def refresh_history_stats(sender, instance, **kwargs):
+    """History of that day changed, recompute its hospital statistics after commit"""
+    schedule_refresh(instance.hospital, instance.created_at)
@@ -37,44 +37,50 @@ document.addEventListener('DOMContentLoaded', () => {
     if (formWrapper) formWrapper.style.display = 'none';
     if (progressWrapper) progressWrapper.style.display = 'block';
     
-    // Check progress from the server
+    // Update the progress bar; returns true once processing is complete
+    const updateProgress = (data) => {
+      currentProgress = data.progress;
+      if (progressBar) {
+        progressBar.style.width = `${currentProgress}%`;
+        progressBar.setAttribute('aria-valuenow', currentProgress);
+        progressBar.parentElement.setAttribute('aria-valuenow', currentProgress);
+      }
+      if (progressPercentage) progressPercentage.textContent = `${currentProgress}% Complete`;
+      
+      // Update screen reader announcements
+      const statusElement = document.getElementById('analysis-status');
+      if (statusElement && currentProgress % 25 === 0) {
+        const statusMessages = {
+          25: 'Image uploaded successfully, analysis 25% complete',
+          50: 'AI model processing X-ray data, analysis 50% complete', 
+          75: 'Generating predictions, analysis 75% complete',
+          100: 'Analysis complete, redirecting to results'
+        };
+        if (statusMessages[currentProgress]) {
+          statusElement.textContent = statusMessages[currentProgress];
+        }
+      }
+      
+      if (currentProgress < 100) {
+        return false;
+      }
+      // Log the redirect URL for debugging
+      const redirectUrl = `/xray/${data.xray_id}/`;
+      console.log('Redirecting to:', redirectUrl);
+      
+      // Force redirect to xray results, not the old results URL
+      window.location.href = redirectUrl;
+      return true;
+    };
+    
+    // Poll progress from the server (fallback when Server-Sent Events are unavailable)
     const checkProgress = () => {
       fetch(`/progress/${uploadId}/`)
         .then(response => response.json())
         .then(data => {
-          // Update progress bar
-          currentProgress = data.progress;
-          if (progressBar) {
-            progressBar.style.width = `${currentProgress}%`;
-            progressBar.setAttribute('aria-valuenow', currentProgress);
-            progressBar.parentElement.setAttribute('aria-valuenow', currentProgress);
-          }
-          if (progressPercentage) progressPercentage.textContent = `${currentProgress}% Complete`;
-          
-          // Update screen reader announcements
-          const statusElement = document.getElementById('analysis-status');
-          if (statusElement && currentProgress % 25 === 0) {
-            const statusMessages = {
-              25: 'Image uploaded successfully, analysis 25% complete',
-              50: 'AI model processing X-ray data, analysis 50% complete', 
-              75: 'Generating predictions, analysis 75% complete',
-              100: 'Analysis complete, redirecting to results'
-            };
-            if (statusMessages[currentProgress]) {
-              statusElement.textContent = statusMessages[currentProgress];
-            }
-          }
-          
           // If not complete, check again
-          if (currentProgress < 100) {
+          if (!updateProgress(data)) {
             setTimeout(() => checkProgress(), 500);
-          } else {
-            // Log the redirect URL for debugging
-            const redirectUrl = `/xray/${data.xray_id}/`;
-            console.log('Redirecting to:', redirectUrl);
-            
-            // Force redirect to xray results, not the old results URL
-            window.location.href = redirectUrl;
           }
         })
         .catch(error => {
@@ -92,8 +98,36 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     };
     
-    // Start checking progress
-    checkProgress();
+    // Follow progress over one long-lived Server-Sent Events connection
+    const streamProgress = () => {
+      const source = new EventSource(`/progress/${uploadId}/stream/`);
+      const handleEvent = (event) => {
+        if (updateProgress(JSON.parse(event.data))) {
+          source.close();
+        }
+      };
+      source.addEventListener('progress', handleEvent);
+      source.addEventListener('complete', (event) => {
+        source.close();
+        // A finished stream below 100% means processing failed
+        if (!updateProgress(JSON.parse(event.data)) && progressPercentage) {
+          progressPercentage.textContent = gettext('Error processing image');
+        }
+      });
+      source.onerror = () => {
+        // The browser reconnects by itself unless the stream was refused
+        if (source.readyState === EventSource.CLOSED) {
+          checkProgress();
+        }
+      };
+    };
+    
+    // Start tracking progress
+    if (window.EventSource) {
+      streamProgress();
+    } else {
+      checkProgress();
+    }
   };
   
   // Form submission handler
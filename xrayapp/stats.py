@@ -0,0 +1,232 @@
+"""
+Per-hospital daily rollups of prediction history.
+
+HospitalDailyStats keeps one row per hospital, day and model with counts per
+severity level and per pathology scoring at least
+HOSPITAL_STATS_PATHOLOGY_THRESHOLD. Whenever history is written, only the
+affected hospital days are recomputed (one grouped query over the
+(hospital, created_at) index), so the dashboard reads at most one row per day
+and model regardless of how large the history grows. The rebuild_hospital_stats
+command rebuilds everything to correct drift, e.g. after the threshold changed.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (PATHOLOGY_FIELDS, PATHOLOGY_LABELS_VERSION, SEVERITY_MAX_LEVEL, HospitalDailyStats,
+                     PredictionHistory, pathology_score_lookup)
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_LEVELS = range(1, SEVERITY_MAX_LEVEL + 1)
+
+# Columns rewritten when a day is recomputed
+STATS_FIELDS = [f'severity_{level}' for level in SEVERITY_LEVELS] + ['total', 'pathology_counts', 'updated_at']
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+
+
+def _rollup_aggregates():
+    aggregates = {'total': Count('id')}
+    for level in SEVERITY_LEVELS:
+        aggregates[f'severity_{level}'] = Count('id', filter=Q(severity_level=level))
+    threshold = settings.HOSPITAL_STATS_PATHOLOGY_THRESHOLD
+    for field_name in PATHOLOGY_FIELDS:
+        aggregates[f'pathology_{field_name}'] = Count('id', filter=Q(
+            pathology_labels_version=PATHOLOGY_LABELS_VERSION,
+            **{f'{pathology_score_lookup(field_name)}__gte': threshold}
+        ))
+    return aggregates
+
+
+def refresh_hospital_stats(hospital, first_day, last_day=None, history_model=PredictionHistory,
+                           stats_model=HospitalDailyStats):
+    """
+    Recompute the rollups of a hospital for a range of days
+
+    Args:
+        hospital: Hospital whose history is rolled up
+        first_day: First day to recompute
+        last_day: Last day to recompute (defaults to first_day)
+        history_model: PredictionHistory (or its historical version in migrations)
+        stats_model: HospitalDailyStats (or its historical version in migrations)
+
+    Returns:
+        Number of rollup rows written
+    """
+    last_day = last_day or first_day
+    rows = (history_model.objects
+            .filter(hospital=hospital, created_at__gte=_day_start(first_day),
+                    created_at__lt=_day_start(last_day + timedelta(days=1)))
+            .annotate(day=TruncDate('created_at'))
+            .order_by()
+            .values('day', 'model_used')
+            .annotate(**_rollup_aggregates()))
+    records = []
+    for row in rows:
+        record = stats_model(hospital=hospital, day=row['day'], model_used=row['model_used'], total=row['total'])
+        for level in SEVERITY_LEVELS:
+            setattr(record, f'severity_{level}', row[f'severity_{level}'])
+        record.pathology_counts = {field_name: row[f'pathology_{field_name}'] for field_name in PATHOLOGY_FIELDS
+                                   if row[f'pathology_{field_name}']}
+        records.append(record)
+
+    with transaction.atomic():
+        # Days or models without history any more lose their rows
+        stats_model.objects.filter(hospital=hospital, day__range=(first_day, last_day)).delete()
+        # A concurrent refresh of the same day may have inserted meanwhile; the later one wins
+        stats_model.objects.bulk_create(records, update_conflicts=True,
+                                        unique_fields=['hospital', 'day', 'model_used'], update_fields=STATS_FIELDS)
+    return len(records)
+
+
+def refresh_days(days_by_hospital):
+    """
+    Recompute the rollups of the days history was written to
+
+    Consecutive days are refreshed with one query, so a batch never rescans
+    the days between the ones it wrote.
+
+    Args:
+        days_by_hospital: Dictionary of hospital to an iterable of days
+    """
+    for hospital, days in days_by_hospital.items():
+        if not hospital:
+            continue
+        for first_day, last_day in _day_spans(days):
+            try:
+                refresh_hospital_stats(hospital, first_day, last_day)
+            except Exception as e:
+                # Statistics must never fail the write; the periodic rebuild catches up
+                logger.warning(f"Could not refresh statistics of {hospital}: {e}")
+
+
+def _day_spans(days):
+    """Return (first_day, last_day) of each run of consecutive days"""
+    spans = []
+    for day in sorted(set(days)):
+        if spans and day - spans[-1][1] == timedelta(days=1):
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return [tuple(span) for span in spans]
+
+
+def schedule_refresh(hospital, created_at):
+    """Recompute the rollup of one history record's day once the current transaction commits"""
+    if not hospital or created_at is None:
+        return
+    day = timezone.localdate(created_at)
+    transaction.on_commit(lambda: refresh_days({hospital: [day]}))
+
+
+def days_by_hospital(records):
+    """Group the days of history records by hospital, for refresh_days()"""
+    days = defaultdict(set)
+    for record in records:
+        days[record.hospital].add(timezone.localdate(record.created_at))
+    return days
+
+
+def rebuild_hospital_stats(hospital=None, since=None, history_model=PredictionHistory,
+                           stats_model=HospitalDailyStats):
+    """
+    Recompute rollups from the prediction history, a month at a time
+
+    Args:
+        hospital: Only this hospital (default: every hospital with history or rollups)
+        since: First day to recompute (default: the hospital's oldest history or rollup)
+        history_model: PredictionHistory (or its historical version in migrations)
+        stats_model: HospitalDailyStats (or its historical version in migrations)
+
+    Returns:
+        Number of rollup rows written
+    """
+    if hospital is None:
+        hospitals = set(history_model.objects.order_by().values_list('hospital', flat=True).distinct())
+        hospitals.update(stats_model.objects.order_by().values_list('hospital', flat=True).distinct())
+    else:
+        hospitals = {hospital}
+
+    today = timezone.localdate()
+    written = 0
+    for name in sorted(h for h in hospitals if h):
+        first_day = since
+        if first_day is None:
+            oldest = history_model.objects.filter(hospital=name).aggregate(oldest=Min('created_at'))['oldest']
+            oldest_stats = stats_model.objects.filter(hospital=name).aggregate(oldest=Min('day'))['oldest']
+            candidates = [day for day in (oldest and timezone.localdate(oldest), oldest_stats) if day]
+            if not candidates:
+                continue
+            first_day = min(candidates)
+        while first_day <= today:
+            last_day = min(first_day + relativedelta(months=1) - timedelta(days=1), today)
+            written += refresh_hospital_stats(name, first_day, last_day, history_model, stats_model)
+            first_day = last_day + timedelta(days=1)
+    logger.info(f"Rebuilt {written} hospital statistics rows")
+    return written
+
+
+def summarize_hospital_stats(hospital, first_day, last_day):
+    """
+    Summarize a hospital's rollups over a range of days
+
+    Args:
+        hospital: Hospital to summarize
+        first_day: First day of the range
+        last_day: Last day of the range
+
+    Returns:
+        JSON-serializable dictionary with totals per model and severity level,
+        pathology prevalence, and predictions per day
+    """
+    rows = (HospitalDailyStats.objects.filter(hospital=hospital, day__range=(first_day, last_day))
+            .order_by('day', 'model_used')
+            .values('day', 'model_used', 'total', 'pathology_counts',
+                    *(f'severity_{level}' for level in SEVERITY_LEVELS)))
+
+    total = 0
+    by_model = defaultdict(int)
+    by_severity = dict.fromkeys(SEVERITY_LEVELS, 0)
+    pathology_counts = dict.fromkeys(PATHOLOGY_FIELDS, 0)
+    daily = defaultdict(int)
+    for row in rows:
+        total += row['total']
+        by_model[row['model_used']] += row['total']
+        daily[row['day']] += row['total']
+        for level in SEVERITY_LEVELS:
+            by_severity[level] += row[f'severity_{level}']
+        for field_name, count in row['pathology_counts'].items():
+            if field_name in pathology_counts:
+                pathology_counts[field_name] += count
+
+    pathologies = [
+        {
+            'field': field_name,
+            'name': PATHOLOGY_FIELDS[field_name],
+            'count': count,
+            'prevalence': round(count / total, 4) if total else 0.0,
+        }
+        for field_name, count in pathology_counts.items()
+    ]
+    pathologies.sort(key=lambda item: item['count'], reverse=True)
+    return {
+        'hospital': hospital,
+        'first_day': first_day.isoformat(),
+        'last_day': last_day.isoformat(),
+        'threshold': settings.HOSPITAL_STATS_PATHOLOGY_THRESHOLD,
+        'total': total,
+        'by_model': dict(by_model),
+        'by_severity': {str(level): count for level, count in by_severity.items()},
+        'pathologies': pathologies,
+        'daily': [{'day': day.isoformat(), 'total': count} for day, count in sorted(daily.items())],
+    }
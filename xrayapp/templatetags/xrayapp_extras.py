@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 import pytz
 from datetime import datetime
+from xrayapp.models import compute_top_pathology
 
 register = template.Library()
 
@@ -26,40 +27,16 @@ def percentage(value):
 def get_top_pathology(prediction_history):
     """Get the top pathology (highest probability) from a prediction history item
     Returns a tuple (pathology_name, probability)"""
-    pathology_fields = {
-        'Atelectasis': prediction_history.atelectasis,
-        'Cardiomegaly': prediction_history.cardiomegaly,
-        'Consolidation': prediction_history.consolidation,
-        'Edema': prediction_history.edema,
-        'Effusion': prediction_history.effusion,
-        'Emphysema': prediction_history.emphysema,
-        'Fibrosis': prediction_history.fibrosis,
-        'Hernia': prediction_history.hernia,
-        'Infiltration': prediction_history.infiltration,
-        'Mass': prediction_history.mass,
-        'Nodule': prediction_history.nodule,
-        'Pleural Thickening': prediction_history.pleural_thickening,
-        'Pneumonia': prediction_history.pneumonia,
-        'Pneumothorax': prediction_history.pneumothorax,
-        'Fracture': prediction_history.fracture,
-        'Lung Opacity': prediction_history.lung_opacity,
-    }
-    
-    # Add DenseNet-only fields if they exist
-    if prediction_history.enlarged_cardiomediastinum is not None:
-        pathology_fields['Enlarged Cardiomediastinum'] = prediction_history.enlarged_cardiomediastinum
-    if prediction_history.lung_lesion is not None:
-        pathology_fields['Lung Lesion'] = prediction_history.lung_lesion
-    
-    # Filter out None values
-    pathology_fields = {k: v for k, v in pathology_fields.items() if v is not None}
+    # Use the columns stored at write time; only rows saved before they existed are computed here
+    if prediction_history.max_probability is None:
+        top_pathology, max_probability = compute_top_pathology(prediction_history)
+    else:
+        top_pathology, max_probability = prediction_history.top_pathology, prediction_history.max_probability
     
-    # Find the max
-    if not pathology_fields:
+    if max_probability is None:
         return ('None', 0.0)
     
-    top_pathology = max(pathology_fields.items(), key=lambda x: x[1])
-    return top_pathology
+    return (top_pathology, max_probability)
 
 @register.filter
 def add_class(field, css_class):
@@ -69,6 +46,9 @@ def add_class(field, css_class):
 @register.filter
 def get_severity_level(obj):
     """Get the severity level (0-3) from a model instance (XRayImage or PredictionHistory)"""
+    # Annotated by SeverityQuerySet.with_severity(), computed in SQL
+    if getattr(obj, 'severity', None) is not None:
+        return obj.severity
     if hasattr(obj, 'severity_level') and obj.severity_level is not None:
         return obj.severity_level
     elif hasattr(obj, 'calculate_severity_level'):
@@ -1 +1,618 @@
-# Create your tests here.
+import hashlib
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+import torch
+
+from . import preprocessing
+from .exports import EXPORT_HEADERS, stream_csv
+from .forms import XRayUploadForm
+from .history import bulk_write_prediction_history, score_matrix, summarize_scores
+from .interpretability import inplace_relu_disabled
+from .middleware import AuthenticationMiddleware, PathRules, RoleBasedAccessMiddleware
+from .models import (PredictionHistory, ProcessingJob, SavedRecord, SeverityLevel, UserProfile,
+                     VisualizationResult, XRayImage, pathology_score_lookup, severity_for_scores)
+from .pagination import paginate_by_cursor
+from .partitioning import PartitioningError, _partition_end, create_partitions, partition_name
+from .profiles import get_cached_profile
+from .progress import finish_job, start_job, update_job
+from .purge import _history_dependents, purge_prediction_history
+from .ratelimit import hit, rate_limit
+from .results_cache import get_or_render_fragment, get_results_version
+from .stats import refresh_hospital_stats, summarize_hospital_stats
+from .uploads import UPLOAD_HEADER_SIZE, HashingTemporaryFileUploadHandler
+from .views import _progress_events, process_image_async
+
+HOSPITAL = 'Test hospital'
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_user(username='radiographer', hospital=HOSPITAL, role='Radiographer'):
+    user = User.objects.create_user(username=username, password='test-password')
+    UserProfile.objects.create(user=user, hospital=hospital, role=role)
+    return user
+
+
+def create_history(user, count, scores=None):
+    """Create ``count`` X-rays of ``user``, each with one prediction history record"""
+    records = []
+    for _ in range(count):
+        xray = XRayImage.objects.create(user=user, image='xrays/test.png', processing_status='completed')
+        history = PredictionHistory(user=user, xray=xray, model_used='densenet')
+        history.set_pathology_scores(scores or {'atelectasis': 0.1, 'cardiomegaly': 0.6})
+        history.severity_level = history.calculate_severity_level
+        history.save()
+        records.append(history)
+    return records
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExportStreamingTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+
+    def test_csv_streams_every_chunk(self):
+        records = create_history(self.user, 5)
+        # Two rows per round trip, so the export spans several chunks
+        with mock.patch('xrayapp.exports.EXPORT_CHUNK_SIZE', 2):
+            lines = async_to_sync(_collect)(stream_csv(PredictionHistory.objects.filter(hospital=HOSPITAL)))
+
+        self.assertEqual(lines[0].rstrip('\r\n').split(','), EXPORT_HEADERS)
+        exported_ids = [int(line.split(',')[0]) for line in lines[1:]]
+        self.assertEqual(exported_ids, sorted((record.pk for record in records), reverse=True))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LoginRateLimitTests(TestCase):
+    def test_request_over_budget_is_rejected(self):
+        budget = settings.RATE_LIMITS['login']['default']
+        window = settings.RATE_LIMITS['login']['window']
+        credentials = {'username': 'nobody', 'password': 'wrong'}
+        # Frozen clock: every attempt lands in the same bucket
+        with mock.patch('xrayapp.ratelimit.time.time', return_value=window * 1000 + 1):
+            for _ in range(budget):
+                self.assertEqual(self.client.post(reverse('login'), credentials).status_code, 200)
+            response = self.client.post(reverse('login'), credentials)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(window))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        records = create_history(create_user(), 7)
+        self.expected_ids = sorted((record.pk for record in records), reverse=True)
+        # Equal timestamps: only the id tie-breaker orders the rows
+        PredictionHistory.objects.update(created_at=timezone.now())
+
+    def _page(self, **params):
+        return paginate_by_cursor(PredictionHistory.objects.all(), self.factory.get('/', params), 3)
+
+    def test_forward_pages_neither_skip_nor_repeat_rows(self):
+        pages = [self._page()]
+        while pages[-1].has_next:
+            pages.append(self._page(after=pages[-1].next_cursor))
+
+        seen = [record.pk for page in pages for record in page]
+        self.assertEqual(seen, self.expected_ids)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+    def test_backward_pages_return_the_same_rows(self):
+        first = self._page()
+        second = self._page(after=first.next_cursor)
+        back = self._page(before=second.previous_cursor)
+
+        self.assertEqual([record.pk for record in back], [record.pk for record in first])
+        self.assertFalse(back.has_previous)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SeverityAgreementTests(TestCase):
+    # Means on both sides of every threshold, missing scores, and no scores at all
+    SCORE_SETS = [
+        {'atelectasis': 0.05, 'cardiomegaly': 0.1},
+        {'atelectasis': 0.19, 'cardiomegaly': 0.19},
+        {'atelectasis': 0.2, 'cardiomegaly': None, 'edema': 0.25},
+        {'atelectasis': 0.30, 'cardiomegaly': 0.30},
+        {'atelectasis': 0.31, 'cardiomegaly': 0.9},
+        {'atelectasis': None},
+    ]
+
+    def test_numpy_python_and_sql_severity_agree(self):
+        user = create_user()
+        records = create_history(user, len(self.SCORE_SETS))
+        for record, scores in zip(records, self.SCORE_SETS):
+            record.pathology_scores = None
+            record.set_pathology_scores(scores)
+            record.severity_level = None
+            record.save()
+
+        _top, _max, numpy_levels = summarize_scores(score_matrix(self.SCORE_SETS))
+        sql_levels = dict(PredictionHistory.objects.annotate(level=SeverityLevel('pathology_scores'))
+                          .values_list('pk', 'level'))
+        for record, numpy_level in zip(records, numpy_levels):
+            record.refresh_from_db()
+            python_level = severity_for_scores(record.pathology_scores)
+            # NumPy reports rows without scores as 0 rather than None
+            self.assertEqual(int(numpy_level) or None, python_level)
+            self.assertEqual(sql_levels[record.pk], python_level)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PackedScoresTests(TestCase):
+    def test_scores_round_trip_and_filter(self):
+        [record] = create_history(create_user(), 1, {'atelectasis': 0.1, 'pneumonia': 0.7})
+        record.refresh_from_db()
+
+        self.assertAlmostEqual(record.pneumonia, 0.7, places=5)
+        self.assertIsNone(record.edema)
+        self.assertEqual(record.top_pathology, 'Pneumonia')
+        self.assertTrue(PredictionHistory.objects.filter(**{f"{pathology_score_lookup('pneumonia')}__gte": 0.5})
+                        .exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PurgeTests(TestCase):
+    def test_purge_deletes_history_and_keeps_xrays(self):
+        user = create_user()
+        records = create_history(user, 5)
+        SavedRecord.objects.create(user=user, prediction_history=records[0])
+
+        state = purge_prediction_history(HOSPITAL, chunk_size=2)
+
+        self.assertEqual((state['status'], state['deleted']), ('completed', 5))
+        self.assertFalse(PredictionHistory.objects.exists())
+        self.assertFalse(SavedRecord.objects.exists())
+        self.assertEqual(XRayImage.objects.count(), 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class HospitalStatsTests(TestCase):
+    def test_rollup_counts_models_severity_and_pathologies(self):
+        user = create_user()
+        create_history(user, 2, {'atelectasis': 0.1, 'cardiomegaly': 0.8})
+        resnet = create_history(user, 1, {'atelectasis': 0.05})[0]
+        resnet.model_used = 'resnet'
+        resnet.save()
+
+        today = timezone.localdate()
+        refresh_hospital_stats(HOSPITAL, today)
+        summary = summarize_hospital_stats(HOSPITAL, today, today)
+
+        self.assertEqual(summary['total'], 3)
+        self.assertEqual(summary['by_model'], {'densenet': 2, 'resnet': 1})
+        self.assertEqual(summary['by_severity'], {'1': 1, '2': 0, '3': 2})
+        prevalence = {item['field']: item['count'] for item in summary['pathologies']}
+        self.assertEqual(prevalence['cardiomegaly'], 2)
+        self.assertEqual(prevalence['atelectasis'], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MiddlewarePathRulesTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.chain = AuthenticationMiddleware(RoleBasedAccessMiddleware(lambda request: HttpResponse()))
+
+    def _status(self, path, user):
+        request = self.factory.get(path)
+        request.user = user
+        return self.chain(request).status_code
+
+    def test_longest_prefix_wins(self):
+        rules = PathRules({'/a/': 'short', '/a/b/': 'long'})
+        self.assertEqual(rules.match('/a/b/c'), 'long')
+        self.assertEqual(rules.match('/a/c'), 'short')
+        self.assertIsNone(rules.match('/b/a/'))
+        self.assertIsNone(PathRules({}).match('/a/'))
+
+    def test_anonymous_requests(self):
+        anonymous = AnonymousUser()
+        self.assertEqual(self._status('/static/css/style.css', anonymous), 200)
+        self.assertEqual(self._status('/accounts/login/', anonymous), 200)
+        self.assertEqual(self._status('/prediction-history/', anonymous), 302)
+
+    def test_protected_paths_follow_the_role(self):
+        technologist = create_user('technologist', role='Technologist')
+        self.assertEqual(self._status('/prediction-history/', technologist), 200)
+        self.assertEqual(self._status('/prediction-history/delete-all/', technologist), 403)
+        self.assertEqual(self._status('/prediction-history/delete-all/', create_user()), 200)
+
+
+def png_bytes(size=(128, 128)):
+    """PNG of random pixels, so it does not compress below the upload header size"""
+    output = io.BytesIO()
+    Image.frombytes('L', size, os.urandom(size[0] * size[1])).save(output, format='PNG')
+    return output.getvalue()
+
+
+def stream_upload(name, data, chunk_size=1024):
+    """Feed ``data`` through the upload handler in chunks, like a multipart request"""
+    handler = HashingTemporaryFileUploadHandler()
+    handler.new_file('image', name, 'image/png', len(data))
+    for start in range(0, len(data), chunk_size):
+        handler.receive_data_chunk(data[start:start + chunk_size], start)
+    return handler.file_complete(len(data))
+
+
+@override_settings(FILE_UPLOAD_TEMP_DIR=None)
+class UploadValidationTests(TestCase):
+    def _image_errors(self, uploaded_file):
+        form = XRayUploadForm(data={}, files={'image': uploaded_file})
+        form.is_valid()
+        return form, form.errors.get('image')
+
+    def test_handler_hashes_the_streamed_file(self):
+        data = png_bytes()
+        uploaded_file = stream_upload('chest.png', data)
+
+        self.assertEqual(uploaded_file.content_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(uploaded_file.header, data[:UPLOAD_HEADER_SIZE])
+        self.assertEqual(uploaded_file.read(), data)
+
+    def test_valid_png_passes_and_keeps_its_hash(self):
+        data = png_bytes()
+        form, errors = self._image_errors(stream_upload('chest.png', data))
+
+        self.assertIsNone(errors)
+        self.assertEqual(form.instance.content_hash, hashlib.sha256(data).hexdigest())
+
+    def test_non_image_is_rejected(self):
+        _form, errors = self._image_errors(stream_upload('chest.png', b'not an image' * 100))
+        self.assertIsNotNone(errors)
+
+    def test_oversized_image_is_rejected(self):
+        with mock.patch('xrayapp.forms.MAX_IMAGE_DIMENSION', 100):
+            _form, errors = self._image_errors(stream_upload('chest.png', png_bytes((128, 64))))
+        self.assertIsNotNone(errors)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProfileCacheTests(TestCase):
+    def test_saving_a_profile_refreshes_the_cache(self):
+        user = create_user()
+        self.assertEqual(get_cached_profile(user).role, 'Radiographer')
+
+        profile = UserProfile.objects.get(user=user)
+        profile.role = 'Radiologist'
+        profile.hospital = 'Other hospital'
+        profile.save()
+
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            cached = get_cached_profile(user)
+        self.assertEqual((cached.role, cached.hospital), ('Radiologist', 'Other hospital'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_cached_profile(user).role, 'Radiologist')
+
+    def test_deleting_a_profile_drops_the_cache(self):
+        user = create_user()
+        get_cached_profile(user)
+
+        UserProfile.objects.filter(user=user).delete()
+
+        self.assertIsNone(get_cached_profile(User.objects.get(pk=user.pk)))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RateLimitDecoratorTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = create_user()
+        self.view = rate_limit('upload', methods=('POST',))(lambda request: HttpResponse('ok'))
+
+    def _call(self, method):
+        request = getattr(self.factory, method)('/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        request.session = SessionStore()
+        request.session[SESSION_KEY] = str(self.user.pk)
+        return self.view(request)
+
+    def test_only_listed_methods_count_against_the_role_budget(self):
+        config = settings.RATE_LIMITS['upload']
+        budget = config['roles']['Radiographer']
+        with mock.patch('xrayapp.ratelimit.time.time', return_value=config['window'] * 1000 + 1):
+            for _ in range(budget + 5):
+                self.assertEqual(self._call('get').status_code, 200)
+            for _ in range(budget):
+                self.assertEqual(self._call('post').status_code, 200)
+            response = self._call('post')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(config['window']))
+        self.assertEqual(response.json()['error'], 'rate_limited')
+
+
+class RedisRateLimitTests(TestCase):
+    def test_hit_counts_in_one_pipeline(self):
+        backend = RedisCache('redis://127.0.0.1:6379/1', {})
+        pipe = mock.Mock()
+        pipe.execute.return_value = [3, True, b'4']
+        client = mock.Mock()
+        client.pipeline.return_value = pipe
+
+        # Half of the previous bucket still overlaps the window
+        with mock.patch('xrayapp.ratelimit.caches', {'default': backend}), \
+                mock.patch.object(backend._cache, 'get_client', return_value=client) as get_client, \
+                mock.patch('xrayapp.ratelimit.time.time', return_value=60 * 1000 + 30):
+            count = hit('upload', 'user:1', 60)
+
+        self.assertEqual(count, 5)
+        current_key = backend.make_and_validate_key('ratelimit:upload:user:1:1000')
+        previous_key = backend.make_and_validate_key('ratelimit:upload:user:1:999')
+        get_client.assert_called_once_with(current_key, write=True)
+        client.pipeline.assert_called_once_with()
+        pipe.incr.assert_called_once_with(current_key)
+        pipe.expire.assert_called_once_with(current_key, 120)
+        pipe.get.assert_called_once_with(previous_key)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class HospitalDenormalizationTests(TestCase):
+    def test_hospital_is_copied_on_create_only(self):
+        user = create_user()
+        [record] = create_history(user, 1)
+        self.assertEqual((record.xray.hospital, record.hospital), (HOSPITAL, HOSPITAL))
+
+        UserProfile.objects.filter(user=user).update(hospital='')
+        unassigned = create_history(user, 1)[0].xray
+        self.assertEqual(unassigned.hospital, '')
+        # Existing rows save without looking up the profile again
+        with self.assertNumQueries(1):
+            unassigned.save()
+
+
+class PreprocessingCacheTests(TestCase):
+    def setUp(self):
+        preprocessing.clear_preprocessing_cache()
+        self.addCleanup(preprocessing.clear_preprocessing_cache)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.image_path = os.path.join(directory.name, 'chest.png')
+        with open(self.image_path, 'wb') as f:
+            f.write(png_bytes((64, 64)))
+
+    def test_rewritten_file_is_preprocessed_again(self):
+        with mock.patch.object(preprocessing, '_preprocess', wraps=preprocessing._preprocess) as preprocess:
+            first, _vis = preprocessing.preprocess_image(self.image_path, 'densenet')
+            again, _vis = preprocessing.preprocess_image(self.image_path, 'densenet')
+            self.assertEqual(preprocess.call_count, 1)
+            self.assertTrue(first.equal(again))
+
+            # Same size, newer modification time: the cached entry no longer matches
+            stat = os.stat(self.image_path)
+            os.utime(self.image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            preprocessing.preprocess_image(self.image_path, 'densenet')
+            self.assertEqual(preprocess.call_count, 2)
+
+            # Another model type is a separate entry
+            preprocessing.preprocess_image(self.image_path, 'resnet')
+            self.assertEqual(preprocess.call_count, 3)
+
+
+class InplaceReluTests(TestCase):
+    def setUp(self):
+        self.model = torch.nn.Sequential(torch.nn.Linear(2, 2), torch.nn.ReLU(inplace=True), torch.nn.ReLU())
+
+    def test_shared_model_is_restored_after_the_last_pass(self):
+        with inplace_relu_disabled(self.model):
+            with inplace_relu_disabled(self.model):
+                self.assertFalse(self.model[1].inplace)
+            # The outer pass is still running
+            self.assertFalse(self.model[1].inplace)
+        self.assertTrue(self.model[1].inplace)
+        self.assertFalse(self.model[2].inplace)
+
+    def test_model_is_restored_when_the_pass_fails(self):
+        with self.assertRaises(RuntimeError):
+            with inplace_relu_disabled(self.model):
+                raise RuntimeError
+        self.assertTrue(self.model[1].inplace)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PROGRESS_STREAM_INTERVAL=0)
+class ProgressStreamTests(TestCase):
+    def setUp(self):
+        self.xray = XRayImage.objects.create(user=create_user(), image='xrays/test.png', processing_status='processing')
+        start_job(self.xray)
+        update_job(self.xray, 40)
+
+    def _events(self, pk):
+        chunks = async_to_sync(_collect)(_progress_events(pk))
+        return [(chunk.split('\n')[0], json.loads(chunk.split('data: ', 1)[1]))
+                for chunk in chunks if chunk.startswith('event:')]
+
+    def test_finished_job_ends_the_stream(self):
+        finish_job(self.xray, 'completed')
+
+        events = self._events(self.xray.pk)
+        self.assertEqual(len(events), 1)
+        event, data = events[0]
+        self.assertEqual(event, 'event: complete')
+        self.assertEqual((data['status'], data['progress'], data['xray_id']), ('completed', 100, self.xray.pk))
+
+    def test_deleted_xray_ends_the_stream(self):
+        pk = self.xray.pk
+        self.xray.delete()
+
+        self.assertEqual(self._events(pk), [
+            ('event: complete', {'status': 'error', 'progress': 0, 'xray_id': pk, 'error': 'not_found'}),
+        ])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CheckProgressTests(TestCase):
+    def setUp(self):
+        self.owner = create_user()
+        self.xray = XRayImage.objects.create(user=self.owner, image='xrays/test.png', processing_status='processing')
+        start_job(self.xray)
+        update_job(self.xray, 40)
+        # Unpublished change: only a database read would see it
+        ProcessingJob.objects.filter(pk=self.xray.pk).update(progress=70)
+        self.url = reverse('check_progress', args=[self.xray.pk])
+
+    def test_owner_is_answered_from_the_cache(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'processing', 'progress': 40, 'xray_id': self.xray.pk})
+
+    def test_other_users_job_is_refused(self):
+        self.client.force_login(create_user('other'))
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('progress', response.json())
+
+    def test_anonymous_request_is_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ToggleSaveRecordTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        [self.record] = create_history(self.user, 1)
+        self.url = reverse('toggle_save_record', args=[self.record.pk])
+
+    def test_post_saves_then_unsaves(self):
+        self.client.force_login(self.user)
+
+        self.assertTrue(self.client.post(self.url).json()['saved'])
+        self.assertTrue(SavedRecord.objects.filter(user=self.user, prediction_history=self.record).exists())
+        self.assertFalse(self.client.post(self.url).json()['saved'])
+        self.assertFalse(SavedRecord.objects.exists())
+
+    def test_record_of_another_hospital_is_not_found(self):
+        self.client.force_login(create_user('other', hospital='Other hospital'))
+
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+        self.assertFalse(SavedRecord.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResultsCacheTests(TestCase):
+    def setUp(self):
+        self.xray = create_history(create_user(), 1)[0].xray
+
+    def test_visualization_changes_replace_the_version(self):
+        versions = [get_results_version(self.xray.pk)]
+        visualization = VisualizationResult.objects.create(xray=self.xray, visualization_type='gradcam',
+                                                           target_pathology='Pneumonia')
+        versions.append(get_results_version(self.xray.pk))
+        visualization.delete()
+        versions.append(get_results_version(self.xray.pk))
+
+        self.assertEqual(len(set(versions)), 3)
+
+    def test_fragment_is_rendered_again_after_a_change(self):
+        render = mock.Mock(side_effect=['first', 'second'])
+        self.assertEqual(get_or_render_fragment(self.xray.pk, render), 'first')
+        self.assertEqual(get_or_render_fragment(self.xray.pk, render), 'first')
+
+        self.xray.save()
+        self.assertEqual(get_or_render_fragment(self.xray.pk, render), 'second')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TopPathologyTests(TestCase):
+    def test_partial_save_of_a_score_refreshes_the_top_pathology(self):
+        [record] = create_history(create_user(), 1, {'atelectasis': 0.1, 'cardiomegaly': 0.6})
+        record.refresh_from_db()
+        self.assertEqual(record.top_pathology, 'Cardiomegaly')
+        self.assertAlmostEqual(record.max_probability, 0.6, places=5)
+
+        record.edema = 0.9
+        record.save(update_fields=['edema'])
+        record.refresh_from_db()
+
+        self.assertEqual(record.top_pathology, 'Edema')
+        self.assertAlmostEqual(record.max_probability, 0.9, places=5)
+        self.assertTrue(PredictionHistory.objects.filter(top_pathology='Edema', max_probability__gt=0.8).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WorkerConnectionTests(TestCase):
+    def test_failed_processing_still_releases_the_connection(self):
+        xray = XRayImage.objects.create(user=create_user(), image='xrays/test.png', processing_status='processing')
+        start_job(xray)
+
+        # The test's own connection must stay open, so only the close call is observed
+        with mock.patch('xrayapp.views.process_image', side_effect=RuntimeError('model failed')), \
+                mock.patch('xrayapp.views.connection') as connection:
+            process_image_async('xrays/test.png', xray, 'densenet')
+
+        connection.close.assert_called_once_with()
+        xray.refresh_from_db()
+        self.assertEqual(xray.processing_status, 'error')
+        self.assertEqual(ProcessingJob.objects.get(pk=xray.pk).status, 'error')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkHistoryWriteTests(TestCase):
+    def setUp(self):
+        user = create_user()
+        self.xrays = [XRayImage.objects.create(user=user, image='xrays/test.png') for _ in range(3)]
+        # X-rays without a user get no history
+        self.orphan = XRayImage.objects.create(image='xrays/test.png')
+
+    def test_create_then_rescore(self):
+        scores = {'atelectasis': 0.1, 'pneumonia': 0.7}
+        entries = [(xray, 'densenet', scores) for xray in self.xrays + [self.orphan]]
+        self.assertEqual(bulk_write_prediction_history(entries, chunk_size=2), 3)
+
+        records = list(PredictionHistory.objects.order_by('xray_id'))
+        self.assertEqual([record.xray_id for record in records], [xray.pk for xray in self.xrays])
+        for record in records:
+            self.assertEqual((record.hospital, record.top_pathology), (HOSPITAL, 'Pneumonia'))
+            self.assertEqual(record.severity_level, severity_for_scores(record.pathology_scores))
+
+        rescored = [(self.xrays[0], 'resnet', {'pneumonia': 0.2, 'edema': 0.9})]
+        self.assertEqual(bulk_write_prediction_history(rescored, update_existing=True), 1)
+
+        self.assertEqual(PredictionHistory.objects.count(), 3)
+        record = PredictionHistory.objects.get(xray=self.xrays[0])
+        self.assertEqual((record.model_used, record.top_pathology), ('resnet', 'Edema'))
+        self.assertAlmostEqual(record.pneumonia, 0.2, places=5)
+        # Pathologies the new scores leave out keep their stored value
+        self.assertAlmostEqual(record.atelectasis, 0.1, places=5)
+        self.assertEqual(record.severity_level, severity_for_scores(record.pathology_scores))
+
+
+class PartitioningTests(TestCase):
+    def test_partition_bounds(self):
+        name = partition_name('xrayapp_predictionhistory', date(2024, 12, 1))
+        self.assertEqual(name, 'xrayapp_predictionhistory_p202412')
+        bounds = "FOR VALUES FROM ('2024-12-01 00:00:00+00') TO ('2025-01-01 00:00:00+00')"
+        self.assertEqual(_partition_end(name, bounds), date(2025, 1, 1))
+        self.assertEqual(_partition_end('xrayapp_predictionhistory_legacy',
+                                        "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00+00')"), date(2026, 11, 1))
+        self.assertIsNone(_partition_end('xrayapp_predictionhistory_default', 'DEFAULT'))
+
+    def test_unpartitioned_table_is_refused(self):
+        with self.assertRaises(PartitioningError):
+            create_partitions(PredictionHistory, 'created_at')
+
+    def test_raw_deletes_know_every_history_dependent(self):
+        # Foreign keys to a partitioned table are dropped, so raw deletes must clear these first
+        self.assertIn((SavedRecord, 'prediction_history'), _history_dependents())
@@ -0,0 +1,47 @@
+"""
+Upload handling for X-ray images.
+
+Uploads are streamed chunk by chunk to a temporary file under MEDIA_ROOT, so
+saving the image to MEDIA_ROOT/xrays/ is a rename on the same filesystem
+rather than a copy. While streaming, the SHA-256 content hash is computed and
+the first few KB are kept for MIME sniffing, so validation never has to read
+the whole file into memory.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+# Bytes kept from the start of each upload for MIME type detection
+UPLOAD_HEADER_SIZE = 8 * 1024
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads to disk while hashing them.
+    
+    The resulting TemporaryUploadedFile carries two extra attributes:
+    ``content_hash`` (hex SHA-256 digest) and ``header`` (the first
+    UPLOAD_HEADER_SIZE bytes).
+    """
+    
+    def new_file(self, *args, **kwargs):
+        # The temporary directory lives under MEDIA_ROOT so the final save is a rename
+        if settings.FILE_UPLOAD_TEMP_DIR:
+            os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.header = b''
+    
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        if len(self.header) < UPLOAD_HEADER_SIZE:
+            self.header += raw_data[:UPLOAD_HEADER_SIZE - len(self.header)]
+        return super().receive_data_chunk(raw_data, start)
+    
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.content_hash = self.hasher.hexdigest()
+        uploaded_file.header = self.header
+        return uploaded_file
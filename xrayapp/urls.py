@@ -7,14 +7,19 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('xray/<int:pk>/', views.xray_results, name='xray_results'),
     path('progress/<int:pk>/', views.check_progress, name='check_progress'),
+    path('progress/<int:pk>/stream/', views.stream_progress, name='stream_progress'),
     path('interpretability/<int:pk>/generate/', views.generate_interpretability, name='generate_interpretability'),
     path('visualization/<int:pk>/delete/', views.delete_visualization, name='delete_visualization'),
     path('prediction-history/', views.prediction_history, name='prediction_history'),
     path('prediction-history/<int:pk>/delete/', views.delete_prediction_history, name='delete_prediction_history'),
     path('prediction-history/<int:pk>/edit/', views.edit_prediction_history, name='edit_prediction_history'),
+    path('prediction-history/export/', views.export_prediction_history, name='export_prediction_history'),
     path('prediction-history/delete-all/', views.delete_all_prediction_history, name='delete_all_prediction_history'),
+    path('prediction-history/delete-all/status/', views.delete_all_prediction_history_status, name='delete_all_prediction_history_status'),
     path('prediction-history/<int:pk>/toggle-save/', views.toggle_save_record, name='toggle_save_record'),
     path('saved-records/', views.saved_records, name='saved_records'),
+    path('dashboard/', views.hospital_dashboard, name='hospital_dashboard'),
+    path('api/hospital-stats/', views.hospital_stats_api, name='hospital_stats_api'),
     path('account/settings/', views.account_settings, name='account_settings'),
     path('accounts/logout-confirmation/', views.logout_confirmation, name='logout_confirmation'),
     path('set-language/', views.set_language, name='set_language'),
@@ -1,8 +1,6 @@
 import torch
 import torch.nn.functional as F
 import torchxrayvision as xrv
-import skimage.io
-import torchvision
 import time
 import numpy as np
 import cv2
@@ -12,7 +10,10 @@ import os
 from PIL import Image
 from PIL.ExifTags import TAGS
 from datetime import datetime
-from .interpretability import apply_gradcam, apply_pixel_interpretability, apply_combined_gradcam, apply_combined_pixel_interpretability
+from .interpretability import (apply_gradcam, apply_pixel_interpretability, apply_combined_gradcam,
+                               apply_combined_pixel_interpretability, gradcam_from_forward)
+from .preprocessing import preprocess_image, clear_preprocessing_cache
+from .progress import finish_job, update_job
 
 # CRITICAL FIX: PyTorch CPU backend configuration to prevent 75% stuck issue
 import logging
@@ -89,6 +90,7 @@ def clear_model_cache():
     global _model_cache
     logger.info(f"Clearing model cache ({len(_model_cache)} models)")
     _model_cache.clear()
+    clear_preprocessing_cache()
     
     # Force garbage collection
     import gc
@@ -184,6 +186,29 @@ def extract_image_metadata(image_path):
         }
 
 
+def predictions_to_dict(output, model, model_type='densenet'):
+    """
+    Map a model output vector to a {pathology: probability} dictionary
+    
+    Args:
+        output: 1D tensor of model outputs for a single image
+        model: The model that produced the output
+        model_type (str): 'densenet' or 'resnet'
+    """
+    output = output.detach().cpu().numpy()
+    
+    # For ResNet, ALWAYS use default_pathologies for correct mapping
+    if model_type == 'resnet':
+        # ResNet model outputs 18 values in the order of default_pathologies
+        results = dict(zip(xrv.datasets.default_pathologies, output))
+        # Note: These classes will always output 0.5 for ResNet as they're not trained
+        excluded_classes = ["Enlarged Cardiomediastinum", "Lung Lesion"]
+        return {k: v for k, v in results.items() if k not in excluded_classes}
+    
+    # For DenseNet, we can use the model's pathologies directly
+    return dict(zip(model.pathologies, output))
+
+
 def process_image(image_path, xray_instance=None, model_type='densenet'):
     """
     Process an X-ray image and return predictions
@@ -194,82 +219,37 @@ def process_image(image_path, xray_instance=None, model_type='densenet'):
         xray_instance: Database instance for progress tracking
         model_type (str): 'densenet' or 'resnet'
     """
-    # Update status to processing
+    # Progress is recorded on the job row; the X-ray itself is only updated in
+    # memory here and saved once by the caller when processing ends
     if xray_instance:
-        xray_instance.processing_status = 'processing'
-        xray_instance.progress = 5
-        xray_instance.save()
+        update_job(xray_instance, 5)
     
-    # Extract and save image metadata
+    # Extract image metadata
     if xray_instance:
         metadata = extract_image_metadata(image_path)
         xray_instance.image_format = metadata['format']
         xray_instance.image_size = metadata['size']
         xray_instance.image_resolution = metadata['resolution']
         xray_instance.image_date_created = metadata['date_created']
-        xray_instance.save()
     
-    # Load and preprocess the image
     # Update progress to 10%
     if xray_instance:
-        xray_instance.progress = 10
-        xray_instance.save()
-    
-    # Ensure image_path is a Path object, then convert to string for skimage
-    image_path = Path(image_path)
-    image_path_str = str(image_path)
-    
-    # Load image
-    img = skimage.io.imread(image_path_str)
+        update_job(xray_instance, 10)
     
-    # Normalize the image
+    # Load model and get resize dimension
     # Update progress to 20%
     if xray_instance:
-        xray_instance.progress = 20
-        xray_instance.save()
-    
-    img = xrv.datasets.normalize(img, 255)
+        update_job(xray_instance, 20)
     
-    # Check that images are 2D arrays - use first channel instead of averaging
-    if len(img.shape) > 2:
-        img = img[:, :, 0]
-    if len(img.shape) < 2:
-        raise ValueError("Input image must have at least 2 dimensions")
-    
-    # Add channel dimension
-    img = img[None, :, :]
+    model, resize_dim = load_model(model_type)
     
-    # Load model and get resize dimension
+    # Decode, normalize, crop and resize; the result is cached so that a
+    # following interpretability request on the same image can reuse it
     # Update progress to 40%
     if xray_instance:
-        xray_instance.progress = 40
-        xray_instance.save()
+        update_job(xray_instance, 40)
     
-    model, resize_dim = load_model(model_type)
-    
-    # Apply transforms for model
-    # For resnet50-res512-all, we need to resize first, then center crop
-    if model_type == 'resnet':
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayResizer(resize_dim),
-            xrv.datasets.XRayCenterCrop()
-        ])
-    else:
-        # For densenet, keep the original order
-        transform = torchvision.transforms.Compose([
-            xrv.datasets.XRayCenterCrop(),
-            xrv.datasets.XRayResizer(resize_dim)
-        ])
-    img = transform(img)
-    
-    # Convert to tensor
-    img_tensor = torch.from_numpy(img)
-    
-    # Add batch dimension
-    if len(img_tensor.shape) < 3:
-        img_tensor = img_tensor.unsqueeze(0).unsqueeze(0)
-    elif len(img_tensor.shape) == 3:
-        img_tensor = img_tensor.unsqueeze(0)
+    img_tensor, _ = preprocess_image(image_path, model_type)
     
     # Get device
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -278,54 +258,49 @@ def process_image(image_path, xray_instance=None, model_type='densenet'):
     
     # Update progress to 60%
     if xray_instance:
-        xray_instance.progress = 60
-        xray_instance.save()
+        update_job(xray_instance, 60)
     
     # Get predictions
     # Update progress to 75%
     if xray_instance:
-        xray_instance.progress = 75
-        xray_instance.save()
+        update_job(xray_instance, 75)
     
     with torch.no_grad():
         # Use the model's forward method for both model types
         preds = model(img_tensor).cpu()
     
-    # Create a dictionary of pathology predictions
-    # For ResNet, ALWAYS use default_pathologies for correct mapping
-    if model_type == 'resnet':
-        # ResNet model outputs 18 values in the order of default_pathologies
-        results = dict(zip(xrv.datasets.default_pathologies, preds[0].detach().numpy()))
-    else:
-        # For DenseNet, we can use the model's pathologies directly
-        results = dict(zip(model.pathologies, preds[0].detach().numpy()))
-    
-    # Filter out specific classes for ResNet if needed
-    # Note: These classes will always output 0.5 for ResNet as they're not trained
-    if model_type == 'resnet':
-        excluded_classes = ["Enlarged Cardiomediastinum", "Lung Lesion"]
-        results = {k: v for k, v in results.items() if k not in excluded_classes}
+    results = predictions_to_dict(preds[0], model, model_type)
     
-    # If we have an XRay instance, update its severity level
+    # Update progress to 90%; the caller stores the predictions and finishes the job
     if xray_instance:
-        # Calculate severity level
-        xray_instance.severity_level = xray_instance.calculate_severity_level
-        
-        # Update progress to 90%
-        xray_instance.progress = 90
-        xray_instance.save()
-        
-        # Add a small delay to ensure progress is displayed
-        time.sleep(0.5)
-        
-        # Update status to completed and progress to 100%
-        xray_instance.progress = 100
-        xray_instance.processing_status = 'completed'
-        xray_instance.save()
+        update_job(xray_instance, 90)
     
     return results 
 
 
+def classify_and_explain(image_path, model_type='densenet', target_class=None):
+    """
+    Classify an X-ray image and compute Grad-CAM from the same forward pass
+    
+    Args:
+        image_path: Path to the image
+        model_type (str): 'densenet' or 'resnet'
+        target_class: Pathology name to explain (defaults to the highest scoring class)
+        
+    Returns:
+        results: Dictionary of pathology predictions (same as process_image)
+        cam_results: Dictionary with Grad-CAM results (same as apply_gradcam)
+    """
+    model, _ = load_model(model_type)
+    img_tensor, original_vis = preprocess_image(image_path, model_type)
+    
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = model.to(device)
+    
+    output, cam_results = gradcam_from_forward(model, model_type, img_tensor.to(device), original_vis, target_class)
+    return predictions_to_dict(output[0], model, model_type), cam_results
+
+
 def process_image_with_interpretability(image_path, xray_instance=None, model_type='densenet', interpretation_method=None, target_class=None):
     """
     Process an X-ray image with interpretability visualization
@@ -342,9 +317,7 @@ def process_image_with_interpretability(image_path, xray_instance=None, model_ty
     """
     # Update status to processing if xray_instance is provided
     if xray_instance:
-        xray_instance.processing_status = 'processing'
-        xray_instance.progress = 5
-        xray_instance.save()
+        update_job(xray_instance, 5)
     
     # Convert Path to string
     if isinstance(image_path, Path):
@@ -355,21 +328,21 @@ def process_image_with_interpretability(image_path, xray_instance=None, model_ty
     
     # Run standard image processing to get predictions
     if xray_instance:
-        xray_instance.progress = 50
-        xray_instance.save()
+        update_job(xray_instance, 50)
         
-    results = process_image(image_path, None, model_type)  # Don't update xray_instance here
+    if interpretation_method == 'gradcam':
+        # Grad-CAM reuses the classification forward pass
+        results, cam_results = classify_and_explain(image_path, model_type, target_class)
+    else:
+        results = process_image(image_path, None, model_type)  # Don't update xray_instance here
     
     # Apply interpretability method if requested
     interpretation_results = {}
     if interpretation_method:
         if xray_instance:
-            xray_instance.progress = 75
-            xray_instance.save()
+            update_job(xray_instance, 75)
             
         if interpretation_method == 'gradcam':
-            # Apply Grad-CAM
-            cam_results = apply_gradcam(image_path, model_type, target_class)
             interpretation_results = {
                 'method': 'gradcam',
                 'original': cam_results['original'],
@@ -421,9 +394,7 @@ def process_image_with_interpretability(image_path, xray_instance=None, model_ty
     if xray_instance:
         # Add a small delay to ensure progress is displayed
         time.sleep(0.5)
-        xray_instance.progress = 100
-        xray_instance.processing_status = 'completed'
-        xray_instance.save()
+        finish_job(xray_instance, 'completed')
     
     # Include metadata in the final results
     final_results = {**results, **interpretation_results}
@@ -494,6 +465,21 @@ def save_interpretability_visualization(interpretation_results, output_path, for
         plt.title('Combined PLI Overlay')
         plt.axis('off')
     
+    elif interpretation_results.get('method') in ('integrated_gradients', 'occlusion'):
+        method_title = 'Integrated Gradients' if interpretation_results['method'] == 'integrated_gradients' else 'Occlusion Sensitivity'
+        
+        # Plot attribution map
+        plt.subplot(1, 3, 2)
+        plt.imshow(interpretation_results['saliency_map'], cmap='jet')
+        plt.title(f'{method_title}\n{interpretation_results["target_class"]}')
+        plt.axis('off')
+        
+        # Plot overlay
+        plt.subplot(1, 3, 3)
+        plt.imshow(interpretation_results['overlay'])
+        plt.title(f'{method_title} Overlay')
+        plt.axis('off')
+    
     elif interpretation_results.get('method') == 'pli':
         # Plot saliency map
         plt.subplot(1, 3, 2)
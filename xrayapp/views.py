@@ -1,24 +1,41 @@
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+import asyncio
+import json
 import threading
+import time
 import os
 from pathlib import Path
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.utils import timezone, translation
+from django.db import connection
 from django.db.models import Q, Prefetch
-from django.core.paginator import Paginator
 from django.views.decorators.cache import cache_page
 from django.core.cache import cache
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from asgiref.sync import sync_to_async
 from .forms import XRayUploadForm, PredictionHistoryFilterForm, UserInfoForm, UserProfileForm, ChangePasswordForm
-from .models import XRayImage, PredictionHistory, UserProfile, VisualizationResult, SavedRecord
+from .models import XRayImage, PredictionHistory, UserProfile, VisualizationResult, SavedRecord, pathology_score_lookup
+from .history import scores_from_results
+from .results_cache import get_or_render_fragment
+from .pagination import paginate_by_cursor
+from .exports import OPENPYXL_AVAILABLE, stream_csv, stream_xlsx
+from .purge import get_purge_state, start_prediction_history_purge
+from .stats import summarize_hospital_stats
+from .profiles import aget_cached_profile
+from .ratelimit import rate_limit
+from .progress import (aget_published_progress, arepublish_progress, astart_job, finish_job, is_finished,
+                       is_in_flight, start_job, update_job)
 from .utils import (process_image, process_image_with_interpretability,
                    save_interpretability_visualization, save_overlay_visualization, save_saliency_map,
                    save_heatmap, save_overlay)
-from .interpretability import apply_gradcam, apply_pixel_interpretability, apply_combined_gradcam, apply_combined_pixel_interpretability
+from .interpretability import (apply_gradcam, apply_pixel_interpretability, apply_combined_gradcam, apply_combined_pixel_interpretability,
+                               apply_integrated_gradients, apply_occlusion)
 from django.contrib import messages
-from django.contrib.auth import update_session_auth_hash
+from django.contrib.auth import SESSION_KEY, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.utils.translation import activate, gettext_lazy as _
@@ -38,30 +55,14 @@ def process_image_async(image_path, xray_instance, model_type):
         logger.info(f"Image processing completed successfully")
         
         # Save predictions to the database - only save what's available in the results
-        xray_instance.atelectasis = results.get('Atelectasis', None)
-        xray_instance.cardiomegaly = results.get('Cardiomegaly', None)
-        xray_instance.consolidation = results.get('Consolidation', None)
-        xray_instance.edema = results.get('Edema', None)
-        xray_instance.effusion = results.get('Effusion', None)
-        xray_instance.emphysema = results.get('Emphysema', None)
-        xray_instance.fibrosis = results.get('Fibrosis', None)
-        xray_instance.hernia = results.get('Hernia', None)
-        xray_instance.infiltration = results.get('Infiltration', None)
-        xray_instance.mass = results.get('Mass', None)
-        xray_instance.nodule = results.get('Nodule', None)
-        xray_instance.pleural_thickening = results.get('Pleural_Thickening', None)
-        xray_instance.pneumonia = results.get('Pneumonia', None)
-        xray_instance.pneumothorax = results.get('Pneumothorax', None)
-        xray_instance.fracture = results.get('Fracture', None)
-        xray_instance.lung_opacity = results.get('Lung Opacity', None)
-        
-        # These fields will only be present in DenseNet results
-        if 'Enlarged Cardiomediastinum' in results:
-            xray_instance.enlarged_cardiomediastinum = results.get('Enlarged Cardiomediastinum', None)
-        if 'Lung Lesion' in results:
-            xray_instance.lung_lesion = results.get('Lung Lesion', None)
-        
-        xray_instance.save()
+        xray_instance.set_pathology_scores(scores_from_results(results))
+        xray_instance.severity_level = xray_instance.calculate_severity_level
+        
+        # Add a small delay to ensure progress is displayed
+        time.sleep(0.5)
+        
+        # Single write of the X-ray with its predictions and final status
+        finish_job(xray_instance, 'completed')
         
         # Create prediction history record
         create_prediction_history(xray_instance, model_type)
@@ -72,19 +73,140 @@ def process_image_async(image_path, xray_instance, model_type):
         logger.error(f"Error processing image {image_path}: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
-        xray_instance.processing_status = 'error'
-        xray_instance.save()
+        finish_job(xray_instance, 'error')
+    finally:
+        # Worker threads get their own database connection; release it (back to the pool
+        # when pooling is enabled) instead of leaving it open until the process exits
+        connection.close()
+
+
+# Methods whose full result is slow enough (SmoothGrad) to warrant a quick preview first
+PROGRESSIVE_METHODS = ('pli', 'combined_pli')
+
+# Batched attribution methods producing a PLI-style saliency map
+ATTRIBUTION_METHODS = ('integrated_gradients', 'occlusion')
+
+# Visualization types displayed (and stored) like pixel-level interpretability
+PIXEL_VISUALIZATION_TYPES = ('pli', 'combined_pli') + ATTRIBUTION_METHODS
+
+# How long interim stage/preview information is kept in the cache
+INTERPRETABILITY_STAGE_TIMEOUT = 60 * 60
+
+
+def _interpretability_stage_key(xray_id):
+    """Cache key holding the current interpretability stage for an X-ray"""
+    return f"interpretability_stage:{xray_id}"
+
+
+def set_interpretability_stage(xray_id, stage, preview=None):
+    """Publish the current interpretability stage (and interim artifacts) for check_progress"""
+    cache.set(
+        _interpretability_stage_key(xray_id),
+        {'stage': stage, 'preview': preview},
+        INTERPRETABILITY_STAGE_TIMEOUT
+    )
+
+
+def get_interpretability_stage(xray_id):
+    """Return the published interpretability stage for an X-ray, if any"""
+    return cache.get(_interpretability_stage_key(xray_id))
+
+
+def _remove_preview_files(preview):
+    """Delete preview artifacts once the refined visualization has replaced them"""
+    if not preview:
+        return
+    for key in ('overlay_path', 'saliency_path'):
+        file_path = preview.get(key)
+        if file_path:
+            try:
+                full_path = Path(settings.MEDIA_ROOT) / file_path
+                if full_path.exists():
+                    full_path.unlink()
+            except Exception as e:
+                logger.warning(f"Could not delete preview file {file_path}: {e}")
+
+
+def publish_interpretability_preview(image_path, xray_instance, model_type, interpretation_method, target_class=None):
+    """Generate and publish a cheap single-sample saliency preview
+    
+    The preview uses plain guided backpropagation (no SmoothGrad), which needs a
+    single forward/backward pass, so the results page has something to show while
+    the full visualization is being computed.
+    
+    Returns:
+        The target class resolved by the preview (reused by the refined pass)
+    """
+    if interpretation_method == 'pli':
+        results = apply_pixel_interpretability(image_path, model_type, target_class, use_smoothgrad=False)
+        target = results['target_class']
+    else:
+        results = apply_combined_pixel_interpretability(image_path, model_type, use_smoothgrad=False)
+        target = results['pathology_summary']
+    
+    output_dir = Path(settings.MEDIA_ROOT) / 'interpretability' / 'preview'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    overlay_filename = f"preview_overlay_{xray_instance.id}_{interpretation_method}.png"
+    saliency_filename = f"preview_saliency_{xray_instance.id}_{interpretation_method}.png"
+    
+    # Only the raw images are written here; the 300 dpi matplotlib figure is left for the final stage
+    save_overlay_visualization(results, output_dir / overlay_filename)
+    save_saliency_map(results, output_dir / saliency_filename)
+    
+    media_url = settings.MEDIA_URL
+    preview = {
+        'method': interpretation_method,
+        'target': target,
+        'overlay_path': f"interpretability/preview/{overlay_filename}",
+        'saliency_path': f"interpretability/preview/{saliency_filename}",
+        'overlay_url': f"{media_url}interpretability/preview/{overlay_filename}",
+        'saliency_url': f"{media_url}interpretability/preview/{saliency_filename}",
+    }
+    set_interpretability_stage(xray_instance.id, 'refining', preview)
+    logger.info(f"Published {interpretation_method} preview for X-ray #{xray_instance.id}")
+    
+    return results.get('target_class', target_class)
 
 
-def process_with_interpretability_async(image_path, xray_instance, model_type, interpretation_method, target_class=None):
-    """Process the image with interpretability visualization in a background thread"""
+def _remaining_budget(max_seconds, started_at):
+    """Seconds left of a wall time budget (None when unlimited)"""
+    if max_seconds is None:
+        return None
+    return max(max_seconds - (time.monotonic() - started_at), 0)
+
+
+def process_with_interpretability_async(image_path, xray_instance, model_type, interpretation_method, target_class=None, progressive=False,
+                                        max_seconds=None, max_memory_mb=None):
+    """Process the image with interpretability visualization in a background thread
+    
+    With ``progressive`` enabled, SmoothGrad-based methods first publish a quick
+    single-sample preview (stage ``refining``) and then replace it with the full
+    result (stage ``final``).
+    
+    ``max_seconds`` and ``max_memory_mb`` bound the whole job; PLI methods adapt
+    their SmoothGrad sample count and batch size to what is left of the budget.
+    """
+    started_at = time.monotonic()
+    preview = None
     try:
-        # Set initial progress
-        xray_instance.progress = 10
-        xray_instance.save()
+        # Set initial progress (job row only; the X-ray is saved once at the end)
+        update_job(xray_instance, 10)
         
         logger.info(f"Starting {interpretation_method} visualization for image {image_path} with model {model_type}")
         
+        if progressive and interpretation_method in PROGRESSIVE_METHODS:
+            set_interpretability_stage(xray_instance.id, 'preview')
+            try:
+                target_class = publish_interpretability_preview(
+                    image_path, xray_instance, model_type, interpretation_method, target_class
+                )
+                preview = (get_interpretability_stage(xray_instance.id) or {}).get('preview')
+                update_job(xray_instance, 30)
+            except Exception as e:
+                # A failed preview must not prevent the full visualization
+                logger.warning(f"Could not generate {interpretation_method} preview: {str(e)}")
+        
         # Process the image with the selected interpretability method
         if interpretation_method == 'gradcam':
             try:
@@ -96,7 +218,10 @@ def process_with_interpretability_async(image_path, xray_instance, model_type, i
                 raise
         elif interpretation_method == 'pli':
             try:
-                results = apply_pixel_interpretability(image_path, model_type, target_class)
+                results = apply_pixel_interpretability(
+                    image_path, model_type, target_class,
+                    max_seconds=_remaining_budget(max_seconds, started_at), max_memory_mb=max_memory_mb
+                )
                 results['method'] = 'pli'
                 logger.info(f"PLI generation completed successfully for {target_class}")
             except Exception as e:
@@ -111,21 +236,40 @@ def process_with_interpretability_async(image_path, xray_instance, model_type, i
                 raise
         elif interpretation_method == 'combined_pli':
             try:
-                results = apply_combined_pixel_interpretability(image_path, model_type)
+                results = apply_combined_pixel_interpretability(
+                    image_path, model_type,
+                    max_seconds=_remaining_budget(max_seconds, started_at), max_memory_mb=max_memory_mb
+                )
                 logger.info(f"Combined PLI generation completed successfully for {len(results['selected_pathologies'])} pathologies")
             except Exception as e:
                 logger.error(f"Error in Combined PLI generation: {str(e)}")
                 raise
+        elif interpretation_method in ATTRIBUTION_METHODS:
+            try:
+                if interpretation_method == 'integrated_gradients':
+                    results = apply_integrated_gradients(
+                        image_path, model_type, target_class,
+                        steps=settings.INTEGRATED_GRADIENTS_STEPS,
+                        batch_size=settings.INTERPRETABILITY_BATCH_SIZE
+                    )
+                else:
+                    results = apply_occlusion(
+                        image_path, model_type, target_class,
+                        batch_size=settings.INTERPRETABILITY_BATCH_SIZE
+                    )
+                logger.info(f"{interpretation_method} generation completed for {results['target_class']} "
+                            f"({results['parameters']['throughput']} evaluations/s)")
+            except Exception as e:
+                logger.error(f"Error in {interpretation_method} generation: {str(e)}")
+                raise
         else:
             # Invalid method, return error
             logger.error(f"Invalid interpretation method: {interpretation_method}")
-            xray_instance.processing_status = 'error'
-            xray_instance.save()
+            finish_job(xray_instance, 'error')
             return
         
         # Update progress
-        xray_instance.progress = 70
-        xray_instance.save()
+        update_job(xray_instance, 70)
         
         logger.info(f"Saving visualization results for {interpretation_method}")
         
@@ -213,7 +357,9 @@ def process_with_interpretability_async(image_path, xray_instance, model_type, i
                     visualization_data = {
                         'saliency_filename': f"interpretability/pli/{saliency_filename}",
                         'overlay_filename': f"interpretability/pli/{overlay_filename}",
-                        'separate_saliency_filename': f"interpretability/pli/{separate_saliency_filename}"
+                        'separate_saliency_filename': f"interpretability/pli/{separate_saliency_filename}",
+                        'parameters': results.get('parameters'),
+                        'generation_time': results.get('generation_time')
                     }
                     create_visualization_result(xray_instance, 'pli', results['target_class'], visualization_data, model_type)
                     
@@ -308,7 +454,9 @@ def process_with_interpretability_async(image_path, xray_instance, model_type, i
                     'saliency_filename': f"interpretability/combined_pli/{combined_filename}",
                     'separate_saliency_filename': f"interpretability/combined_pli/{saliency_filename}",
                     'overlay_filename': f"interpretability/combined_pli/{overlay_filename}",
-                    'threshold': results.get('threshold')
+                    'threshold': results.get('threshold'),
+                    'parameters': results.get('parameters'),
+                    'generation_time': results.get('generation_time')
                 }
                 create_visualization_result(xray_instance, 'combined_pli', results['pathology_summary'], visualization_data, model_type)
                 
@@ -319,17 +467,45 @@ def process_with_interpretability_async(image_path, xray_instance, model_type, i
                 xray_instance.pli_overlay_visualization = f"interpretability/combined_pli/{overlay_filename}"
                 xray_instance.pli_target_class = results['pathology_summary']  # Store summary of selected pathologies
         
-        xray_instance.progress = 90
-        xray_instance.processing_status = 'complete'
-        xray_instance.save()
+            elif results['method'] in ATTRIBUTION_METHODS:
+                method = results['method']
+                output_dir = Path(settings.MEDIA_ROOT) / 'interpretability' / method
+                output_dir.mkdir(parents=True, exist_ok=True)
+                
+                # Generate filenames
+                combined_filename = f"{method}_{xray_instance.id}_{results['target_class']}.png"
+                overlay_filename = f"{method}_overlay_{xray_instance.id}_{results['target_class']}.png"
+                saliency_filename = f"{method}_map_{xray_instance.id}_{results['target_class']}.png"
+                
+                logger.info(f"Saving {method} visualization to {output_dir / combined_filename}")
+                save_interpretability_visualization(results, output_dir / combined_filename)
+                save_overlay_visualization(results, output_dir / overlay_filename)
+                save_saliency_map(results, output_dir / saliency_filename)
+                
+                # Create VisualizationResult record (attribution maps share the PLI layout)
+                visualization_data = {
+                    'saliency_filename': f"interpretability/{method}/{combined_filename}",
+                    'overlay_filename': f"interpretability/{method}/{overlay_filename}",
+                    'separate_saliency_filename': f"interpretability/{method}/{saliency_filename}",
+                    'parameters': results.get('parameters'),
+                    'generation_time': results.get('generation_time')
+                }
+                create_visualization_result(xray_instance, method, results['target_class'], visualization_data, model_type)
+        
+        update_job(xray_instance, 90)
         
         # Update existing prediction history record instead of creating a new one
         # This ensures visualizations are saved to the same record in "History Records"
         update_existing_prediction_history(xray_instance, model_type)
         
-        # Set progress to 100%
-        xray_instance.progress = 100
-        xray_instance.save()
+        # The refined result replaces the preview before anyone can read progress 100%
+        set_interpretability_stage(xray_instance.id, 'final')
+        
+        # Single write of the X-ray with its visualization fields, then progress 100%
+        finish_job(xray_instance, 'complete')
+        
+        # No published state references the preview any more
+        _remove_preview_files(preview)
         
         logger.info(f"Interpretability visualization complete for {interpretation_method}")
         
@@ -337,8 +513,13 @@ def process_with_interpretability_async(image_path, xray_instance, model_type, i
         import traceback
         logger.error(f"Error in interpretability processing: {str(e)}")
         logger.error(traceback.format_exc())
-        xray_instance.processing_status = 'error'
-        xray_instance.save()
+        finish_job(xray_instance, 'error')
+        if preview:
+            # Keep the preview available but mark that refinement failed
+            set_interpretability_stage(xray_instance.id, 'error', preview)
+    finally:
+        # Release this thread's database connection (see process_image_async)
+        connection.close()
 
 
 def create_prediction_history(xray_instance, model_type):
@@ -346,29 +527,13 @@ def create_prediction_history(xray_instance, model_type):
     history = PredictionHistory(
         user=xray_instance.user,
         xray=xray_instance,
+        hospital=xray_instance.hospital,
         model_used=model_type,
-        # Copy all pathology values for historical record
-        atelectasis=xray_instance.atelectasis,
-        cardiomegaly=xray_instance.cardiomegaly,
-        consolidation=xray_instance.consolidation,
-        edema=xray_instance.edema,
-        effusion=xray_instance.effusion,
-        emphysema=xray_instance.emphysema,
-        fibrosis=xray_instance.fibrosis,
-        hernia=xray_instance.hernia,
-        infiltration=xray_instance.infiltration,
-        mass=xray_instance.mass,
-        nodule=xray_instance.nodule,
-        pleural_thickening=xray_instance.pleural_thickening,
-        pneumonia=xray_instance.pneumonia,
-        pneumothorax=xray_instance.pneumothorax,
-        fracture=xray_instance.fracture,
-        lung_opacity=xray_instance.lung_opacity,
-        enlarged_cardiomediastinum=xray_instance.enlarged_cardiomediastinum,
-        lung_lesion=xray_instance.lung_lesion,
         # Copy severity level
         severity_level=xray_instance.severity_level,
     )
+    # Copy all pathology values for historical record
+    history.copy_pathology_scores(xray_instance)
     # Only save if we have a user assigned
     if xray_instance.user:
         history.save()
@@ -387,6 +552,7 @@ def create_visualization_result(xray_instance, visualization_type, target_pathol
             target_pathology=target_pathology,
             defaults={
                 'model_used': model_type,
+                'hospital': xray_instance.hospital,
             }
         )
         
@@ -400,8 +566,8 @@ def create_visualization_result(xray_instance, visualization_type, target_pathol
             if 'overlay_filename' in results:
                 visualization.overlay_path = results['overlay_filename']
                 
-        elif visualization_type in ['pli', 'combined_pli']:
-            # For PLI visualizations
+        elif visualization_type in PIXEL_VISUALIZATION_TYPES:
+            # For PLI and other pixel attribution visualizations
             if 'saliency_filename' in results:
                 visualization.visualization_path = results['saliency_filename']
             if 'separate_saliency_filename' in results:
@@ -411,6 +577,12 @@ def create_visualization_result(xray_instance, visualization_type, target_pathol
             if 'threshold' in results:
                 visualization.threshold = results['threshold']
         
+        # Record the effective generation parameters (sample count, batch size, budget)
+        if results.get('parameters') is not None:
+            visualization.parameters = results['parameters']
+        if results.get('generation_time') is not None:
+            visualization.generation_time = results['generation_time']
+        
         # Update model used if it's different
         if visualization.model_used != model_type:
             visualization.model_used = f"{visualization.model_used}+{model_type}"
@@ -435,24 +607,7 @@ def update_existing_prediction_history(xray_instance, model_type):
         
         if existing_history:
             # Update the existing record with current data
-            existing_history.atelectasis = xray_instance.atelectasis
-            existing_history.cardiomegaly = xray_instance.cardiomegaly
-            existing_history.consolidation = xray_instance.consolidation
-            existing_history.edema = xray_instance.edema
-            existing_history.effusion = xray_instance.effusion
-            existing_history.emphysema = xray_instance.emphysema
-            existing_history.fibrosis = xray_instance.fibrosis
-            existing_history.hernia = xray_instance.hernia
-            existing_history.infiltration = xray_instance.infiltration
-            existing_history.mass = xray_instance.mass
-            existing_history.nodule = xray_instance.nodule
-            existing_history.pleural_thickening = xray_instance.pleural_thickening
-            existing_history.pneumonia = xray_instance.pneumonia
-            existing_history.pneumothorax = xray_instance.pneumothorax
-            existing_history.fracture = xray_instance.fracture
-            existing_history.lung_opacity = xray_instance.lung_opacity
-            existing_history.enlarged_cardiomediastinum = xray_instance.enlarged_cardiomediastinum
-            existing_history.lung_lesion = xray_instance.lung_lesion
+            existing_history.copy_pathology_scores(xray_instance)
             existing_history.severity_level = xray_instance.severity_level
             
             # Update model used if different (in case visualization uses different model)
@@ -471,16 +626,26 @@ def update_existing_prediction_history(xray_instance, model_type):
         create_prediction_history(xray_instance, model_type)
 
 
+def _bind_upload_form(request, user):
+    """Parse the multipart upload and validate it (file IO and image decoding)"""
+    form = XRayUploadForm(request.POST, request.FILES, user=user)
+    form.is_valid()
+    return form
+
+
 @login_required
-def home(request):
+@rate_limit('upload', methods=('POST',))
+async def home(request):
     """Home page with image upload form"""
+    user = await request.auser()
     if request.method == 'POST':
-        form = XRayUploadForm(request.POST, request.FILES, user=request.user)
+        # Upload parsing and image validation block, so they run off the event loop
+        form = await sync_to_async(_bind_upload_form)(request, user)
         if form.is_valid():
             # Create a new XRayImage instance with all form data but don't save yet
             xray_instance = form.save(commit=False)
             # Assign the current user
-            xray_instance.user = request.user
+            xray_instance.user = user
             # Set the requires_expert_review field (default to False)
             xray_instance.requires_expert_review = False
             
@@ -511,11 +676,9 @@ def home(request):
             xray_instance.model_used = model_type
             # Now save the instance
             try:
-                xray_instance.save()
+                await xray_instance.asave()
             except Exception as e:
                 # Log the error for debugging
-                import logging
-                logger = logging.getLogger(__name__)
                 logger.error(f"Error saving XRayImage: {e}")
                 
                 # Return error response for AJAX requests
@@ -528,6 +691,7 @@ def home(request):
                     # For non-AJAX requests, re-raise the exception
                     raise
 
+            await astart_job(xray_instance, status='pending')
             
             # Save image to disk
             image_path = Path(settings.MEDIA_ROOT) / xray_instance.image.name
@@ -557,25 +721,60 @@ def home(request):
                     'errors': form.errors
                 }, status=400)
     else:
-        form = XRayUploadForm(user=request.user)
-        
-    return render(request, 'xrayapp/home.html', {
+        form = XRayUploadForm(user=user)
+    
+    # Context processors and templates access request.user synchronously
+    return await sync_to_async(render)(request, 'xrayapp/home.html', {
         'form': form,
         'today_date': timezone.now(),
-        'user_first_name': request.user.first_name if request.user.is_authenticated else '',
-        'user_last_name': request.user.last_name if request.user.is_authenticated else '',
+        'user_first_name': user.first_name if user.is_authenticated else '',
+        'user_last_name': user.last_name if user.is_authenticated else '',
     })
 
 
-@login_required
-def xray_results(request, pk):
-    """View the results of the X-ray analysis"""
-    # Get user's hospital from profile
-    user_hospital = request.user.profile.hospital
+# Pathology explanations for educational purposes. Built once at import time;
+# gettext_lazy defers translation to render time in the active language.
+PATHOLOGY_EXPLANATIONS = {
+    'Atelectasis': _('Atelectasis refers to the collapse or incomplete expansion of lung tissue, resulting in reduced gas exchange. It can be caused by airway obstruction (resorption atelectasis), external compression of the lung (compressive atelectasis), or insufficient surfactant production. Common causes include mucus plugging, foreign bodies, tumors, pneumothorax, pleural effusion, and post-surgical complications. On chest X-rays, atelectasis appears as areas of increased opacity with volume loss, often accompanied by compensatory changes such as mediastinal shift, elevated hemidiaphragm, or rib crowding.'),
     
-    # Allow access to any X-ray from the same hospital
-    xray_instance = XRayImage.objects.get(pk=pk, user__profile__hospital=user_hospital)
+    'Cardiomegaly': _('Cardiomegaly refers to enlargement of the heart, typically identified on chest X-rays when the cardiothoracic ratio exceeds 0.50 on a posteroanterior (PA) view. It can result from various conditions including hypertension, heart failure, cardiomyopathy, valvular disease, or congenital heart defects. The enlarged cardiac silhouette may appear globular or have specific chamber enlargement patterns depending on the underlying cause. Cardiomegaly often indicates underlying cardiovascular disease and may require further evaluation with echocardiography or other cardiac imaging.'),
+    
+    'Consolidation': _('Consolidation represents the filling of alveolar spaces with fluid, pus, blood, or other material, replacing normal air-filled lung tissue. It appears as homogeneous opacity on chest X-rays, often with air bronchograms visible within the consolidated area. Common causes include pneumonia (bacterial, viral, or fungal), pulmonary edema, hemorrhage, or aspiration. The opacity typically has well-defined borders and may be lobar, segmental, or patchy in distribution. Clinical correlation is essential for determining the underlying cause and appropriate treatment.'),
+    
+    'Edema': _('Pulmonary edema is the accumulation of excess fluid in the lung tissue and alveolar spaces, resulting in impaired gas exchange. It can be cardiogenic (due to heart failure, valve disease, or fluid overload) or non-cardiogenic (due to acute lung injury, infection, or capillary leak). On chest X-rays, pulmonary edema appears as bilateral, symmetrical opacities that may have a "bat wing" or perihilar distribution. Additional findings may include cardiomegaly, pleural effusions, and prominent pulmonary vasculature. Early recognition is crucial as it can be life-threatening.'),
+    
+    'Effusion': _('Pleural effusion is the abnormal accumulation of fluid in the pleural space between the lung and chest wall. It can be transudative (due to heart failure, liver disease, or kidney disease) or exudative (due to infection, malignancy, or inflammatory conditions). On chest X-rays, pleural effusion appears as a homogeneous opacity that obscures the diaphragm and costophrenic angle, with a meniscus sign at the fluid-air interface. Large effusions can cause mediastinal shift away from the affected side and require drainage for both diagnostic and therapeutic purposes.'),
+    
+    'Emphysema': _('Emphysema is a chronic obstructive pulmonary disease characterized by permanent enlargement and destruction of alveolar spaces distal to terminal bronchioles. It is most commonly caused by smoking but can also result from alpha-1 antitrypsin deficiency or occupational exposures. On chest X-rays, emphysema appears as hyperinflation with flattened hemidiaphragms, increased anteroposterior diameter, and decreased lung markings. Advanced cases may show bullae formation and signs of pulmonary hypertension. High-resolution CT is more sensitive for detecting early emphysematous changes.'),
+    
+    'Fibrosis': _('Pulmonary fibrosis involves the thickening and scarring of lung tissue, leading to progressive loss of lung function. It can be idiopathic or secondary to various causes including occupational exposures (asbestosis, silicosis), medications, radiation therapy, or connective tissue diseases. On chest X-rays, fibrosis appears as reticular or reticulonodular opacities, often with a lower lobe predominance. Advanced cases may show honeycombing, traction bronchiectasis, and loss of lung volume. Early detection and treatment are important to slow disease progression.'),
+    
+    'Hernia': _('Hiatal hernia occurs when part of the stomach protrudes through the diaphragmatic opening into the thoracic cavity. It can be sliding (most common) or paraesophageal (less common but more serious). On chest X-rays, hiatal hernia may appear as a retrocardiac mass or air-fluid level behind the heart. Large hernias can compress adjacent structures and may be associated with complications such as gastric volvulus, obstruction, or strangulation. Barium studies or CT imaging may be needed for detailed evaluation.'),
+    
+    'Infiltration': _('Pulmonary infiltration refers to the abnormal accumulation of substances in lung tissue, including inflammatory cells, fluid, or other materials. It appears as areas of increased opacity on chest X-rays and can be caused by various conditions such as pneumonia, pulmonary edema, hemorrhage, or interstitial lung disease. The pattern and distribution of infiltrates can help narrow the differential diagnosis. Infiltrates may be patchy, diffuse, or have specific patterns like ground-glass opacity or crazy-paving pattern on high-resolution imaging.'),
+    
+    'Mass': _('A pulmonary mass is a focal opacity greater than 3 cm in diameter that appears on chest imaging. Masses can be benign (such as hamartomas or granulomas) or malignant (primary lung cancer or metastases). On chest X-rays, masses appear as well-defined or spiculated opacities that may be accompanied by additional findings such as pleural effusion, lymphadenopathy, or bone lesions. Further evaluation with CT imaging, PET scanning, and tissue sampling is typically required to determine the nature and extent of the mass.'),
+    
+    'Nodule': _('A pulmonary nodule is a focal opacity less than or equal to 3 cm in diameter surrounded by normal lung tissue. Nodules can be solitary or multiple and may be benign (granulomas, hamartomas) or malignant (primary or metastatic cancer). On chest X-rays, nodules appear as rounded opacities that may be calcified or non-calcified. The size, morphology, and growth rate of nodules help determine the need for further evaluation. CT imaging is often required for detailed characterization and follow-up.'),
+    
+    'Pleural Thickening': _('Pleural thickening involves the abnormal thickening of the pleural membranes surrounding the lungs, which can be focal or diffuse. It may result from previous infection (empyema, tuberculosis), asbestos exposure, trauma, or malignancy. On chest X-rays, pleural thickening appears as increased opacity along the pleural surfaces, often with blunting of the costophrenic angles. Extensive pleural thickening can restrict lung expansion and cause respiratory symptoms. High-resolution CT is more sensitive for detecting subtle pleural abnormalities and assessing disease extent.'),
+    
+    'Pneumonia': _('Pneumonia is an inflammatory condition of the lung tissue, usually caused by bacterial, viral, or fungal infections. It can also result from aspiration or chemical irritants. On chest X-rays, pneumonia appears as areas of consolidation or infiltration that may be lobar, segmental, or patchy in distribution. Air bronchograms are often visible within the consolidated areas. Clinical symptoms include fever, cough, shortness of breath, and chest pain. Prompt diagnosis and appropriate antibiotic therapy are essential for optimal outcomes.'),
+    
+    'Pneumothorax': _('Pneumothorax is the presence of air in the pleural space, causing partial or complete lung collapse. It can be spontaneous (primary in healthy individuals or secondary in those with lung disease) or traumatic (due to injury or medical procedures). On chest X-rays, pneumothorax appears as a lucent area without lung markings, with a visible pleural line separating the collapsed lung from the chest wall. Large pneumothoraces may cause mediastinal shift and require immediate decompression. Small pneumothoraces may resolve spontaneously with observation.'),
     
+    'Fracture': _('Rib fractures are breaks in one or more of the bones that form the ribcage, commonly resulting from trauma, falls, or repetitive stress. On chest X-rays, fractures may appear as lucent lines, discontinuity of the cortex, or displacement of bone fragments. Multiple rib fractures can be associated with serious complications including pneumothorax, hemothorax, or injury to underlying organs. Pathological fractures may occur in patients with bone metastases or metabolic bone disease. Pain management and monitoring for complications are important aspects of treatment.'),
+    
+    'Lung Opacity': _('Lung opacity refers to any area of increased density on chest imaging that obscures normal lung anatomy. It is a general term that encompasses various pathological processes including consolidation, ground-glass opacity, or mass lesions. The pattern, distribution, and associated findings help narrow the differential diagnosis. Common causes include pneumonia, pulmonary edema, interstitial lung disease, or malignancy. Further evaluation with high-resolution CT imaging and clinical correlation is often needed to determine the specific underlying pathology.'),
+    
+    'Enlarged Cardiomediastinum': _('Enlarged cardiomediastinum refers to an increase in the combined width of the cardiac silhouette and mediastinal contours. On a standard posteroanterior (PA) view, it is commonly identified when the cardiothoracic ratio (maximum horizontal cardiac diameter divided by maximal thoracic diameter) exceeds 0.50. On an anteroposterior (AP) projection—often performed in supine or portable studies—a mediastinal width greater than approximately 6–8 cm at the level of the aortic knob likewise suggests enlargement. Common causes include: Cardiomegaly (e.g., dilated cardiomyopathy, left ventricular hypertrophy), Pericardial effusion, which produces a globular ("water‐bottle") silhouette, Aortic pathology (aneurysm or dissection) leading to mediastinal widening, Mediastinal masses or lymphadenopathy. Recognition of an enlarged cardiomediastinum is pivotal, as it often prompts further evaluation—such as echocardiography for cardiac enlargement or contrast-enhanced CT to assess aortic and mediastinal pathology.'),
+    
+    'Lung Lesion': _('A lung lesion is any abnormal area or growth in lung tissue that differs from normal lung anatomy. Lesions can be benign or malignant and may include nodules, masses, cysts, or areas of inflammation. On chest X-rays, lesions appear as focal opacities that may vary in size, shape, and density. The characteristics of the lesion, including its borders, calcification pattern, and growth rate, help determine the likelihood of malignancy. Further evaluation with CT imaging, PET scanning, and possibly tissue sampling is often required to establish a definitive diagnosis and guide appropriate treatment.')
+}
+
+
+def _results_summary_context(xray_instance):
+    """Context for the prediction summary fragment of the results page"""
     # Build predictions dictionary based on model fields
     predictions = {
         'Atelectasis': xray_instance.atelectasis,
@@ -608,44 +807,6 @@ def xray_results(request, pk):
     # Sort predictions by value (highest to lowest)
     predictions = dict(sorted(predictions.items(), key=lambda item: item[1], reverse=True))
     
-    # Pathology explanations for educational purposes
-    pathology_explanations = {
-        'Atelectasis': _('Atelectasis refers to the collapse or incomplete expansion of lung tissue, resulting in reduced gas exchange. It can be caused by airway obstruction (resorption atelectasis), external compression of the lung (compressive atelectasis), or insufficient surfactant production. Common causes include mucus plugging, foreign bodies, tumors, pneumothorax, pleural effusion, and post-surgical complications. On chest X-rays, atelectasis appears as areas of increased opacity with volume loss, often accompanied by compensatory changes such as mediastinal shift, elevated hemidiaphragm, or rib crowding.'),
-        
-        'Cardiomegaly': _('Cardiomegaly refers to enlargement of the heart, typically identified on chest X-rays when the cardiothoracic ratio exceeds 0.50 on a posteroanterior (PA) view. It can result from various conditions including hypertension, heart failure, cardiomyopathy, valvular disease, or congenital heart defects. The enlarged cardiac silhouette may appear globular or have specific chamber enlargement patterns depending on the underlying cause. Cardiomegaly often indicates underlying cardiovascular disease and may require further evaluation with echocardiography or other cardiac imaging.'),
-        
-        'Consolidation': _('Consolidation represents the filling of alveolar spaces with fluid, pus, blood, or other material, replacing normal air-filled lung tissue. It appears as homogeneous opacity on chest X-rays, often with air bronchograms visible within the consolidated area. Common causes include pneumonia (bacterial, viral, or fungal), pulmonary edema, hemorrhage, or aspiration. The opacity typically has well-defined borders and may be lobar, segmental, or patchy in distribution. Clinical correlation is essential for determining the underlying cause and appropriate treatment.'),
-        
-        'Edema': _('Pulmonary edema is the accumulation of excess fluid in the lung tissue and alveolar spaces, resulting in impaired gas exchange. It can be cardiogenic (due to heart failure, valve disease, or fluid overload) or non-cardiogenic (due to acute lung injury, infection, or capillary leak). On chest X-rays, pulmonary edema appears as bilateral, symmetrical opacities that may have a "bat wing" or perihilar distribution. Additional findings may include cardiomegaly, pleural effusions, and prominent pulmonary vasculature. Early recognition is crucial as it can be life-threatening.'),
-        
-        'Effusion': _('Pleural effusion is the abnormal accumulation of fluid in the pleural space between the lung and chest wall. It can be transudative (due to heart failure, liver disease, or kidney disease) or exudative (due to infection, malignancy, or inflammatory conditions). On chest X-rays, pleural effusion appears as a homogeneous opacity that obscures the diaphragm and costophrenic angle, with a meniscus sign at the fluid-air interface. Large effusions can cause mediastinal shift away from the affected side and require drainage for both diagnostic and therapeutic purposes.'),
-        
-        'Emphysema': _('Emphysema is a chronic obstructive pulmonary disease characterized by permanent enlargement and destruction of alveolar spaces distal to terminal bronchioles. It is most commonly caused by smoking but can also result from alpha-1 antitrypsin deficiency or occupational exposures. On chest X-rays, emphysema appears as hyperinflation with flattened hemidiaphragms, increased anteroposterior diameter, and decreased lung markings. Advanced cases may show bullae formation and signs of pulmonary hypertension. High-resolution CT is more sensitive for detecting early emphysematous changes.'),
-        
-        'Fibrosis': _('Pulmonary fibrosis involves the thickening and scarring of lung tissue, leading to progressive loss of lung function. It can be idiopathic or secondary to various causes including occupational exposures (asbestosis, silicosis), medications, radiation therapy, or connective tissue diseases. On chest X-rays, fibrosis appears as reticular or reticulonodular opacities, often with a lower lobe predominance. Advanced cases may show honeycombing, traction bronchiectasis, and loss of lung volume. Early detection and treatment are important to slow disease progression.'),
-        
-        'Hernia': _('Hiatal hernia occurs when part of the stomach protrudes through the diaphragmatic opening into the thoracic cavity. It can be sliding (most common) or paraesophageal (less common but more serious). On chest X-rays, hiatal hernia may appear as a retrocardiac mass or air-fluid level behind the heart. Large hernias can compress adjacent structures and may be associated with complications such as gastric volvulus, obstruction, or strangulation. Barium studies or CT imaging may be needed for detailed evaluation.'),
-        
-        'Infiltration': _('Pulmonary infiltration refers to the abnormal accumulation of substances in lung tissue, including inflammatory cells, fluid, or other materials. It appears as areas of increased opacity on chest X-rays and can be caused by various conditions such as pneumonia, pulmonary edema, hemorrhage, or interstitial lung disease. The pattern and distribution of infiltrates can help narrow the differential diagnosis. Infiltrates may be patchy, diffuse, or have specific patterns like ground-glass opacity or crazy-paving pattern on high-resolution imaging.'),
-        
-        'Mass': _('A pulmonary mass is a focal opacity greater than 3 cm in diameter that appears on chest imaging. Masses can be benign (such as hamartomas or granulomas) or malignant (primary lung cancer or metastases). On chest X-rays, masses appear as well-defined or spiculated opacities that may be accompanied by additional findings such as pleural effusion, lymphadenopathy, or bone lesions. Further evaluation with CT imaging, PET scanning, and tissue sampling is typically required to determine the nature and extent of the mass.'),
-        
-        'Nodule': _('A pulmonary nodule is a focal opacity less than or equal to 3 cm in diameter surrounded by normal lung tissue. Nodules can be solitary or multiple and may be benign (granulomas, hamartomas) or malignant (primary or metastatic cancer). On chest X-rays, nodules appear as rounded opacities that may be calcified or non-calcified. The size, morphology, and growth rate of nodules help determine the need for further evaluation. CT imaging is often required for detailed characterization and follow-up.'),
-        
-        'Pleural Thickening': _('Pleural thickening involves the abnormal thickening of the pleural membranes surrounding the lungs, which can be focal or diffuse. It may result from previous infection (empyema, tuberculosis), asbestos exposure, trauma, or malignancy. On chest X-rays, pleural thickening appears as increased opacity along the pleural surfaces, often with blunting of the costophrenic angles. Extensive pleural thickening can restrict lung expansion and cause respiratory symptoms. High-resolution CT is more sensitive for detecting subtle pleural abnormalities and assessing disease extent.'),
-        
-        'Pneumonia': _('Pneumonia is an inflammatory condition of the lung tissue, usually caused by bacterial, viral, or fungal infections. It can also result from aspiration or chemical irritants. On chest X-rays, pneumonia appears as areas of consolidation or infiltration that may be lobar, segmental, or patchy in distribution. Air bronchograms are often visible within the consolidated areas. Clinical symptoms include fever, cough, shortness of breath, and chest pain. Prompt diagnosis and appropriate antibiotic therapy are essential for optimal outcomes.'),
-        
-        'Pneumothorax': _('Pneumothorax is the presence of air in the pleural space, causing partial or complete lung collapse. It can be spontaneous (primary in healthy individuals or secondary in those with lung disease) or traumatic (due to injury or medical procedures). On chest X-rays, pneumothorax appears as a lucent area without lung markings, with a visible pleural line separating the collapsed lung from the chest wall. Large pneumothoraces may cause mediastinal shift and require immediate decompression. Small pneumothoraces may resolve spontaneously with observation.'),
-        
-        'Fracture': _('Rib fractures are breaks in one or more of the bones that form the ribcage, commonly resulting from trauma, falls, or repetitive stress. On chest X-rays, fractures may appear as lucent lines, discontinuity of the cortex, or displacement of bone fragments. Multiple rib fractures can be associated with serious complications including pneumothorax, hemothorax, or injury to underlying organs. Pathological fractures may occur in patients with bone metastases or metabolic bone disease. Pain management and monitoring for complications are important aspects of treatment.'),
-        
-        'Lung Opacity': _('Lung opacity refers to any area of increased density on chest imaging that obscures normal lung anatomy. It is a general term that encompasses various pathological processes including consolidation, ground-glass opacity, or mass lesions. The pattern, distribution, and associated findings help narrow the differential diagnosis. Common causes include pneumonia, pulmonary edema, interstitial lung disease, or malignancy. Further evaluation with high-resolution CT imaging and clinical correlation is often needed to determine the specific underlying pathology.'),
-        
-        'Enlarged Cardiomediastinum': _('Enlarged cardiomediastinum refers to an increase in the combined width of the cardiac silhouette and mediastinal contours. On a standard posteroanterior (PA) view, it is commonly identified when the cardiothoracic ratio (maximum horizontal cardiac diameter divided by maximal thoracic diameter) exceeds 0.50. On an anteroposterior (AP) projection—often performed in supine or portable studies—a mediastinal width greater than approximately 6–8 cm at the level of the aortic knob likewise suggests enlargement. Common causes include: Cardiomegaly (e.g., dilated cardiomyopathy, left ventricular hypertrophy), Pericardial effusion, which produces a globular ("water‐bottle") silhouette, Aortic pathology (aneurysm or dissection) leading to mediastinal widening, Mediastinal masses or lymphadenopathy. Recognition of an enlarged cardiomediastinum is pivotal, as it often prompts further evaluation—such as echocardiography for cardiac enlargement or contrast-enhanced CT to assess aortic and mediastinal pathology.'),
-        
-        'Lung Lesion': _('A lung lesion is any abnormal area or growth in lung tissue that differs from normal lung anatomy. Lesions can be benign or malignant and may include nodules, masses, cysts, or areas of inflammation. On chest X-rays, lesions appear as focal opacities that may vary in size, shape, and density. The characteristics of the lesion, including its borders, calcification pattern, and growth rate, help determine the likelihood of malignancy. Further evaluation with CT imaging, PET scanning, and possibly tissue sampling is often required to establish a definitive diagnosis and guide appropriate treatment.')
-    }
     
     # Calculate patient age if date_of_birth is provided
     patient_age = None
@@ -680,11 +841,6 @@ def xray_results(request, pk):
     # Get image URL
     image_url = xray_instance.image.url
     
-    # Ensure severity level is calculated and stored
-    if xray_instance.severity_level is None:
-        xray_instance.severity_level = xray_instance.calculate_severity_level
-        xray_instance.save()
-    
     # Get all visualizations for this X-ray
     visualizations = VisualizationResult.objects.filter(xray=xray_instance).order_by('-created_at')
     
@@ -703,12 +859,14 @@ def xray_results(request, pk):
             'overlay_url': viz.overlay_url,
             'saliency_url': viz.saliency_url,
             'threshold': viz.threshold,
-            'visualization_type': viz.visualization_type
+            'visualization_type': viz.visualization_type,
+            'type_label': viz.get_visualization_type_display(),
+            'parameters': viz.parameters,
         }
         
         if viz.visualization_type in ['gradcam', 'combined_gradcam']:
             gradcam_visualizations.append(viz_data)
-        elif viz.visualization_type in ['pli', 'combined_pli']:
+        elif viz.visualization_type in PIXEL_VISUALIZATION_TYPES:
             pli_visualizations.append(viz_data)
     
     # Prepare legacy GRAD-CAM URLs for backward compatibility
@@ -717,7 +875,7 @@ def xray_results(request, pk):
     heatmap_url = f"{media_url}{xray_instance.gradcam_heatmap}" if xray_instance.has_gradcam and xray_instance.gradcam_heatmap else None
     gradcam_overlay_url = f"{media_url}{xray_instance.gradcam_overlay}" if xray_instance.has_gradcam and xray_instance.gradcam_overlay else None
 
-    context = {
+    return {
         'xray': xray_instance,
         'image_url': image_url,
         'predictions': predictions,
@@ -735,12 +893,80 @@ def xray_results(request, pk):
         'heatmap_url': heatmap_url,
         'gradcam_overlay_url': gradcam_overlay_url,
         'gradcam_target': xray_instance.gradcam_target_class,
-        'pathology_explanations': pathology_explanations,
+    }
+
+
+@login_required
+def xray_results(request, pk):
+    """View the results of the X-ray analysis"""
+    # Get user's hospital from profile
+    user_hospital = request.user.profile.hospital
+    
+    # Allow access to any X-ray from the same hospital
+    xray_instance = XRayImage.objects.get(pk=pk, hospital=user_hospital)
+    
+    # The summary is only rebuilt when predictions or visualizations changed
+    results_summary = get_or_render_fragment(xray_instance.pk, lambda: render_to_string(
+        'xrayapp/results_summary.html', _results_summary_context(xray_instance), request=request
+    ))
+    
+    context = {
+        'xray': xray_instance,
+        'results_summary': mark_safe(results_summary),
+        'pathology_explanations': PATHOLOGY_EXPLANATIONS,
     }
     
     return render(request, 'xrayapp/results.html', context)
 
 
+def _apply_history_filters(query, cleaned_data, prefix=''):
+    """
+    Apply PredictionHistoryFilterForm filters to a queryset
+    
+    Args:
+        query: PredictionHistory queryset, or a queryset reaching it through `prefix`
+        cleaned_data: Cleaned data of a valid PredictionHistoryFilterForm
+        prefix: Lookup prefix leading to the PredictionHistory fields (e.g. 'prediction_history__')
+    """
+    # Gender filter
+    if cleaned_data.get('gender'):
+        query = query.filter(**{f'{prefix}xray__gender': cleaned_data['gender']})
+    
+    # Age range filter
+    if cleaned_data.get('age_min') is not None:
+        # Calculate date based on minimum age
+        min_age_date = timezone.now().date() - relativedelta(years=cleaned_data['age_min'])
+        query = query.filter(**{f'{prefix}xray__date_of_birth__lte': min_age_date})
+        
+    if cleaned_data.get('age_max') is not None:
+        # Calculate date based on maximum age
+        max_age_date = timezone.now().date() - relativedelta(years=cleaned_data['age_max'] + 1)
+        query = query.filter(**{f'{prefix}xray__date_of_birth__gte': max_age_date})
+    
+    # Date range filter
+    if cleaned_data.get('date_min'):
+        query = query.filter(**{f'{prefix}xray__date_of_xray__gte': cleaned_data['date_min']})
+        
+    if cleaned_data.get('date_max'):
+        query = query.filter(**{f'{prefix}xray__date_of_xray__lte': cleaned_data['date_max']})
+    
+    # Pathology filter
+    if cleaned_data.get('pathology') and cleaned_data.get('pathology_threshold') is not None:
+        # Element of the packed score array
+        lookup = pathology_score_lookup(cleaned_data['pathology'], prefix)
+        query = query.filter(**{f'{lookup}__gte': cleaned_data['pathology_threshold']})
+    
+    # Any pathology above the threshold, answered from the indexed max_probability column
+    if cleaned_data.get('any_pathology_threshold') is not None:
+        query = query.filter(**{f'{prefix}max_probability__gte': cleaned_data['any_pathology_threshold']})
+    
+    # Severity filter on the stored (indexed) level, backfilled in SQL for older rows
+    if cleaned_data.get('severity_level'):
+        query = query.filter(**{f'{prefix}severity_level': int(cleaned_data['severity_level'])})
+    
+    return query
+
+
 @login_required
 def prediction_history(request):
     """View prediction history with advanced filtering and pagination"""
@@ -751,55 +977,33 @@ def prediction_history(request):
     
     # Initialize query with optimized select_related to avoid N+1 queries
     # Filter by users from the same hospital instead of just current user
-    query = PredictionHistory.objects.filter(user__profile__hospital=user_hospital)\
-                                    .select_related('xray', 'user', 'user__profile')\
+    query = PredictionHistory.objects.filter(hospital=user_hospital)\
+                                    .select_related('xray')\
                                     .prefetch_related('xray__user')\
-                                    .order_by('-created_at')
+                                    .with_severity()
+    ordering = ('created_at', 'id')
     
     # Apply filters if the form is valid
     if form.is_valid():
-        # Gender filter
-        if form.cleaned_data.get('gender'):
-            query = query.filter(xray__gender=form.cleaned_data['gender'])
-        
-        # Age range filter
-        if form.cleaned_data.get('age_min') is not None:
-            # Calculate date based on minimum age
-            min_age_date = timezone.now().date() - relativedelta(years=form.cleaned_data['age_min'])
-            query = query.filter(xray__date_of_birth__lte=min_age_date)
-            
-        if form.cleaned_data.get('age_max') is not None:
-            # Calculate date based on maximum age
-            max_age_date = timezone.now().date() - relativedelta(years=form.cleaned_data['age_max'] + 1)
-            query = query.filter(xray__date_of_birth__gte=max_age_date)
-        
-        # Date range filter
-        if form.cleaned_data.get('date_min'):
-            query = query.filter(xray__date_of_xray__gte=form.cleaned_data['date_min'])
-            
-        if form.cleaned_data.get('date_max'):
-            query = query.filter(xray__date_of_xray__lte=form.cleaned_data['date_max'])
-        
-        # Pathology filter
-        if form.cleaned_data.get('pathology') and form.cleaned_data.get('pathology_threshold') is not None:
-            threshold = form.cleaned_data['pathology_threshold']
-            field_name = form.cleaned_data['pathology']
-            
-            # Dynamic field filtering
-            filter_kwargs = {f"{field_name}__gte": threshold}
-            query = query.filter(**filter_kwargs)
+        query = _apply_history_filters(query, form.cleaned_data)
+        
+        if form.cleaned_data.get('sort_by') == 'probability':
+            # Rows without predictions cannot be ranked (and NULLs break the keyset comparison)
+            query = query.filter(max_probability__isnull=False)
+            ordering = ('max_probability', 'created_at', 'id')
+        elif form.cleaned_data.get('sort_by') == 'severity':
+            query = query.filter(severity_level__isnull=False)
+            ordering = ('severity_level', 'created_at', 'id')
     
-    # Add pagination for better performance
+    # Keyset pagination: deep pages cost the same as the first one
     records_per_page = 25  # Default value
     if form.is_valid() and form.cleaned_data.get('records_per_page'):
         records_per_page = int(form.cleaned_data['records_per_page'])
     
-    paginator = Paginator(query, records_per_page)
-    page_number = request.GET.get('page')
-    history_items = paginator.get_page(page_number)
+    history_items = paginate_by_cursor(query, request, records_per_page, ordering)
     
-    # Get total count for the filtered query
-    total_count = paginator.count
+    # Cached, approximate total for the filtered query
+    total_count = history_items.count
     
     # Get saved record IDs for current user to show star status
     saved_record_ids = set(SavedRecord.objects.filter(
@@ -812,11 +1016,38 @@ def prediction_history(request):
         'history_items': history_items,
         'total_count': total_count,
         'saved_record_ids': saved_record_ids,
+        'purge_state': get_purge_state(user_hospital),
     }
     
     return render(request, 'xrayapp/prediction_history.html', context)
 
 
+@login_required
+def export_prediction_history(request):
+    """Stream the filtered prediction history as a CSV or XLSX file"""
+    form = PredictionHistoryFilterForm(request.GET)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        return HttpResponseBadRequest(_('Unsupported export format.'))
+    if export_format == 'xlsx' and not OPENPYXL_AVAILABLE:
+        return HttpResponseBadRequest(_('XLSX export is not available on this server.'))
+    
+    query = PredictionHistory.objects.filter(hospital=request.user.profile.hospital)
+    if form.is_valid():
+        query = _apply_history_filters(query, form.cleaned_data)
+    
+    filename = f"prediction_history_{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(query),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    else:
+        response = StreamingHttpResponse(stream_csv(query), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def delete_prediction_history(request, pk):
     """Delete a prediction history record"""
@@ -825,7 +1056,7 @@ def delete_prediction_history(request, pk):
         user_hospital = request.user.profile.hospital
         
         # Allow deletion of any record from the same hospital
-        history_item = PredictionHistory.objects.get(pk=pk, user__profile__hospital=user_hospital)
+        history_item = PredictionHistory.objects.get(pk=pk, hospital=user_hospital)
         history_item.delete()
         messages.success(request, _('Prediction history record has been deleted.'))
     except PredictionHistory.DoesNotExist:
@@ -836,60 +1067,68 @@ def delete_prediction_history(request, pk):
 
 @login_required
 def delete_all_prediction_history(request):
-    """Delete all prediction history records"""
+    """Delete all prediction history records in a background purge"""
     if request.method == 'POST':
         # Get user's hospital from profile
         user_hospital = request.user.profile.hospital
         
-        # Count records before deletion for current hospital
-        count = PredictionHistory.objects.filter(user__profile__hospital=user_hospital).count()
-        
-        # Delete all records for current hospital
-        PredictionHistory.objects.filter(user__profile__hospital=user_hospital).delete()
-        
-        if count > 0:
-            messages.success(request, _('All %(count)d prediction history records have been deleted.') % {'count': count})
-        else:
+        if not PredictionHistory.objects.filter(hospital=user_hospital).exists():
             messages.info(request, _('No prediction history records to delete.'))
+        elif start_prediction_history_purge(user_hospital):
+            messages.success(request, _('Deleting all prediction history records in the background.'))
+        else:
+            messages.info(request, _('Prediction history records are already being deleted.'))
     
     return redirect('prediction_history')
 
 
+@login_required
+def delete_all_prediction_history_status(request):
+    """Return the progress of the current hospital's background purge"""
+    state = get_purge_state(request.user.profile.hospital)
+    if state is None:
+        return JsonResponse({'status': 'idle'})
+    return JsonResponse(state)
+
+
+def _delete_visualization_files(visualization):
+    """Remove the image files belonging to a visualization result"""
+    file_paths = [
+        visualization.visualization_path,
+        visualization.heatmap_path,
+        visualization.overlay_path,
+        visualization.saliency_path,
+    ]
+    
+    for file_path in file_paths:
+        if file_path:
+            try:
+                full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+            except Exception as e:
+                logger.warning(f"Error deleting file {file_path}: {e}")
+
+
 @login_required
 @require_POST
-def delete_visualization(request, pk):
+async def delete_visualization(request, pk):
     """Delete a visualization result"""
     try:
-        # Get the visualization
-        visualization = VisualizationResult.objects.get(pk=pk)
+        user = await request.auser()
+        
+        visualization = await VisualizationResult.objects.aget(pk=pk)
         
         # Check if user has permission to delete (must be from same hospital)
-        user_hospital = request.user.profile.hospital
-        if visualization.xray.user.profile.hospital != user_hospital:
+        user_profile = await aget_cached_profile(user)
+        if user_profile is None or visualization.hospital != user_profile.hospital:
             return JsonResponse({'success': False, 'error': _('Permission denied')}, status=403)
         
         # Delete associated files
-        import os
-        from django.conf import settings
-        
-        file_paths = [
-            visualization.visualization_path,
-            visualization.heatmap_path,
-            visualization.overlay_path,
-            visualization.saliency_path,
-        ]
-        
-        for file_path in file_paths:
-            if file_path:
-                try:
-                    full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-                except Exception as e:
-                    print(f"Error deleting file {file_path}: {e}")
+        await sync_to_async(_delete_visualization_files)(visualization)
         
         # Delete the visualization record
-        visualization.delete()
+        await visualization.adelete()
         
         return JsonResponse({'success': True})
         
@@ -907,7 +1146,7 @@ def edit_prediction_history(request, pk):
         user_hospital = request.user.profile.hospital
         
         # Allow editing of any record from the same hospital
-        history_item = PredictionHistory.objects.get(pk=pk, user__profile__hospital=user_hospital)
+        history_item = PredictionHistory.objects.get(pk=pk, hospital=user_hospital)
         
         if request.method == 'POST':
             # Handle form submission
@@ -929,24 +1168,40 @@ def edit_prediction_history(request, pk):
         return redirect('prediction_history')
 
 
+def _parse_budget(value, default):
+    """Parse a positive budget value from the query string, falling back to the default"""
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        return default
+    return budget if budget > 0 else default
+
+
 @login_required
+@rate_limit('interpretability')
 def generate_interpretability(request, pk):
     """Generate interpretability visualization for an X-ray image"""
     # Get user's hospital from profile
     user_hospital = request.user.profile.hospital
     
     # Allow access to any X-ray from the same hospital
-    xray_instance = XRayImage.objects.get(pk=pk, user__profile__hospital=user_hospital)
+    xray_instance = XRayImage.objects.get(pk=pk, hospital=user_hospital)
     
     # Get parameters from request
     interpretation_method = request.GET.get('method', 'gradcam')  # Default to Grad-CAM
     model_type = request.GET.get('model_type', 'densenet')  # Default to DenseNet
     target_class = request.GET.get('target_class', None)  # Default to None (use highest probability class)
+    # Two-stage mode (quick preview, then refined map) is on unless explicitly disabled
+    progressive = request.GET.get('progressive', '1') != '0'
+    # Optional time/memory budget, falling back to the configured defaults
+    max_seconds = _parse_budget(request.GET.get('max_seconds'), settings.INTERPRETABILITY_MAX_SECONDS)
+    max_memory_mb = _parse_budget(request.GET.get('max_memory_mb'), settings.INTERPRETABILITY_MAX_MEMORY_MB)
+    
+    # Reset progress to 0 and set status to processing (on the job, not the X-ray)
+    start_job(xray_instance)
     
-    # Reset progress to 0 and set status to processing
-    xray_instance.progress = 0
-    xray_instance.processing_status = 'processing'
-    xray_instance.save()
+    # Forget the stage of any previous run so stale previews are not shown
+    cache.delete(_interpretability_stage_key(xray_instance.pk))
     
     # Get the image path
     image_path = Path(settings.MEDIA_ROOT) / xray_instance.image.name
@@ -954,7 +1209,8 @@ def generate_interpretability(request, pk):
     # Start background processing
     thread = threading.Thread(
         target=process_with_interpretability_async,
-        args=(image_path, xray_instance, model_type, interpretation_method, target_class)
+        args=(image_path, xray_instance, model_type, interpretation_method, target_class, progressive,
+              max_seconds, max_memory_mb)
     )
     thread.start()
     
@@ -971,15 +1227,115 @@ def generate_interpretability(request, pk):
     return redirect('xray_results', pk=pk)
 
 
-def check_progress(request, pk):
+def _stage_payload(stage_info):
+    """Progress response fields describing the interpretability stage and preview"""
+    if not stage_info:
+        return {}
+    payload = {'stage': stage_info['stage']}
+    if stage_info.get('preview') and stage_info['stage'] != 'final':
+        preview = stage_info['preview']
+        payload['preview'] = {
+            'method': preview['method'],
+            'target': preview['target'],
+            'overlay_url': preview['overlay_url'],
+            'saliency_url': preview['saliency_url'],
+        }
+    return payload
+
+
+def _progress_response_data(xray_instance, state):
+    """Build the check_progress payload, including visualizations once processing is complete"""
+    response_data = {
+        'status': state['status'],
+        'progress': state['progress'],
+        'xray_id': xray_instance.pk
+    }
+    
+    # Expose the interpretability stage and any interim (preview) artifacts
+    response_data.update(_stage_payload(get_interpretability_stage(xray_instance.pk)))
+    
+    # If processing is complete, include visualization data
+    if state['progress'] >= 100 and state['status'] == 'complete':
+        media_url = settings.MEDIA_URL
+        
+        # Get all visualizations for this X-ray
+        visualizations = VisualizationResult.objects.filter(xray=xray_instance).order_by('-created_at')
+        
+        # Group visualizations by type
+        gradcam_visualizations = []
+        pli_visualizations = []
+        
+        for viz in visualizations:
+            viz_data = {
+                'id': viz.id,
+                'target_pathology': viz.target_pathology,
+                'created_at': viz.created_at.isoformat(),
+                'model_used': viz.model_used,
+                'visualization_url': viz.visualization_url,
+                'heatmap_url': viz.heatmap_url,
+                'overlay_url': viz.overlay_url,
+                'saliency_url': viz.saliency_url,
+                'threshold': viz.threshold,
+                'visualization_type': viz.visualization_type
+            }
+            
+            if viz.visualization_type in ['gradcam', 'combined_gradcam']:
+                gradcam_visualizations.append(viz_data)
+            elif viz.visualization_type in PIXEL_VISUALIZATION_TYPES:
+                pli_visualizations.append(viz_data)
+        
+        # Include visualization data in response
+        if gradcam_visualizations:
+            response_data['gradcam'] = {
+                'has_gradcam': True,
+                'visualizations': gradcam_visualizations
+            }
+        
+        if pli_visualizations:
+            response_data['pli'] = {
+                'has_pli': True,
+                'visualizations': pli_visualizations
+            }
+        
+        # Include backward compatibility data for latest visualizations
+        if xray_instance.has_gradcam:
+            response_data['gradcam_legacy'] = {
+                'gradcam_url': f"{media_url}{xray_instance.gradcam_visualization}" if xray_instance.gradcam_visualization else None,
+                'heatmap_url': f"{media_url}{xray_instance.gradcam_heatmap}" if xray_instance.gradcam_heatmap else None,
+                'gradcam_overlay_url': f"{media_url}{xray_instance.gradcam_overlay}" if xray_instance.gradcam_overlay else None,
+                'gradcam_target': xray_instance.gradcam_target_class
+            }
+        
+        if xray_instance.has_pli:
+            response_data['pli_legacy'] = {
+                'pli_url': f"{media_url}{xray_instance.pli_visualization}" if xray_instance.pli_visualization else None,
+                'pli_saliency_url': f"{media_url}{xray_instance.pli_saliency_map}" if xray_instance.pli_saliency_map else None,
+                'pli_overlay_url': f"{media_url}{xray_instance.pli_overlay_visualization}" if xray_instance.pli_overlay_visualization else None,
+                'pli_target': xray_instance.pli_target_class
+            }
+        
+        # Include image URL for display
+        response_data['image_url'] = xray_instance.image.url
+    
+    return response_data
+
+
+@rate_limit('progress')
+async def check_progress(request, pk):
     """AJAX endpoint to check processing progress - lightweight version for memory-constrained systems"""
     
-    # Import here to avoid loading heavy dependencies
-    import gc
-    from django.http import JsonResponse
+    # In-flight jobs are answered from the published cache entry: the owner is
+    # checked against the session's user id, so neither the user nor the X-ray
+    # is loaded from the database
+    state = await aget_published_progress(pk)
+    if is_in_flight(state, await request.session.aget(SESSION_KEY)):
+        response_data = {'status': state['status'], 'progress': state['progress'], 'xray_id': pk}
+        response_data.update(_stage_payload(await cache.aget(_interpretability_stage_key(pk))))
+        return JsonResponse(response_data)
     
     # Check authentication manually to provide better JSON error responses
-    if not request.user.is_authenticated:
+    user = await request.auser()
+    if not user.is_authenticated:
         return JsonResponse({
             'error': 'Authentication required',
             'message': 'Please log in to check progress'
@@ -988,84 +1344,16 @@ def check_progress(request, pk):
     try:
         # For now, allow access to any X-ray the user uploaded
         # TODO: Implement proper hospital-based access control later
-        xray_instance = XRayImage.objects.get(pk=pk, user=request.user)
-        
-        response_data = {
-            'status': xray_instance.processing_status,
-            'progress': xray_instance.progress,
-            'xray_id': xray_instance.pk
-        }
+        xray_instance = await XRayImage.objects.aget(pk=pk, user=user)
         
-        # If processing is complete, include visualization data
-        if xray_instance.progress >= 100 and xray_instance.processing_status == 'complete':
-            media_url = settings.MEDIA_URL
-            
-            # Get all visualizations for this X-ray
-            visualizations = VisualizationResult.objects.filter(xray=xray_instance).order_by('-created_at')
-            
-            # Group visualizations by type
-            gradcam_visualizations = []
-            pli_visualizations = []
-            
-            for viz in visualizations:
-                viz_data = {
-                    'id': viz.id,
-                    'target_pathology': viz.target_pathology,
-                    'created_at': viz.created_at.isoformat(),
-                    'model_used': viz.model_used,
-                    'visualization_url': viz.visualization_url,
-                    'heatmap_url': viz.heatmap_url,
-                    'overlay_url': viz.overlay_url,
-                    'saliency_url': viz.saliency_url,
-                    'threshold': viz.threshold
-                }
-                
-                if viz.visualization_type in ['gradcam', 'combined_gradcam']:
-                    gradcam_visualizations.append(viz_data)
-                elif viz.visualization_type in ['pli', 'combined_pli']:
-                    pli_visualizations.append(viz_data)
-            
-            # Include visualization data in response
-            if gradcam_visualizations:
-                response_data['gradcam'] = {
-                    'has_gradcam': True,
-                    'visualizations': gradcam_visualizations
-                }
-            
-            if pli_visualizations:
-                response_data['pli'] = {
-                    'has_pli': True,
-                    'visualizations': pli_visualizations
-                }
-            
-            # Include backward compatibility data for latest visualizations
-            if xray_instance.has_gradcam:
-                response_data['gradcam_legacy'] = {
-                    'gradcam_url': f"{media_url}{xray_instance.gradcam_visualization}" if xray_instance.gradcam_visualization else None,
-                    'heatmap_url': f"{media_url}{xray_instance.gradcam_heatmap}" if xray_instance.gradcam_heatmap else None,
-                    'gradcam_overlay_url': f"{media_url}{xray_instance.gradcam_overlay}" if xray_instance.gradcam_overlay else None,
-                    'gradcam_target': xray_instance.gradcam_target_class
-                }
-            
-            if xray_instance.has_pli:
-                response_data['pli_legacy'] = {
-                    'pli_url': f"{media_url}{xray_instance.pli_visualization}" if xray_instance.pli_visualization else None,
-                    'pli_saliency_url': f"{media_url}{xray_instance.pli_saliency_map}" if xray_instance.pli_saliency_map else None,
-                    'pli_overlay_url': f"{media_url}{xray_instance.pli_overlay_visualization}" if xray_instance.pli_overlay_visualization else None,
-                    'pli_target': xray_instance.pli_target_class
-                }
-            
-            # Include image URL for display
-            response_data['image_url'] = xray_instance.image.url
+        # Re-publish so that following polls of an unfinished job hit the cache
+        state = await arepublish_progress(xray_instance)
         
-        # Force garbage collection to free memory
-        gc.collect()
+        response_data = await sync_to_async(_progress_response_data)(xray_instance, state)
         return JsonResponse(response_data)
     except XRayImage.DoesNotExist:
         # Log the 404 for debugging
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.warning(f"XRayImage {pk} not found for user {request.user.username}")
+        logger.warning(f"XRayImage {pk} not found for user {user.username}")
         
         return JsonResponse({
             'error': 'Image not found or access denied',
@@ -1073,8 +1361,6 @@ def check_progress(request, pk):
         }, status=404)
     except Exception as e:
         # Log the error for debugging
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f"Error in check_progress for pk={pk}: {e}")
         
         # Return JSON error response instead of HTML error page
@@ -1084,6 +1370,84 @@ def check_progress(request, pk):
         }, status=500)
 
 
+def _sse_event(event, data):
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _progress_events(pk):
+    """
+    Yield progress events for an X-ray until processing finishes.
+    
+    Progress is read from the cache entry published on every job update, so
+    a tick costs one cache read rather than an authenticated request and a
+    database query. The stream ends before the worker timeout; the browser
+    reconnects after the advertised retry interval.
+    """
+    deadline = time.monotonic() + settings.PROGRESS_STREAM_MAX_SECONDS
+    last_sent = None
+    last_write = time.monotonic()
+    
+    yield f"retry: {settings.PROGRESS_STREAM_RETRY_MS}\n\n"
+    
+    while time.monotonic() < deadline:
+        try:
+            state = await aget_published_progress(pk)
+            if state is None:
+                # Nothing published yet (or expired): read the job once and publish it
+                xray_instance = await XRayImage.objects.aget(pk=pk)
+                state = await arepublish_progress(xray_instance)
+            
+            if is_finished(state):
+                xray_instance = await XRayImage.objects.aget(pk=pk)
+                payload = await sync_to_async(_progress_response_data)(xray_instance, state)
+                yield _sse_event('complete', payload)
+                return
+        except XRayImage.DoesNotExist:
+            # Deleted mid-stream: end with a failed completion so the browser stops reconnecting
+            logger.warning(f"XRayImage {pk} was deleted while its progress was streamed")
+            yield _sse_event('complete', {'status': 'error', 'progress': 0, 'xray_id': pk, 'error': 'not_found'})
+            return
+        
+        snapshot = {'status': state['status'], 'progress': state['progress'], 'xray_id': pk}
+        snapshot.update(_stage_payload(await cache.aget(_interpretability_stage_key(pk))))
+        
+        if snapshot != last_sent:
+            yield _sse_event('progress', snapshot)
+            last_sent = snapshot
+            last_write = time.monotonic()
+        elif time.monotonic() - last_write >= 15:
+            # Comment line keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+            last_write = time.monotonic()
+        
+        await asyncio.sleep(settings.PROGRESS_STREAM_INTERVAL)
+
+
+@rate_limit('progress')
+async def stream_progress(request, pk):
+    """Server-Sent Events stream of processing progress (replaces polling check_progress)"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({
+            'error': 'Authentication required',
+            'message': 'Please log in to check progress'
+        }, status=401)
+    
+    if not await XRayImage.objects.filter(pk=pk, user=user).aexists():
+        logger.warning(f"XRayImage {pk} not found for user {user.username}")
+        return JsonResponse({
+            'error': 'Image not found or access denied',
+            'message': f'X-ray image {pk} was not found or you do not have permission to access it.'
+        }, status=404)
+    
+    response = StreamingHttpResponse(_progress_events(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Disable nginx response buffering so events are delivered immediately
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def account_settings(request):
     """View for managing user account settings"""
@@ -1193,18 +1557,22 @@ def set_language(request):
 
 @login_required
 @require_POST
-def toggle_save_record(request, pk):
+async def toggle_save_record(request, pk):
     """Toggle save/unsave a prediction history record via AJAX"""
     try:
+        user = await request.auser()
+        
         # Get user's hospital from profile
-        user_hospital = request.user.profile.hospital
+        user_profile = await aget_cached_profile(user)
+        if user_profile is None:
+            return JsonResponse({'success': False, 'error': _('Permission denied')}, status=403)
         
         # Get the prediction history record (must be from same hospital)
-        prediction_record = PredictionHistory.objects.get(pk=pk, user__profile__hospital=user_hospital)
+        prediction_record = await PredictionHistory.objects.aget(pk=pk, hospital=user_profile.hospital)
         
         # Check if record is already saved by this user
-        saved_record, created = SavedRecord.objects.get_or_create(
-            user=request.user,
+        saved_record, created = await SavedRecord.objects.aget_or_create(
+            user=user,
             prediction_history=prediction_record
         )
         
@@ -1217,7 +1585,7 @@ def toggle_save_record(request, pk):
             })
         else:
             # Record was already saved, so unsave it
-            saved_record.delete()
+            await saved_record.adelete()
             return JsonResponse({
                 'success': True,
                 'saved': False,
@@ -1244,53 +1612,31 @@ def saved_records(request):
     # Get user's saved records with optimized queries
     saved_records_query = SavedRecord.objects.filter(user=request.user)\
                                            .select_related('prediction_history__xray', 'prediction_history__user')\
-                                           .prefetch_related('prediction_history__xray__user')\
-                                           .order_by('-saved_at')
+                                           .prefetch_related('prediction_history__xray__user')
+    ordering = ('saved_at', 'id')
     
     # Apply filters if the form is valid
     if form.is_valid():
-        # Gender filter
-        if form.cleaned_data.get('gender'):
-            saved_records_query = saved_records_query.filter(prediction_history__xray__gender=form.cleaned_data['gender'])
-        
-        # Age range filter
-        if form.cleaned_data.get('age_min') is not None:
-            # Calculate date based on minimum age
-            min_age_date = timezone.now().date() - relativedelta(years=form.cleaned_data['age_min'])
-            saved_records_query = saved_records_query.filter(prediction_history__xray__date_of_birth__lte=min_age_date)
-            
-        if form.cleaned_data.get('age_max') is not None:
-            # Calculate date based on maximum age
-            max_age_date = timezone.now().date() - relativedelta(years=form.cleaned_data['age_max'] + 1)
-            saved_records_query = saved_records_query.filter(prediction_history__xray__date_of_birth__gte=max_age_date)
-        
-        # Date range filter
-        if form.cleaned_data.get('date_min'):
-            saved_records_query = saved_records_query.filter(prediction_history__xray__date_of_xray__gte=form.cleaned_data['date_min'])
-            
-        if form.cleaned_data.get('date_max'):
-            saved_records_query = saved_records_query.filter(prediction_history__xray__date_of_xray__lte=form.cleaned_data['date_max'])
-        
-        # Pathology filter
-        if form.cleaned_data.get('pathology') and form.cleaned_data.get('pathology_threshold') is not None:
-            threshold = form.cleaned_data['pathology_threshold']
-            field_name = f"prediction_history__{form.cleaned_data['pathology']}"
-            
-            # Dynamic field filtering
-            filter_kwargs = {f"{field_name}__gte": threshold}
-            saved_records_query = saved_records_query.filter(**filter_kwargs)
+        saved_records_query = _apply_history_filters(saved_records_query, form.cleaned_data,
+                                                      prefix='prediction_history__')
+        
+        if form.cleaned_data.get('sort_by') == 'probability':
+            # Rows without predictions cannot be ranked (and NULLs break the keyset comparison)
+            saved_records_query = saved_records_query.filter(prediction_history__max_probability__isnull=False)
+            ordering = ('prediction_history__max_probability', 'saved_at', 'id')
+        elif form.cleaned_data.get('sort_by') == 'severity':
+            saved_records_query = saved_records_query.filter(prediction_history__severity_level__isnull=False)
+            ordering = ('prediction_history__severity_level', 'saved_at', 'id')
     
-    # Add pagination for better performance
+    # Keyset pagination: deep pages cost the same as the first one
     records_per_page = 25  # Default value
     if form.is_valid() and form.cleaned_data.get('records_per_page'):
         records_per_page = int(form.cleaned_data['records_per_page'])
     
-    paginator = Paginator(saved_records_query, records_per_page)
-    page_number = request.GET.get('page')
-    saved_records_page = paginator.get_page(page_number)
+    saved_records_page = paginate_by_cursor(saved_records_query, request, records_per_page, ordering)
     
-    # Get total count
-    total_count = paginator.count
+    # Cached, approximate total
+    total_count = saved_records_page.count
     
     context = {
         'form': form,
@@ -1301,6 +1647,49 @@ def saved_records(request):
     return render(request, 'xrayapp/saved_records.html', context)
 
 
+# Ranges offered by the hospital dashboard, in days
+DASHBOARD_DAY_CHOICES = (7, 30, 90, 365)
+
+
+def _stats_range(request):
+    """Return (first_day, last_day, days) of the statistics requested: the last ``days`` days, today included"""
+    try:
+        days = int(request.GET.get('days', 30))
+    except (TypeError, ValueError):
+        days = 30
+    days = min(max(days, 1), settings.HOSPITAL_STATS_MAX_DAYS)
+    last_day = timezone.localdate()
+    return last_day - timedelta(days=days - 1), last_day, days
+
+
+@login_required
+def hospital_dashboard(request):
+    """Prediction statistics of the user's hospital, read from the daily rollups"""
+    first_day, last_day, days = _stats_range(request)
+    summary = summarize_hospital_stats(request.user.profile.hospital, first_day, last_day)
+    severity_labels = {
+        '1': _("Insignificant findings"),
+        '2': _("Moderate findings"),
+        '3': _("Significant findings"),
+    }
+    context = {
+        'summary': summary,
+        'days': days,
+        'day_choices': DASHBOARD_DAY_CHOICES,
+        'severity_rows': [(int(level), severity_labels.get(level, level), count)
+                          for level, count in summary['by_severity'].items()],
+        'max_daily': max((item['total'] for item in summary['daily']), default=0),
+    }
+    return render(request, 'xrayapp/hospital_dashboard.html', context)
+
+
+@login_required
+def hospital_stats_api(request):
+    """Prediction statistics of the user's hospital as JSON (?days=N)"""
+    first_day, last_day, _days = _stats_range(request)
+    return JsonResponse(summarize_hospital_stats(request.user.profile.hospital, first_day, last_day))
+
+
 # Error handler views
 def handler400(request, exception=None):
     """400 Bad Request handler."""